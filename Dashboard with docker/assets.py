@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Fingerprinted, precompressed static assets
+
+    python assets.py build      # run at image build time (see Dockerfile)
+
+``build`` copies every CSS/JS file under templates/static to
+templates/static/dist with a content hash in its name
+(``css/styles.css`` -> ``dist/css/styles.3f2a9c1b04de.css``), writes ``.gz``
+and, when the ``brotli`` package is installed, ``.br`` siblings at maximum
+compression, and records the mapping in dist/manifest.json.
+
+At runtime the app loads the manifest and rewrites
+``url_for('static', filename=...)`` to the hashed name, so the templates
+don't change. A hashed file's content can never change under its name, so
+it is served with a one-year ``immutable`` Cache-Control and the
+precompressed variant the client accepts. Without a manifest (a plain
+checkout) assets are served from templates/static as before.
+"""
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+
+from compression import brotli, choose_encoding
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'static')
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Suffix of each precompressed variant, per Content-Encoding
+VARIANTS = {'br': '.br', 'gzip': '.gz'}
+
+
+def fingerprint(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def build(static_dir=STATIC_DIR):
+    """Write hashed and precompressed copies plus the manifest; returns the manifest"""
+    dist_dir = os.path.join(static_dir, DIST)
+    # Start clean so assets that were renamed or removed don't linger
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(files):
+            if not name.endswith(EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            stem, ext = os.path.splitext(relative)
+            hashed = f"{DIST}/{stem}.{fingerprint(source)}{ext}"
+            target = os.path.join(static_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            with open(source, 'rb') as f:
+                data = f.read()
+            with open(target + VARIANTS['gzip'], 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target + VARIANTS['br'], 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+            manifest[relative] = hashed
+    with open(os.path.join(dist_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir=STATIC_DIR):
+    """Original name -> hashed name, empty when ``build`` hasn't been run"""
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def precompressed(path, accept_encodings):
+    """(file to send, Content-Encoding or None) for a hashed asset"""
+    available = [encoding for encoding, suffix in VARIANTS.items()
+                 if os.path.isfile(path + suffix)]
+    encoding = choose_encoding(accept_encodings, available)
+    if encoding is None:
+        return path, None
+    return path + VARIANTS[encoding], encoding
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command != 'build':
+        print(f"Usage: {sys.argv[0]} build")
+        sys.exit(1)
+    manifest = build()
+    print(f"Fingerprinted {len(manifest)} assets into {os.path.join(STATIC_DIR, DIST)}"
+          f"{'' if brotli is not None else ' (gzip only; install brotli for .br)'}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare the gunicorn concurrency profiles under an ingest-heavy load
+
+Starts gunicorn once per profile (GUNICORN_PROFILE=sync|gthread|gevent)
+against the database configured in .env and drives the same request mix
+from a set of client threads: mostly sensor POSTs, some dashboard reads and
+a few deliberately slow 30-day exports. Sensor latency is reported
+separately because that is what times out when workers are starved.
+Server startup and load generation come from benchmark.py.
+
+Usage:
+    python bench_profiles.py [--profiles sync,gthread,gevent] [--duration 30]
+                             [--clients 32] [--port 5099]
+"""
+import json
+import argparse
+
+from benchmark import (parse_mix, percentile, run_workload, start_server, stop_server,
+                       wait_until_up)
+
+MIX = 'ingest_gps=60,ingest_alert=20,stats=8,list_deauth=7,list_alerts_month=5'
+
+# Endpoint -> group reported in the comparison table
+KINDS = {
+    'ingest_gps': 'ingest',
+    'ingest_alert': 'ingest',
+    'stats': 'read',
+    'list_deauth': 'read',
+    'list_alerts_month': 'slow',
+}
+
+
+def bench_profile(profile, args):
+    server, state_dir = start_server(args.port, {'GUNICORN_PROFILE': profile})
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_up(base_url):
+            return {'profile': profile, 'error': 'server did not start'}
+        results = run_workload(base_url, parse_mix(MIX), args.clients, args.duration,
+                               args.timeout, args.warmup)
+    finally:
+        stop_server(server, state_dir)
+
+    latencies = {'ingest': [], 'read': [], 'slow': []}
+    errors = 0
+    for name, entry in results.items():
+        latencies[KINDS[name]].extend(entry['latencies'])
+        errors += entry['errors']
+    total = sum(len(v) for v in latencies.values())
+    result = {'profile': profile, 'requests': total, 'errors': errors,
+              'rps': round(total / args.duration, 1)}
+    for kind, values in latencies.items():
+        values.sort()
+        for pct in (50, 95, 99):
+            result[f'{kind}_p{pct}_ms'] = round(percentile(values, pct) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gunicorn concurrency profiles')
+    parser.add_argument('--profiles', default='sync,gthread,gevent')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per profile')
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client threads')
+    parser.add_argument('--timeout', type=float, default=10, help='client timeout (sensor default)')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = [bench_profile(p.strip(), args) for p in args.profiles.split(',') if p.strip()]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'profile':<8} {'req/s':>8} {'errors':>7} {'ingest p50':>11} {'ingest p95':>11} "
+          f"{'ingest p99':>11} {'read p95':>9} {'slow p95':>9}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['profile']:<8} {r['error']}")
+            continue
+        print(f"{r['profile']:<8} {r['rps']:>8} {r['errors']:>7} {r['ingest_p50_ms']:>9}ms "
+              f"{r['ingest_p95_ms']:>9}ms {r['ingest_p99_ms']:>9}ms {r['read_p95_ms']:>7}ms "
+              f"{r['slow_p95_ms']:>7}ms")
+    ranked = [r for r in results if 'error' not in r and r['errors'] == 0] or \
+             [r for r in results if 'error' not in r]
+    if ranked:
+        best = min(ranked, key=lambda r: r['ingest_p99_ms'])
+        print(f"\nLowest sensor p99: {best['profile']}")
+
+
+if __name__ == '__main__':
+    main()
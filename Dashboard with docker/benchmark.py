@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+HTTP load benchmark for the Security Dashboard
+
+Starts ``flaskkk.application`` under gunicorn against a stand-in MySQL
+database, seeds it with a configurable number of alerts, GPS readings and
+deauth records, then drives a weighted mix of ingest and read requests
+from concurrent clients. Throughput and p50/p95/p99 latency are reported
+per endpoint, and ``--output`` writes the same figures as JSON so two runs
+(e.g. two releases) can be compared with ``--compare``.
+
+The stand-in database is either a throwaway MySQL container (``--docker``)
+or an existing server given with ``--db-host``/``--db-port``. Seeding only
+ever touches the database named by ``--db-name``.
+
+Usage:
+    python benchmark.py --docker --alerts 1000000 --gps 5000000 --deauth 500000 \\
+                        --duration 60 --clients 32 --output results.json
+    python benchmark.py --db-host 127.0.0.1 --db-name dashboard_bench --skip-seed
+    python benchmark.py --compare before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+TOOLS = ('deauth_detector', 'evil_twin', 'gps_detector', 'netdiscover', 'bluetooth_scanner')
+ALERT_TYPES = ('Deauth Attack', 'Evil Twin', 'GPS Jamming', 'New Device', 'Port Scan')
+DEVICES = tuple(f"GPS-{n:03d}" for n in range(1, 51))
+
+
+def random_mac():
+    return ':'.join(f"{random.randint(0, 255):02x}" for _ in range(6))
+
+
+def make_alert():
+    return {
+        'tool_name': random.choice(TOOLS),
+        'alert_type': random.choice(ALERT_TYPES),
+        'severity': random.choice(SEVERITIES),
+        'description': 'benchmark alert',
+        'raw_data': {'rssi': random.randint(-90, -30)},
+    }
+
+
+def make_gps():
+    return {
+        'latitude': round(31.83 + random.uniform(-0.05, 0.05), 6),
+        'longitude': round(35.89 + random.uniform(-0.05, 0.05), 6),
+        'device_id': random.choice(DEVICES),
+    }
+
+
+def make_deauth():
+    return {
+        'alert_type': 'Deauth Attack',
+        'attacker_bssid': random_mac(),
+        'attacker_ssid': 'bench-ap',
+        'destination_bssid': random_mac(),
+        'destination_ssid': 'bench-client',
+        'attack_count': random.randint(1, 500),
+    }
+
+
+# name -> (method, path, body factory)
+ENDPOINTS = {
+    'ingest_alert': ('POST', '/api/alerts', make_alert),
+    'ingest_alert_batch': ('POST', '/api/alerts/batch', lambda: [make_alert() for _ in range(50)]),
+    'ingest_gps': ('POST', '/api/gps', make_gps),
+    'ingest_deauth': ('POST', '/api/deauth_logs', make_deauth),
+    'list_alerts': ('GET', '/api/alerts', None),
+    'list_alerts_filtered': ('GET', '/api/alerts?severity=high&hours=168&limit=100', None),
+    'list_gps': ('GET', '/api/gps?hours=24', None),
+    'list_gps_viewport': ('GET', '/api/gps?hours=168&bbox=35.86,31.80,35.90,31.84', None),
+    'gps_clusters': ('GET', '/api/gps/clusters?zoom=13&bbox=35.80,31.77,35.98,31.89', None),
+    'list_deauth': ('GET', '/api/deauth_logs?limit=500', None),
+    'stats': ('GET', '/api/stats', None),
+    'list_alerts_month': ('GET', '/api/alerts?hours=720&limit=10000', None),
+    'export_alerts': ('GET', '/api/alerts?hours=720&format=ndjson&limit=20000', None),
+    'ping': ('GET', '/api/ping', None),
+}
+
+DEFAULT_MIX = ('ingest_gps=40,ingest_alert=15,ingest_deauth=5,ingest_alert_batch=2,'
+               'list_alerts=8,list_alerts_filtered=3,list_gps=10,list_deauth=8,stats=8,'
+               'export_alerts=1')
+
+
+def parse_mix(spec):
+    """Parse "name=weight,..." into [(name, weight)]"""
+    mix = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in mix: {name} (known: {', '.join(ENDPOINTS)})")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(pct / 100.0 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+# ----------------------------------------------------------------------
+# Stand-in database
+# ----------------------------------------------------------------------
+def start_mysql_container(port, db_name):
+    """Start a throwaway MySQL 8 container on tmpfs; returns the container name"""
+    name = f"dashboard-bench-{uuid.uuid4().hex[:8]}"
+    subprocess.run([
+        'docker', 'run', '-d', '--rm', '--name', name,
+        '-e', 'MYSQL_ROOT_PASSWORD=bench', '-e', f'MYSQL_DATABASE={db_name}',
+        '-e', 'MYSQL_USER=bench', '-e', 'MYSQL_PASSWORD=bench',
+        '-p', f'127.0.0.1:{port}:3306', '--tmpfs', '/var/lib/mysql',
+        'mysql:8.0', '--max-connections=500', '--innodb-flush-log-at-trx-commit=2',
+    ], check=True, stdout=subprocess.DEVNULL)
+    return name
+
+
+def connect(db, retries=1):
+    import MySQLdb
+    last_error = None
+    for _ in range(retries):
+        try:
+            return MySQLdb.connect(host=db['host'], port=db['port'], user=db['user'],
+                                   passwd=db['password'], db=db['name'])
+        except MySQLdb.OperationalError as e:
+            last_error = e
+            time.sleep(1)
+    raise last_error
+
+
+def seed(db, table, target, days, batch_size=5000):
+    """Insert rows into ``table`` until it holds ``target`` rows"""
+    sys.path.insert(0, APP_DIR)
+    from ids import uuid7
+    from spatial import encode as geohash
+    conn = connect(db)
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT COUNT(*) FROM {table}")
+        existing = c.fetchone()[0]
+        missing = max(0, target - existing)
+        if not missing:
+            print(f"  {table}: {existing} rows already present")
+            return
+        now = datetime.datetime.now()
+        span = days * 86400
+        started = time.monotonic()
+        for offset in range(0, missing, batch_size):
+            rows = []
+            for _ in range(min(batch_size, missing - offset)):
+                ts = (now - datetime.timedelta(seconds=random.uniform(0, span))).strftime('%Y-%m-%d %H:%M:%S')
+                if table == 'alerts':
+                    alert = make_alert()
+                    rows.append((uuid7().bytes, alert['tool_name'], alert['alert_type'],
+                                 alert['severity'], alert['description'],
+                                 json.dumps(alert['raw_data']), ts, '10.0.0.1'))
+                elif table == 'gps_data':
+                    gps = make_gps()
+                    rows.append((uuid7().bytes, gps['latitude'], gps['longitude'], ts,
+                                 gps['device_id'], random.randint(3, 12),
+                                 round(random.uniform(0.5, 5), 2), int(random.random() < 0.02),
+                                 geohash(gps['latitude'], gps['longitude'])))
+                else:
+                    deauth = make_deauth()
+                    rows.append((uuid7().bytes, ts, deauth['alert_type'], deauth['attacker_bssid'],
+                                 deauth['attacker_ssid'], deauth['destination_bssid'],
+                                 deauth['destination_ssid'], deauth['attack_count']))
+            c.executemany(SEED_INSERTS[table], rows)
+            conn.commit()
+            done = offset + len(rows)
+            if done % (batch_size * 20) == 0 or done == missing:
+                print(f"  {table}: {existing + done}/{target} rows "
+                      f"({done / (time.monotonic() - started):.0f} rows/s)")
+    finally:
+        conn.close()
+
+
+SEED_INSERTS = {
+    'alerts': "INSERT INTO alerts (id, tool_name, alert_type, severity, description, raw_data, "
+              "timestamp, source_ip) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+    'gps_data': "INSERT INTO gps_data (id, latitude, longitude, timestamp, device_id, satellites, "
+                "hdop, jamming_detected, geohash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+    'network_attacks': "INSERT INTO network_attacks (id, timestamp, alert_type, attacker_bssid, "
+                       "attacker_ssid, destination_bssid, destination_ssid, attack_count) "
+                       "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+}
+
+
+def finish_seeding(db):
+    """Rebuild the stats rollups and cluster grid and bump the change counters after a bulk load"""
+    sys.path.insert(0, APP_DIR)
+    import rollups
+    import clusters
+    conn = connect(db)
+    try:
+        rollups.backfill(conn)
+        c = conn.cursor()
+        clusters.rebuild(c)
+        for table in SEED_INSERTS:
+            c.execute("INSERT INTO data_versions (table_name, version) VALUES (%s, 1) "
+                      "ON DUPLICATE KEY UPDATE version = version + 1", (table,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ----------------------------------------------------------------------
+# Server under test
+# ----------------------------------------------------------------------
+def send(base_url, method, path, body, timeout):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            send(base_url, 'GET', '/api/ping', None, 1)
+            return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    return False
+
+
+def start_server(port, env_overrides):
+    """Run gunicorn with flaskkk:application; returns (process, state_dir)"""
+    state_dir = tempfile.mkdtemp(prefix='dashboard-bench-')
+    env = dict(os.environ,
+               PORT=str(port),
+               # All load comes from one IP and must not be throttled
+               RATE_LIMIT_PER_MINUTE='100000000',
+               RATE_LIMIT_STATE_FILE=os.path.join(state_dir, 'ratelimit'),
+               RESPONSE_CACHE_DIR=os.path.join(state_dir, 'cache'),
+               METRICS_DIR=os.path.join(state_dir, 'metrics'),
+               WRITE_BEHIND_SPILL_DIR=os.path.join(state_dir, 'spill'),
+               LOG_FILE=os.path.join(state_dir, 'app.log'),
+               REQUEST_LOG_SAMPLING='default=0')
+    env.update(env_overrides)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'flaskkk:application'],
+        env=env, cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return server, state_dir
+
+
+def stop_server(server, state_dir):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+    shutil.rmtree(state_dir, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+def run_workload(base_url, mix, clients, duration, timeout, warmup=0.0):
+    """Drive ``mix`` from ``clients`` threads for ``duration`` seconds
+
+    Requests finishing during the first ``warmup`` seconds are not
+    recorded. Returns {endpoint: {'latencies': [...], 'errors': n, 'statuses': {...}}}.
+    """
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results = {name: {'latencies': [], 'errors': 0, 'statuses': {}} for name in names}
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+
+    def client():
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            name = random.choices(names, weights)[0]
+            method, path, body = ENDPOINTS[name]
+            start = time.perf_counter()
+            try:
+                status = send(base_url, method, path, body() if body else None, timeout)
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, OSError):
+                status = None
+            elapsed = time.perf_counter() - start
+            if now < measure_from:
+                continue
+            with lock:
+                entry = results[name]
+                key = str(status) if status else 'failed'
+                entry['statuses'][key] = entry['statuses'].get(key, 0) + 1
+                if status is not None and status < 400:
+                    entry['latencies'].append(elapsed)
+                else:
+                    entry['errors'] += 1
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def summarize(results, duration):
+    """Per-endpoint throughput and latency percentiles (milliseconds)"""
+    summary = {}
+    all_latencies = []
+    total_errors = 0
+    for name, entry in sorted(results.items()):
+        latencies = sorted(entry['latencies'])
+        all_latencies.extend(latencies)
+        total_errors += entry['errors']
+        summary[name] = {
+            'requests': len(latencies),
+            'errors': entry['errors'],
+            'statuses': entry['statuses'],
+            'rps': round(len(latencies) / duration, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    all_latencies.sort()
+    summary['_total'] = {
+        'requests': len(all_latencies),
+        'errors': total_errors,
+        'rps': round(len(all_latencies) / duration, 2),
+        'p50_ms': round(percentile(all_latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(all_latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(all_latencies, 99) * 1000, 2),
+        'max_ms': round(all_latencies[-1] * 1000, 2) if all_latencies else 0.0,
+    }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'endpoint':<22} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, row in summary.items():
+        print(f"{name:<22} {row['rps']:>9} {row['errors']:>7} {row['p50_ms']:>9} "
+              f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """Print the per-endpoint change between two --output files"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    print(f"{'endpoint':<22} {'req/s':>16} {'p95 ms':>18} {'p99 ms':>18}")
+    for name, new in after['results'].items():
+        old = before['results'].get(name)
+        if not old:
+            continue
+        def delta(key):
+            if not old[key]:
+                return f"{new[key]:>9}"
+            change = (new[key] - old[key]) / old[key] * 100
+            return f"{new[key]:>9} {change:+6.1f}%"
+        print(f"{name:<22} {delta('rps'):>16} {delta('p95_ms'):>18} {delta('p99_ms'):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark for the dashboard API')
+    parser.add_argument('--docker', action='store_true', help='start a throwaway MySQL container')
+    parser.add_argument('--db-host', default='127.0.0.1')
+    parser.add_argument('--db-port', type=int, default=3307)
+    parser.add_argument('--db-user', default='bench')
+    parser.add_argument('--db-password', default='bench')
+    parser.add_argument('--db-name', default='dashboard_bench')
+    parser.add_argument('--alerts', type=int, default=1_000_000)
+    parser.add_argument('--gps', type=int, default=5_000_000)
+    parser.add_argument('--deauth', type=int, default=500_000)
+    parser.add_argument('--days', type=float, default=30, help='spread seeded rows over this many days')
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight,... (see ENDPOINTS)')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--profile', help='GUNICORN_PROFILE for the server under test')
+    parser.add_argument('--url', help='benchmark an already running server instead')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--keep-db', action='store_true', help="don't remove the MySQL container")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    mix = parse_mix(args.mix)
+    db = {'host': args.db_host, 'port': args.db_port, 'user': args.db_user,
+          'password': args.db_password, 'name': args.db_name}
+    container = None
+    server = state_dir = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            if args.docker:
+                container = start_mysql_container(args.db_port, args.db_name)
+                print(f"Started MySQL container {container}, waiting for it to accept connections")
+                connect(db, retries=90).close()
+            env = {'DB_HOST': db['host'], 'DB_PORT': str(db['port']), 'DB_USER': db['user'],
+                   'DB_PASSWORD': db['password'], 'DB_NAME': db['name']}
+            if args.profile:
+                env['GUNICORN_PROFILE'] = args.profile
+            # The app creates the schema on startup, so start it before seeding
+            server, state_dir = start_server(args.port, env)
+            base_url = f"http://127.0.0.1:{args.port}"
+            if not wait_until_up(base_url):
+                raise SystemExit('Server under test did not start')
+            if not args.skip_seed:
+                print('Seeding')
+                seed(db, 'alerts', args.alerts, args.days)
+                seed(db, 'gps_data', args.gps, args.days)
+                seed(db, 'network_attacks', args.deauth, args.days)
+                finish_seeding(db)
+
+        started = datetime.datetime.now().isoformat(timespec='seconds')
+        print(f"Running {args.clients} clients for {args.duration}s (+{args.warmup}s warm-up)")
+        results = run_workload(base_url, mix, args.clients, args.duration, args.timeout, args.warmup)
+    finally:
+        if server:
+            stop_server(server, state_dir)
+        if container and not args.keep_db:
+            subprocess.run(['docker', 'stop', container], stdout=subprocess.DEVNULL)
+
+    summary = summarize(results, args.duration)
+    print_summary(summary)
+    if args.output:
+        report = {
+            'revision': git_revision(),
+            'started': started,
+            'config': {k: v for k, v in vars(args).items()
+                       if k not in ('db_password', 'compare', 'output')},
+            'results': summary,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
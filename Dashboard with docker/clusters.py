@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Hierarchical grid of GPS readings for /api/gps/clusters
+
+``gps_grid`` counts readings per geohash cell, per hour, at every level
+from 1 to MAX_LEVEL (level n = the first n characters of the reading's
+geohash, see spatial.py). Like the /api/stats rollups it is updated in the
+same transaction as each ingest, so a map pan or zoom reads the few
+hundred cells of one level that cover the viewport instead of clustering
+the raw rows again. Each cell also keeps the coordinate sums of its
+readings, so a cluster is drawn at their centroid rather than the cell's
+centre, and a jamming count for the jamming ratio.
+
+The zoom level picks the grid level whose cells are at least CELL_PIXELS
+wide on a 256-pixel-tile map. Windows (?hours=) start on an hour boundary.
+
+Run ``python clusters.py rebuild`` to recompute the grid from gps_data.
+"""
+import os
+import sys
+import datetime
+import logging
+
+import spatial
+from rollups import parse_timestamp, truncate
+from storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'gps_grid'
+SOURCE = 'gps_data'
+
+# Level 8 cells are about 38 x 19 m, finer than any map needs to cluster
+MAX_LEVEL = 8
+LEVELS = range(1, MAX_LEVEL + 1)
+MAX_ZOOM = 22
+CELL_PIXELS = int(os.getenv('CLUSTER_CELL_PIXELS', 32))
+
+
+def create_tables(cursor):
+    """Create gps_grid if it doesn't exist"""
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        level TINYINT NOT NULL,
+        cell VARCHAR({MAX_LEVEL}) NOT NULL,
+        bucket DATETIME NOT NULL,
+        readings BIGINT UNSIGNED NOT NULL DEFAULT 0,
+        jamming BIGINT UNSIGNED NOT NULL DEFAULT 0,
+        latitude_sum DOUBLE NOT NULL DEFAULT 0,
+        longitude_sum DOUBLE NOT NULL DEFAULT 0,
+        PRIMARY KEY (level, cell, bucket)
+    )
+    ''')
+    # Retention prunes by bucket alone
+    get_backend().alter_indexes(cursor, TABLE, {f'idx_{TABLE}_bucket': ('bucket',)}, [])
+
+
+def level_for_zoom(zoom):
+    """Finest grid level whose cells are at least CELL_PIXELS wide at ``zoom``"""
+    world_pixels = 256 * 2 ** zoom
+    level = 1
+    for candidate in LEVELS:
+        width, _ = spatial.cell_size(candidate)
+        if world_pixels * width / 360.0 < CELL_PIXELS:
+            break
+        level = candidate
+    return level
+
+
+def apply_clusters(cursor, table, columns, rows):
+    """Add freshly inserted gps_data rows to the grid inside the caller's transaction
+
+    Rows are aggregated in Python first, so a batch costs one upsert per
+    (level, cell, hour) rather than MAX_LEVEL per row.
+    """
+    if table != SOURCE or not rows:
+        return
+    totals = {}
+    for values in rows:
+        row = dict(zip(columns, values))
+        latitude, longitude = float(row['latitude']), float(row['longitude'])
+        geohash = row.get('geohash') or spatial.encode(latitude, longitude)
+        bucket = truncate(parse_timestamp(row.get('timestamp')), 'hour')
+        jamming = 1 if row.get('jamming_detected') else 0
+        for level in LEVELS:
+            sums = totals.setdefault((level, geohash[:level], bucket), [0, 0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += jamming
+            sums[2] += latitude
+            sums[3] += longitude
+    cursor.executemany(
+        get_backend().upsert_add(TABLE, ('level', 'cell', 'bucket', 'readings', 'jamming', 'latitude_sum',
+                                         'longitude_sum'),
+                                 ('level', 'cell', 'bucket'),
+                                 ('readings', 'jamming', 'latitude_sum', 'longitude_sum')),
+        [key + tuple(sums) for key, sums in totals.items()]
+    )
+
+
+def clear_clusters(cursor, table):
+    """Empty the grid when gps_data is cleared"""
+    if table == SOURCE:
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+
+def prune_before(cursor, table, cutoff):
+    """Drop grid buckets older than ``cutoff`` (after gps_data retention)"""
+    if table == SOURCE:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE bucket < %s", [cutoff])
+
+
+def rebuild(cursor):
+    """Recompute the whole grid from gps_data, one level at a time"""
+    backend = get_backend()
+    cursor.execute(f"DELETE FROM {TABLE}")
+    for level in LEVELS:
+        # No parameters are passed, so the date format % signs go through untouched
+        cursor.execute(
+            f"INSERT INTO {TABLE} (level, cell, bucket, readings, jamming, latitude_sum, longitude_sum) "
+            f"SELECT {level}, {backend.left('geohash', level)}, {backend.bucket('timestamp', 'hour')}, "
+            f"COUNT(*), SUM(jamming_detected <> 0), SUM(latitude), SUM(longitude) "
+            f"FROM {SOURCE} WHERE geohash IS NOT NULL GROUP BY 2, 3"
+        )
+    logger.info(f"Rebuilt {TABLE} at levels 1-{MAX_LEVEL}")
+
+
+def cluster_query(level, bbox, start):
+    """(query, params) summing the cells of ``level`` inside ``bbox`` since ``start``
+
+    None when no cell covers ``bbox``, so there is nothing to read.
+    """
+    conditions, params = ["level = %s"], [level]
+    if bbox is not None:
+        # Cover with cells no finer than the level, so every range lines up
+        # with whole grid cells of that level
+        prefixes = sorted({prefix[:level] for prefix in spatial.covering_cells(bbox)})
+        ranges = spatial.prefix_ranges(prefixes)
+        if not ranges:
+            return None
+        # The span from the first range to the last is one seek on the
+        # primary key, even for a planner that won't merge the OR'd ranges
+        conditions.append("cell >= %s")
+        params.append(ranges[0][0])
+        if ranges[-1][1] is not None:
+            conditions.append("cell < %s")
+            params.append(ranges[-1][1])
+        clauses = []
+        for low, high in ranges:
+            if high is None:
+                clauses.append("cell >= %s")
+                params.append(low)
+            else:
+                clauses.append("(cell >= %s AND cell < %s)")
+                params.extend([low, high])
+        conditions.append(f"({' OR '.join(clauses)})")
+    conditions.append("bucket >= %s")
+    params.append(start)
+    query = (
+        f"SELECT cell, SUM(readings), SUM(jamming), SUM(latitude_sum), SUM(longitude_sum) "
+        f"FROM {TABLE} WHERE {' AND '.join(conditions)} GROUP BY cell"
+    )
+    return query, params
+
+
+def window_start(conn, hours):
+    """Start of the hour ``hours`` back from the database clock"""
+    c = conn.cursor()
+    c.execute(f"SELECT {get_backend().now()}")
+    now = parse_timestamp(c.fetchone()[0])
+    return truncate(now - datetime.timedelta(hours=hours), 'hour')
+
+
+def clusters(conn, zoom, bbox=None, hours=24):
+    """Clusters for a map view: one per occupied grid cell of the zoom's level"""
+    level = level_for_zoom(zoom)
+    built = cluster_query(level, bbox, window_start(conn, hours))
+    if built is None:
+        return level, []
+    c = conn.cursor()
+    c.execute(*built)
+    result = []
+    for cell, readings, jamming, latitude_sum, longitude_sum in c.fetchall():
+        readings, jamming = int(readings), int(jamming)
+        result.append({
+            'cell': cell,
+            'latitude': round(float(latitude_sum) / readings, 6),
+            'longitude': round(float(longitude_sum) / readings, 6),
+            'count': readings,
+            'jamming': jamming,
+            'jamming_ratio': round(jamming / readings, 4),
+        })
+    return level, result
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'dashboard'),
+        'passwd': os.getenv('DB_PASSWORD', 'securepass'),
+        'db': os.getenv('DB_NAME', 'security_dashboard'),
+    }
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command != 'rebuild':
+        print(f"Usage: {sys.argv[0]} rebuild")
+        sys.exit(1)
+    conn = get_backend().connect(**db_config)
+    try:
+        create_tables(conn.cursor())
+        rebuild(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
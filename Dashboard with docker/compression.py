@@ -0,0 +1,108 @@
+"""
+Negotiated gzip/brotli compression for dynamic responses
+
+Buffered responses above COMPRESS_MIN_SIZE whose type compresses well
+(JSON, HTML, CSS, JS, text) are encoded with the best coding the client
+accepts: brotli when the ``brotli`` package is installed, gzip otherwise.
+Streamed responses (exports, SSE) and files that already carry a
+Content-Encoding (the precompressed assets) are left alone.
+
+The response cache hands the same page to every poller, so compressed
+bodies are kept in a small per-worker LRU keyed by a digest of the
+uncompressed bytes instead of being compressed again on every hit. ETags
+become weak, since the encoded bytes differ from the identity ones;
+If-None-Match checks use the weak comparison.
+"""
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+# Brotli's top qualities are for build-time assets; 4-5 beats gzip -6 at similar speed
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+CACHE_ENTRIES = int(os.getenv('COMPRESS_CACHE_ENTRIES', 256))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml',
+                      'image/svg+xml')
+
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings, encodings=None):
+    """Best of ``encodings`` the client accepts (werkzeug Accept), or None"""
+    for encoding in available_encodings() if encodings is None else encodings:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+class ResponseCompressor:
+    """Compresses eligible responses in an ``after_request`` hook"""
+
+    def __init__(self, min_size=MIN_SIZE, cache_entries=CACHE_ENTRIES):
+        self.min_size = min_size
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, data, encoding):
+        if not self.cache_entries:
+            return compress(data, encoding)
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+        body = compress(data, encoding)
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return body
+
+    def process(self, request, response):
+        """Return ``response``, compressed in place when that is worthwhile"""
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or not is_compressible(response.mimetype)
+                or request.method == 'HEAD'):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        body = self._cached(data, encoding)
+        if len(body) >= len(data):
+            return response
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
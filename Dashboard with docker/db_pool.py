@@ -0,0 +1,301 @@
+"""
+Database connection pool for the Security Dashboard
+
+Each gunicorn worker keeps a small, bounded set of open MySQL connections
+instead of paying the TCP + auth handshake on every request. Connections
+are validated on checkout, dropped when MySQL goes away, and re-created on
+the next checkout so the app recovers on its own after a database restart.
+With DB_BACKEND=sqlite the same pool holds open SQLite connections, which
+keeps their prepared statement caches warm.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(Exception):
+    """Raised when a connection cannot be handed out"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections for one process"""
+
+    def __init__(self, db_config, max_size=5, timeout=5.0, validate_after=5.0,
+                 max_lifetime=3600, connect=None, observer=None, backend=None):
+        self.db_config = db_config
+        self.max_size = max_size
+        self.timeout = timeout
+        self.validate_after = validate_after  # seconds idle before a ping on checkout
+        self.max_lifetime = max_lifetime      # recycle connections older than this
+        self.backend = backend or get_backend()
+        self._connect = connect or self.backend.connect
+        # Optional timing hook, called as observer(event, statement, value) with
+        # event 'connect', 'checkout' or 'query' (seconds) or 'rows' (a count)
+        self.observer = observer
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._size = 0
+        self._created = {}
+        self._pid = os.getpid()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'connect_time_total': 0.0,
+            'connect_errors': 0,
+            'validation_failures': 0,
+            'discarded': 0,
+        }
+
+    def _check_fork(self):
+        """Drop inherited connections after gunicorn forks a worker"""
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        # Sockets opened by the master must never be used by a child, so the
+        # idle connections are forgotten rather than closed.
+        self._idle.clear()
+        self._created.clear()
+        self._size = 0
+        self._pid = pid
+        self._stats = self._empty_stats()
+
+    def _new_connection(self):
+        start = time.monotonic()
+        try:
+            conn = self._connect(**self.db_config)
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._stats['connect_errors'] += 1
+                self._lock.notify()
+            raise
+        elapsed = time.monotonic() - start
+        if self.observer:
+            self.observer('connect', None, elapsed)
+        with self._lock:
+            self._stats['connects'] += 1
+            self._stats['connect_time_total'] += elapsed
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _is_usable(self, conn, created_at, last_used):
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - last_used < self.validate_after:
+            return True
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['validation_failures'] += 1
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def checkout(self):
+        """Take a validated connection from the pool, opening one if allowed"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = None
+        while True:
+            with self._lock:
+                self._check_fork()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    if waited is None:
+                        waited = time.monotonic()
+                    self._lock.wait(remaining)
+
+                if waited is not None:
+                    wait_time = time.monotonic() - waited
+                    self._stats['waits'] += 1
+                    self._stats['wait_time_total'] += wait_time
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+                    waited = None
+
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    conn = None
+
+            if conn is None:
+                conn = self._new_connection()
+                break
+
+            if self._is_usable(conn, created_at, last_used):
+                break
+            # Stale connection: throw it away and try again
+            self._discard(conn)
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+        if self.observer:
+            self.observer('checkout', None, time.monotonic() - started)
+        return conn
+
+    def release(self, conn):
+        """Return a healthy connection to the pool"""
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            created_at = self._created.get(id(conn), time.monotonic())
+            # Most recently used first so idle connections age out naturally
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._lock.notify()
+
+    def _discard(self, conn):
+        """Close a broken connection and free its slot"""
+        self._close_quietly(conn)
+        with self._lock:
+            self._created.pop(id(conn), None)
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block
+
+        Uncommitted work is rolled back before the connection goes back to the
+        pool. Connections that lost their link to MySQL are discarded so the
+        next checkout reconnects.
+        """
+        conn = self.checkout()
+        try:
+            yield _TimedConnection(conn, self.observer) if self.observer else conn
+        except self.backend.OperationalError as e:
+            if self.backend.is_connection_lost(e):
+                logger.warning(f"Dropping lost database connection: {e}")
+                self._discard(conn)
+            else:
+                self._rollback_and_release(conn)
+            raise
+        except BaseException:
+            self._rollback_and_release(conn)
+            raise
+        else:
+            self._rollback_and_release(conn)
+
+    def _rollback_and_release(self, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection (used on worker shutdown)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Snapshot of pool usage and checkout-wait metrics for this worker"""
+        with self._lock:
+            self._check_fork()
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+            stats['pid'] = self._pid
+        stats['wait_time_avg'] = (
+            stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        )
+        return stats
+
+
+class _TimedConnection:
+    """Connection wrapper whose cursors report query time and rows read"""
+
+    def __init__(self, conn, observer):
+        self._conn = conn
+        self._observer = observer
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs), self._observer)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _TimedCursor:
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+        self._statement = None
+
+    def _timed(self, method, query, args):
+        self._statement = query
+        start = time.monotonic()
+        try:
+            return method(query, args)
+        finally:
+            self._observer('query', query, time.monotonic() - start)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def _count(self, rows):
+        if rows:
+            self._observer('rows', self._statement, len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._observer('rows', self._statement, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._count(self._cursor.fetchmany())
+        return self._count(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,206 @@
+"""
+Shape-preserving downsampling of GPS tracks for /api/gps?max_points= and
+/api/gps/track/<device_id>
+
+Each device's readings, in time order, are reduced with Largest-Triangle-
+Three-Buckets (LTTB): the track is split into equal-count buckets, and
+from each bucket the reading that forms the largest triangle with the
+previously kept reading and the next bucket's average position is kept.
+Triangles are measured on (longitude, latitude), so turns and excursions
+of the path survive while the straight or stationary stretches in between
+thin out. The first and last readings are always kept. So is every
+jamming-flagged reading, on top of the LTTB budget.
+
+The track export uses Douglas-Peucker instead, which takes an error
+bound rather than a point budget: a reading is dropped only if the
+simplified line passes within ``tolerance`` metres of it. Distances are
+measured on a local equirectangular projection, accurate to well under a
+percent over the extent of one track. Jamming-flagged readings are kept
+here too.
+
+With numpy installed, the per-row work (bucket averages, triangle areas,
+argmax, segment distances) is vectorized; Python only steps once per kept
+point, so the cost of a million-row window is dominated by reading it.
+Without numpy the same selection runs in plain Python.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many points LTTB has nothing to choose between
+MIN_THRESHOLD = 3
+
+
+def allocate(counts, max_points):
+    """Split ``max_points`` over tracks in proportion to their sizes
+
+    ``counts`` maps a track key to its number of readings. Every track
+    gets at least MIN_THRESHOLD points (or all of them if it has fewer).
+    """
+    total = sum(counts.values())
+    budgets = {}
+    for key, count in counts.items():
+        share = round(max_points * count / total) if total else 0
+        budgets[key] = min(count, max(MIN_THRESHOLD, share))
+    return budgets
+
+
+def _bucket_bounds(n, threshold):
+    # Bucket i spans [bounds[i], bounds[i + 1]); the first and last points
+    # sit outside the threshold - 2 buckets
+    every = (n - 2) / (threshold - 2)
+    return [int(i * every) + 1 for i in range(threshold - 1)]
+
+
+def _lttb_numpy(x, y, threshold):
+    n = len(x)
+    bounds = np.array(_bucket_bounds(n, threshold), dtype=np.int64)
+    counts = np.diff(bounds)
+    # Average of every bucket at once; bucket i looks ahead to bucket i + 1,
+    # and the last bucket to the final point
+    avg_x = np.add.reduceat(x[:n - 1], bounds[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], bounds[:-1]) / counts
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        ax, ay = x[a], y[a]
+        # Twice the triangle area (a, candidate, next average) for the whole bucket
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def _lttb_python(x, y, threshold):
+    n = len(x)
+    bounds = _bucket_bounds(n, threshold)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        next_lo, next_hi = (bounds[i + 1], bounds[i + 2]) if i + 2 < len(bounds) else (n - 1, n)
+        cx = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        cy = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        ax, ay = x[a], y[a]
+        a = max(range(lo, hi), key=lambda j: abs((ax - cx) * (y[j] - ay) - (ax - x[j]) * (cy - ay)))
+        selected.append(a)
+    selected.append(n - 1)
+    return selected
+
+
+def lttb(x, y, threshold):
+    """Indices of the ``threshold`` points LTTB keeps, in order"""
+    n = len(x)
+    if threshold >= n or threshold < MIN_THRESHOLD:
+        return list(range(n))
+    if np is not None:
+        return _lttb_numpy(np.asarray(x, dtype=float), np.asarray(y, dtype=float), threshold).tolist()
+    return _lttb_python([float(v) for v in x], [float(v) for v in y], threshold)
+
+
+def decimate_track(longitudes, latitudes, keep, threshold):
+    """Indices to keep from one time-ordered track
+
+    ``keep`` flags readings that must survive regardless (jamming); they
+    are added to the LTTB selection, so a track with many of them returns
+    more than ``threshold`` points.
+    """
+    selected = lttb(longitudes, latitudes, threshold)
+    if np is not None:
+        return np.union1d(selected, np.flatnonzero(np.asarray(keep, dtype=bool))).tolist()
+    chosen = set(selected)
+    chosen.update(i for i, flag in enumerate(keep) if flag)
+    return sorted(chosen)
+
+
+# Metres per degree of latitude, and of longitude at the equator
+METRES_PER_DEGREE_LAT = 110574.0
+METRES_PER_DEGREE_LON = 111320.0
+
+
+def _project(longitudes, latitudes):
+    """(x, y) in metres around the track's mean latitude"""
+    if np is not None:
+        lon = np.asarray(longitudes, dtype=float)
+        lat = np.asarray(latitudes, dtype=float)
+        scale = METRES_PER_DEGREE_LON * math.cos(math.radians(float(lat.mean())))
+        return lon * scale, lat * METRES_PER_DEGREE_LAT
+    lon = [float(v) for v in longitudes]
+    lat = [float(v) for v in latitudes]
+    scale = METRES_PER_DEGREE_LON * math.cos(math.radians(sum(lat) / len(lat)))
+    return [v * scale for v in lon], [v * METRES_PER_DEGREE_LAT for v in lat]
+
+
+def _farthest_numpy(x, y, lo, hi):
+    # Distance of every point strictly between lo and hi to the segment
+    # lo-hi (not the infinite line, so a track that returns to its start
+    # still measures its excursion)
+    dx, dy = x[hi] - x[lo], y[hi] - y[lo]
+    px, py = x[lo + 1:hi] - x[lo], y[lo + 1:hi] - y[lo]
+    length2 = dx * dx + dy * dy
+    if length2 > 0:
+        t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0)
+        px, py = px - t * dx, py - t * dy
+    distances = np.hypot(px, py)
+    i = int(distances.argmax())
+    return lo + 1 + i, float(distances[i])
+
+
+def _farthest_python(x, y, lo, hi):
+    dx, dy = x[hi] - x[lo], y[hi] - y[lo]
+    length2 = dx * dx + dy * dy
+    best, farthest = lo + 1, -1.0
+    for j in range(lo + 1, hi):
+        px, py = x[j] - x[lo], y[j] - y[lo]
+        if length2 > 0:
+            t = min(1.0, max(0.0, (px * dx + py * dy) / length2))
+            px, py = px - t * dx, py - t * dy
+        distance = math.hypot(px, py)
+        if distance > farthest:
+            best, farthest = j, distance
+    return best, farthest
+
+
+def douglas_peucker(x, y, tolerance):
+    """Sorted indices of the points Douglas-Peucker keeps at ``tolerance``
+
+    Iterative, so a long track can't exhaust the recursion limit.
+    """
+    n = len(x)
+    if n < 3:
+        return list(range(n))
+    farthest = _farthest_numpy if np is not None else _farthest_python
+    kept = [0, n - 1]
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        i, distance = farthest(x, y, lo, hi)
+        if distance > tolerance:
+            kept.append(i)
+            stack.append((lo, i))
+            stack.append((i, hi))
+    return sorted(kept)
+
+
+def simplify_track(longitudes, latitudes, keep, tolerance):
+    """Indices to keep from one time-ordered track, ``tolerance`` in metres
+
+    ``keep`` flags readings that must survive regardless (jamming).
+    """
+    if not len(longitudes):
+        return []
+    x, y = _project(longitudes, latitudes)
+    chosen = set(douglas_peucker(x, y, tolerance))
+    chosen.update(i for i, flag in enumerate(keep) if flag)
+    return sorted(chosen)
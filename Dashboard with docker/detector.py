@@ -1,8 +1,10 @@
 from scapy.all import *
 from datetime import datetime, timedelta
-import uuid
-import MySQLdb
 import time
+from ingest_hooks import after_insert
+from storage import get_backend
+from migrations import migrate, LegacyLayoutError
+from ids import new_id, to_binary
 
 # Configuration
 iface = "wlan1"
@@ -10,11 +12,12 @@ threshold = 5
 time_window = 5
 deauth_times = []
 last_saved_attack = None  # Track the last saved attack to avoid duplicates
+db_conn = None  # Kept open between inserts (DB_BACKEND=mysql|sqlite)
 
 # Dictionary: BSSID (MAC) → SSID
 ssid_map = {}
 
-# MySQL database configuration
+# MySQL database configuration (ignored when DB_BACKEND=sqlite)
 db_config = {
     'host': 'localhost',
     'user': 'dashboard',
@@ -22,8 +25,24 @@ db_config = {
     'db': 'security_dashboard',
 }
 
+def get_connection():
+    """Open the database connection on first use and reuse it afterwards"""
+    global db_conn
+    if db_conn is None:
+        db_conn = get_backend().connect(**db_config)
+    return db_conn
+
+def drop_connection():
+    global db_conn
+    if db_conn is not None:
+        try:
+            db_conn.close()
+        except Exception:
+            pass
+        db_conn = None
+
 def save_to_database(attack_data):
-    """Save attack data to MySQL database"""
+    """Save attack data to the dashboard database"""
     global last_saved_attack
     
     try:
@@ -39,13 +58,25 @@ def save_to_database(attack_data):
                 # Duplicate attack (same source/dest within 2 seconds), skip logging
                 return True
         
-        conn = MySQLdb.connect(**db_config)
+        conn = get_connection()
         cursor = conn.cursor()
         
-        # Generate a unique ID for this attack
-        attack_id = str(uuid.uuid4())
+        # Generate a unique, time-ordered ID for this attack
+        attack_id = new_id()
         
         # Insert the attack record into the network_attacks table
+        columns = ('id', 'timestamp', 'alert_type', 'attacker_bssid', 'attacker_ssid',
+                   'destination_bssid', 'destination_ssid', 'attack_count')
+        row = (
+            attack_id,
+            attack_data["timestamp"],
+            attack_data["alert_type"],
+            attack_data["attacker_bssid"],
+            attack_data["attacker_ssid"],
+            attack_data["destination_bssid"],
+            attack_data["destination_ssid"],
+            attack_data["count"]
+        )
         cursor.execute(
             """
             INSERT INTO network_attacks 
@@ -53,20 +84,13 @@ def save_to_database(attack_data):
              destination_bssid, destination_ssid, attack_count)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (
-                attack_id,
-                attack_data["timestamp"],
-                attack_data["alert_type"],
-                attack_data["attacker_bssid"],
-                attack_data["attacker_ssid"],
-                attack_data["destination_bssid"],
-                attack_data["destination_ssid"],
-                attack_data["count"]
-            )
+            (to_binary(attack_id),) + row[1:]
         )
         
+        # Keep dashboard stats, ETags and live streams in step with this insert
+        after_insert(cursor, 'network_attacks', columns, [row])
+        
         conn.commit()
-        conn.close()
         print(f"[+] Attack data saved to database with ID: {attack_id}")
         
         # Remember this attack to avoid duplicates
@@ -74,6 +98,8 @@ def save_to_database(attack_data):
         return True
     except Exception as e:
         print(f"[!] Database error: {str(e)}")
+        # Reconnect on the next attack rather than reuse a broken connection
+        drop_connection()
         return False
 
 def packet_handler(pkt):
@@ -139,7 +165,16 @@ def packet_handler(pkt):
             save_to_database(log_entry)
 
 
+try:
+    migrate(get_connection())
+except LegacyLayoutError as e:
+    print(f"[!] {e}")
+    raise SystemExit(1)
+except Exception as e:
+    print(f"[!] Could not prepare database tables: {str(e)}")
+    drop_connection()
+
 print(f"[*] Sniffing on {iface}... Looking for deauth frames and SSIDs.")
-print(f"[*] Attacks will be logged directly to MySQL database in real-time.")
+print(f"[*] Attacks will be logged directly to the {get_backend().name} database in real-time.")
 print(f"[*] Attack threshold is {threshold} deauth packets within {time_window} seconds.")
 sniff(iface=iface, prn=packet_handler, store=0)
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Server-Sent Events fan-out for live dashboard updates
+
+Each gunicorn worker runs a single change-feed thread. While anyone is
+subscribed it checks the ``data_versions`` counters once per interval and
+only queries tables that actually changed, reading rows past its own
+``(timestamp, id)`` cursor. New rows are copied onto the in-memory queue of
+every local subscriber, so the database sees one cheap poll per worker no
+matter how many browser tabs are connected.
+
+Like the delta cursors (see pagination.py), each poll also re-reads the
+DELTA_OVERLAP seconds before the cursor, so rows committed after the
+cursor passed their timestamp are still pushed. A Position remembers the
+ids delivered inside that window, so no row goes out twice.
+"""
+import os
+import json
+import time
+import queue
+import base64
+import logging
+import datetime
+import threading
+
+from pagination import (PaginationError, build_delta_query, build_overlap_query, encode_cursor, cursor_key,
+                        row_key, TABLE_COLUMNS, DELTA_OVERLAP)
+
+logger = logging.getLogger(__name__)
+
+# Public topic name -> table
+TOPICS = {
+    'alerts': 'alerts',
+    'gps': 'gps_data',
+    'deauth': 'network_attacks',
+}
+
+
+def encode_event_id(positions):
+    """Pack the per-topic cursors of a subscriber into one Last-Event-ID"""
+    raw = json.dumps(positions, sort_keys=True, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_event_id(event_id):
+    """Inverse of encode_event_id; returns {} for a missing or garbled id"""
+    if not event_id:
+        return {}
+    try:
+        padded = event_id + '=' * (-len(event_id) % 4)
+        positions = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return {}
+    if not isinstance(positions, dict):
+        return {}
+    return {topic: cursor for topic, cursor in positions.items()
+            if topic in TOPICS and isinstance(cursor, str) and _valid_cursor(cursor)}
+
+
+def _valid_cursor(cursor):
+    try:
+        cursor_key(cursor)
+        return True
+    except PaginationError:
+        return False
+
+
+def format_event(event, data, event_id=None):
+    """Render one SSE frame"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    for line in data.splitlines() or ['']:
+        lines.append(f"data: {line}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class Position:
+    """Newest row delivered for one topic, plus the ids delivered within DELTA_OVERLAP of it"""
+
+    def __init__(self, cursor=None):
+        self.cursor = cursor
+        self.key = cursor_key(cursor) if cursor else None
+        self._recent = {}  # id -> timestamp, in delivery order
+        self._overlap = datetime.timedelta(seconds=DELTA_OVERLAP)
+
+    def accept(self, row):
+        """Record ``row`` as delivered; False if it already was or is too old to be new"""
+        key = row_key(row)
+        row_id = str(row['id'])
+        if row_id in self._recent:
+            return False
+        if self.key is not None and key[0] < self.key[0] - self._overlap:
+            # Older than any re-read window; it went out with an earlier batch
+            return False
+        self._recent[row_id] = key[0]
+        if self.key is None or key > self.key:
+            self.key = key
+            self.cursor = encode_cursor(row)
+            horizon = key[0] - self._overlap
+            # Mostly in time order, so expired ids sit at the front
+            while self._recent:
+                oldest = next(iter(self._recent))
+                if self._recent[oldest] >= horizon:
+                    break
+                del self._recent[oldest]
+        return True
+
+
+class Subscriber:
+    """One connected client: the topics it wants and its pending rows"""
+
+    def __init__(self, topics, max_queue):
+        self.topics = set(topics)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, topic, row):
+        if topic not in self.topics or self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((topic, row))
+        except queue.Full:
+            # Too slow to keep up; the stream ends and the browser resumes
+            # from its Last-Event-ID, which replays what it missed.
+            self.overflowed = True
+
+
+class ChangeFeed:
+    """Per-worker poller that fans new rows out to local subscribers"""
+
+    def __init__(self, pool, interval=1.0, batch_size=500, max_queue=1000):
+        self.pool = pool
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._positions = {}
+        self._versions = {}
+
+    def subscribe(self, topics):
+        """Register a subscriber and make sure the poller is running"""
+        subscriber = Subscriber(topics, self.max_queue)
+        with self._lock:
+            if self._pid != os.getpid() or not (self._thread and self._thread.is_alive()):
+                self._pid = os.getpid()
+                self._subscribers = set()
+                self._positions = {}
+                self._versions = {}
+                self._thread = threading.Thread(target=self._run, name='sse-change-feed', daemon=True)
+                self._thread.start()
+            self._subscribers.add(subscriber)
+        self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def latest_cursor(self, topic):
+        """Cursor of the newest row currently in ``topic`` (None if empty)"""
+        table = TOPICS[topic]
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT timestamp, BIN_TO_UUID(id) FROM {table} ORDER BY timestamp DESC, id DESC LIMIT 1")
+            latest = c.fetchone()
+        return encode_cursor({'timestamp': latest[0], 'id': latest[1]}) if latest else None
+
+    def fetch_after(self, topic, cursor, limit):
+        """Rows of ``topic`` newer than ``cursor`` (oldest first), for catch-up"""
+        table = TOPICS[topic]
+        query, params = build_delta_query(
+            table, list(TABLE_COLUMNS[table]), [], [], cursor, None, limit
+        )
+        with self.pool.connection() as conn:
+            c = conn.cursor(self.pool.backend.dict_cursor)
+            c.execute(query, params)
+            rows = list(c.fetchall())
+        has_more = len(rows) > limit
+        return rows[:limit], has_more
+
+    def fetch_overlap(self, topic, cursor, limit):
+        """Rows of ``topic`` within DELTA_OVERLAP before ``cursor``, oldest first"""
+        if not cursor:
+            return []
+        table = TOPICS[topic]
+        query, params = build_overlap_query(table, list(TABLE_COLUMNS[table]), [], [], cursor, limit)
+        with self.pool.connection() as conn:
+            c = conn.cursor(self.pool.backend.dict_cursor)
+            c.execute(query, params)
+            rows = list(c.fetchall())
+        rows.reverse()
+        return rows
+
+    def start_position(self, topic, cursor=None):
+        """Position at ``cursor`` (default: the newest row) with its overlap marked as delivered"""
+        position = Position(cursor or self.latest_cursor(topic))
+        for row in self.fetch_overlap(topic, position.cursor, self.batch_size):
+            position.accept(row)
+        return position
+
+    def read_new(self, topic, position, limit):
+        """Rows of ``topic`` not yet delivered at ``position``, recording them there
+
+        Late-committed rows inside the overlap window come first, then rows
+        past the cursor (up to ``limit``). Returns (rows, more rows pending).
+        """
+        rows = [row for row in self.fetch_overlap(topic, position.cursor, limit) if position.accept(row)]
+        newer, has_more = self.fetch_after(topic, position.cursor, limit)
+        rows.extend(row for row in newer if position.accept(row))
+        return rows, has_more
+
+    # ------------------------------------------------------------------
+    # Poller thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                # Nobody listening: forget positions and start fresh next time
+                self._positions = {}
+                self._versions = {}
+                continue
+            try:
+                self._poll(subscribers)
+            except Exception as e:
+                logger.error(f"Change feed poll failed: {e}")
+                time.sleep(self.interval)
+
+    def _poll(self, subscribers):
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT table_name, version FROM data_versions")
+            versions = dict(c.fetchall())
+        for topic, table in TOPICS.items():
+            if topic not in self._positions:
+                self._positions[topic] = self.start_position(topic)
+                self._versions[table] = versions.get(table, 0)
+
+        for topic, table in TOPICS.items():
+            if versions.get(table, 0) == self._versions.get(table):
+                continue
+            self._versions[table] = versions.get(table, 0)
+            if not any(topic in s.topics for s in subscribers):
+                # Re-read the position once someone subscribes to this topic
+                self._positions.pop(topic, None)
+                continue
+            has_more = True
+            while has_more:
+                rows, has_more = self.read_new(topic, self._positions[topic], self.batch_size)
+                for row in rows:
+                    for subscriber in subscribers:
+                        subscriber.offer(topic, row)
@@ -1,8 +1,7 @@
-from flask import Flask, request, jsonify, render_template
+from flask import (Flask, Response, request, jsonify, render_template, stream_with_context, g,
+                   send_file, abort)
 from flask_cors import CORS
-import MySQLdb
 import datetime
-import uuid
 import threading
 import time
 import os
@@ -10,21 +9,59 @@ import json
 import logging
 from dotenv import load_dotenv
 import secrets
+import queue
+import hashlib
+import mimetypes
+from urllib.parse import urlencode
+from jinja2 import TemplateNotFound
+from werkzeug.http import unquote_etag
+from werkzeug.security import safe_join
+from db_pool import ConnectionPool, PoolError
+from migrations import migrate, LegacyLayoutError
+from ids import new_id, bind_rows
+from ingest_buffer import WriteBehindBuffer, BufferFull
+from event_stream import (ChangeFeed, Position, TOPICS, encode_event_id, decode_event_id,
+                          format_event)
+from ingest_hooks import after_insert, after_clear
+import rollups
+from retention import RetentionJob, parse_policy
+from rate_limiter import SharedRateLimiter
+from request_logging import setup_logging, parse_sampling, RequestSampler
+from response_cache import ResponseCache, CachedResponse
+from serializers import dumps, encode_rows, encode_lines, encode_row, encode_columnar
+from compression import ResponseCompressor
+import assets
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE, fingerprint
+from pagination import (PaginationError, MAX_PAGE_SIZE, parse_limit, parse_fields, build_page_query,
+                        split_page, build_delta_query, build_overlap_query, build_window_query, split_delta,
+                        encode_cursor)
+import decimation
+import spatial
+import clusters
+import polyline
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent_monkey = None
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
+# Configure logging (queued, written by a background thread as compact JSON)
+setup_logging(
+    log_file=os.getenv('LOG_FILE', 'app.log'),
+    level=getattr(logging, os.getenv('LOG_LEVEL', 'info').upper(), logging.INFO)
 )
 logger = logging.getLogger(__name__)
 
+# Per-route request log sampling; errors (status >= 400) are always logged
+request_sampler = RequestSampler(parse_sampling(os.getenv(
+    'REQUEST_LOG_SAMPLING',
+    'POST /api/alerts=0.01,POST /api/alerts/batch=0.01,POST /api/gps=0.01,'
+    'POST /api/deauth_logs=0.01,default=1'
+)))
+
 # Correct static folder configuration
 app = Flask(__name__, 
             static_folder='templates/static',
@@ -32,51 +69,152 @@ app = Flask(__name__,
 
 # Security configuration
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(32))
-CORS(app, origins=os.getenv('CORS_ORIGINS', 'localhost:80,localhost:5050').split(','))
+CORS(app, origins=os.getenv('CORS_ORIGINS', 'localhost:80,localhost:5050').split(','),
+     expose_headers=['X-Next-Cursor', 'X-Latest-Cursor', 'X-Has-More', 'X-Source-Rows', 'Link'])
 
-# MySQL Database configuration from environment
+# Database configuration from environment (host and credentials are MySQL only)
 db_config = {
     'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
     'user': os.getenv('DB_USER', 'dashboard'),
     'passwd': os.getenv('DB_PASSWORD', 'securepass'),
     'db': os.getenv('DB_NAME', 'security_dashboard'),
 }
 
-# Rate limiting storage
-request_counts = {}
-REQUEST_LIMIT = 100  # requests per minute
-BLOCKED_IPS = set()
+# Prometheus metrics; each worker writes its own file and /metrics merges them
+metrics = MetricsRegistry(
+    directory=os.getenv('METRICS_DIR') or None,
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0)),
+)
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Time spent handling a request')
+REQUESTS = metrics.counter('http_requests_total', 'Requests handled, by route and status')
+DB_QUERY_SECONDS = metrics.histogram('db_query_duration_seconds', 'Query execution time per statement')
+DB_ROWS = metrics.counter('db_rows_returned_total', 'Rows fetched per statement')
+DB_CHECKOUT_SECONDS = metrics.histogram('db_pool_checkout_seconds', 'Time to obtain a pooled connection')
+DB_CONNECT_SECONDS = metrics.histogram('db_connect_seconds', 'Time to open a new database connection')
+INGEST_ROWS = metrics.counter('ingest_rows_total', 'Rows committed per table and ingest path')
+
+def observe_db(event, statement, value):
+    """Connection pool timing hook feeding the db_* metrics"""
+    if event == 'query':
+        DB_QUERY_SECONDS.observe(value, statement=fingerprint(statement))
+    elif event == 'rows':
+        DB_ROWS.inc(value, statement=fingerprint(statement))
+    elif event == 'checkout':
+        DB_CHECKOUT_SECONDS.observe(value)
+    elif event == 'connect':
+        DB_CONNECT_SECONDS.observe(value)
+
+# Per-worker connection pool (each gunicorn worker gets its own after fork)
+db_pool = ConnectionPool(
+    db_config,
+    max_size=int(os.getenv('DB_POOL_SIZE', 5)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+    validate_after=float(os.getenv('DB_POOL_VALIDATE_AFTER', 5)),
+    max_lifetime=int(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+    observer=observe_db,
+)
+
+# Read-through cache for list and stats responses, shared by all workers.
+# Writes through this app invalidate it at once; other writers (detector.py,
+# the GPS scripts) show up once the TTL runs out.
+response_cache = ResponseCache(
+    directory=os.getenv('RESPONSE_CACHE_DIR') or None,
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 5)),
+    max_entry_bytes=int(os.getenv('RESPONSE_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024)),
+    fill_timeout=float(os.getenv('RESPONSE_CACHE_FILL_TIMEOUT', 10)),
+)
+
+# gzip/brotli for buffered responses; hashed static files are served precompressed
+compressor = ResponseCompressor()
+asset_manifest = assets.load_manifest(app.static_folder)
+
+# Rendered dashboard pages, per worker: (template, script root) -> (html, etag)
+page_cache = {}
+
+def rows_committed(table, rows, mode='direct'):
+    """Bookkeeping once ingested rows are committed: count them, drop cached reads"""
+    INGEST_ROWS.inc(len(rows), table=table, mode=mode)
+    response_cache.invalidate(table)
+
+def flush_committed(table, rows):
+    rows_committed(table, rows, mode='write_behind')
+
+# Optional write-behind mode: sensor POSTs are queued and flushed in batches
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+ingest_buffer = WriteBehindBuffer(
+    db_pool,
+    spill_dir=os.getenv('WRITE_BEHIND_SPILL_DIR', 'logs/spill'),
+    max_queue=int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000)),
+    flush_size=int(os.getenv('WRITE_BEHIND_FLUSH_SIZE', 500)),
+    flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 1.0)),
+    before_commit=after_insert,
+    after_commit=flush_committed,
+)
+
+# Partition upkeep and data retention; each pass runs in one worker only
+retention_job = RetentionJob(
+    db_pool,
+    parse_policy(os.getenv('DATA_RETENTION', '')),
+    interval=os.getenv('PARTITION_INTERVAL', 'day'),
+    ahead=int(os.getenv('PARTITIONS_AHEAD', 7)),
+    run_every=float(os.getenv('RETENTION_CHECK_INTERVAL', 3600)),
+    state_path=os.getenv('RETENTION_STATE_FILE') or None,
+    on_change=response_cache.invalidate,
+)
+
+# One change-feed poller per worker fans new rows out to SSE subscribers
+change_feed = ChangeFeed(
+    db_pool,
+    interval=float(os.getenv('SSE_POLL_INTERVAL', 1.0)),
+    max_queue=int(os.getenv('SSE_SUBSCRIBER_QUEUE', 1000)),
+)
+
+# Alert ingest settings
+VALID_SEVERITIES = ['low', 'medium', 'high', 'critical']
+ALERT_COLUMNS = ('id', 'tool_name', 'alert_type', 'severity', 'description', 'raw_data',
+                 'source_ip', 'timestamp')
+GPS_COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+DEAUTH_COLUMNS = ('id', 'timestamp', 'alert_type', 'attacker_bssid', 'attacker_ssid',
+                  'destination_bssid', 'destination_ssid', 'attack_count')
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 500))
+TRACK_TOLERANCE = float(os.getenv('TRACK_TOLERANCE', 5.0))  # metres, /api/gps/track default
+
+# Server-Sent Events settings
+SSE_ENABLED = os.getenv('SSE_ENABLED', 'auto').lower()         # auto, true or false
+SSE_KEEPALIVE = float(os.getenv('SSE_KEEPALIVE', 15))          # seconds between comment pings
+SSE_MAX_DURATION = float(os.getenv('SSE_MAX_DURATION', 300))   # reconnect (and resume) after this
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))
+# Open streams per worker, 0 for no cap. Each stream holds a gthread thread,
+# so gunicorn.conf.py sets this to half the threads under that profile.
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 0))
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS) if SSE_MAX_STREAMS > 0 else None
+
+# Last time this worker pruned expired minute rollups
+last_rollup_prune = 0.0
+rollup_prune_lock = threading.Lock()
+
+# Rate limiting shared by all workers through a memory-mapped table
+REQUEST_LIMIT = int(os.getenv('RATE_LIMIT_PER_MINUTE', 100))  # requests per minute
+rate_limiter = SharedRateLimiter(
+    path=os.getenv('RATE_LIMIT_STATE_FILE') or None,
+    limit=REQUEST_LIMIT,
+    window=60,
+    block_seconds=int(os.getenv('RATE_LIMIT_BLOCK_SECONDS', 300)),
+    capacity=int(os.getenv('RATE_LIMIT_CAPACITY', 65536)),
+)
 
 def rate_limit_check(ip):
-    """Check if IP is rate limited"""
-    if ip in BLOCKED_IPS:
-        return False
-    
-    current_time = time.time()
-    if ip not in request_counts:
-        request_counts[ip] = []
-    
-    # Remove old requests (older than 1 minute)
-    request_counts[ip] = [req_time for req_time in request_counts[ip] 
-                         if current_time - req_time < 60]
-    
-    # Check if limit exceeded
-    if len(request_counts[ip]) >= REQUEST_LIMIT:
-        BLOCKED_IPS.add(ip)
-        logger.warning(f"Rate limit exceeded for IP: {ip}")
-        return False
-    
-    request_counts[ip].append(current_time)
-    return True
+    """Check if IP is rate limited
 
-def get_db_connection():
-    """Get database connection with error handling"""
-    try:
-        conn = MySQLdb.connect(**db_config)
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
+    Returns (allowed, retry_after_seconds). Exceeding the limit blocks the
+    IP for RATE_LIMIT_BLOCK_SECONDS, after which it may send again.
+    """
+    allowed, retry_after = rate_limiter.check(ip)
+    if not allowed and retry_after == rate_limiter.block_seconds:
+        logger.warning(f"Rate limit exceeded for IP: {ip}")
+    return allowed, retry_after
 
 def validate_input(data, required_fields):
     """Validate input data"""
@@ -89,90 +227,141 @@ def validate_input(data, required_fields):
     
     return True, "Valid"
 
-# Database setup
-def init_db():
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Failed to initialize database")
-        return
+def prepare_alert(data, client_ip):
+    """Validate one alert and build its row for the alerts table
+
+    Returns (row, None) on success or (None, error_message) when invalid.
+    """
+    # Validate required fields
+    is_valid, message = validate_input(data, ['tool_name', 'alert_type', 'severity'])
+    if not is_valid:
+        return None, message
+    
+    # Validate severity level
+    if data['severity'] not in VALID_SEVERITIES:
+        return None, 'Invalid severity level'
     
     try:
-        c = conn.cursor()
-
-        # Alerts table with improved schema
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS alerts (
-            id VARCHAR(36) PRIMARY KEY,
-            tool_name VARCHAR(100) NOT NULL,
-            alert_type VARCHAR(100) NOT NULL,
-            severity ENUM('low', 'medium', 'high', 'critical') NOT NULL,
-            description TEXT,
-            raw_data TEXT,
-            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            source_ip VARCHAR(45),
-            INDEX idx_timestamp (timestamp),
-            INDEX idx_severity (severity),
-            INDEX idx_tool_name (tool_name)
-        )
-        ''')
-
-        # GPS data table with enhanced schema
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS gps_data (
-            id VARCHAR(36) PRIMARY KEY,
-            latitude DECIMAL(10,8) NOT NULL,
-            longitude DECIMAL(11,8) NOT NULL,
-            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            device_id VARCHAR(100),
-            satellites INT DEFAULT 0,
-            hdop DECIMAL(4,2) DEFAULT 99.99,
-            jamming_detected BOOLEAN DEFAULT FALSE,
-            INDEX idx_timestamp (timestamp),
-            INDEX idx_device_id (device_id),
-            INDEX idx_jamming (jamming_detected)
+        row = (
+            new_id(),
+            data['tool_name'][:100],  # Truncate to fit schema
+            data['alert_type'][:100],
+            data['severity'],
+            data.get('description', '')[:1000],  # Limit description length
+            json.dumps(data.get('raw_data', {}))[:5000],  # Limit raw data
+            client_ip,
+            datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         )
-        ''')
-
-        # Network attacks table with proper indexing
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS network_attacks (
-            id VARCHAR(36) PRIMARY KEY,
-            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            alert_type VARCHAR(100) NOT NULL,
-            attacker_bssid VARCHAR(17),
-            attacker_ssid VARCHAR(255),
-            destination_bssid VARCHAR(17),
-            destination_ssid VARCHAR(255),
-            attack_count INT DEFAULT 1,
-            source_ip VARCHAR(45),
-            INDEX idx_timestamp (timestamp),
-            INDEX idx_alert_type (alert_type),
-            INDEX idx_attacker_bssid (attacker_bssid)
-        )
-        ''')
+    except (TypeError, ValueError):
+        return None, 'Invalid field types'
+    return row, None
+
+def get_data_version(table):
+    """Current change counter for ``table`` (0 if it was never written)"""
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT version FROM data_versions WHERE table_name = %s", (table,))
+        row = c.fetchone()
+    return row[0] if row else 0
 
+def insert_rows(table, columns, rows):
+    """Insert rows with a single multi-row INSERT in one transaction"""
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+        # MySQLdb rewrites executemany on INSERT ... VALUES into one multi-row
+        # statement; SQLite reuses one prepared statement in one transaction
+        c.executemany(db_pool.backend.insert(table, columns), bind_rows(columns, rows))
+        after_insert(c, table, columns, rows)
         conn.commit()
-        logger.info("Database initialized successfully")
+    rows_committed(table, rows)
+
+def insert_alerts(rows):
+    """Insert alert rows with a single multi-row INSERT in one transaction"""
+    insert_rows('alerts', ALERT_COLUMNS, rows)
+
+def store_row(table, columns, row):
+    """Write one ingested row, either directly or through the write-behind buffer
+
+    Returns True when the row was queued (caller answers 202) and False when
+    it was written synchronously.
+    """
+    if WRITE_BEHIND:
+        ingest_buffer.submit(table, columns, row)
+        return True
+    insert_rows(table, columns, [row])
+    return False
+
+# Database setup
+def init_db():
+    try:
+        with db_pool.connection() as conn:
+            # Runs once here in the gunicorn master; a current schema costs one SELECT
+            applied = migrate(conn)
+            logger.info(f"Database initialized successfully ({db_pool.backend.name}, "
+                        f"migrations applied: {applied or 'none'})")
+    except LegacyLayoutError as e:
+        # Serving would fail every read and write of the unconverted tables
+        logger.critical(str(e))
+        raise
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
-    finally:
-        conn.close()
+        return
+    try:
+        # Split the first partitions off pmax before any rows arrive
+        retention_job.run_if_due(force=True)
+    except Exception as e:
+        logger.error(f"Partition maintenance failed: {e}")
 
 # Initialize database on startup
 init_db()
 
-# Request middleware for rate limiting and logging
+# Request middleware for rate limiting and sampled request logging
 @app.before_request
 def before_request():
+    g.request_start = time.perf_counter()
+    retention_job.ensure_running()
     client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
     
-    # Rate limiting
-    if not rate_limit_check(client_ip):
-        logger.warning(f"Rate limited request from {client_ip}")
-        return jsonify({'error': 'Rate limit exceeded'}), 429
+    # Rate limiting (the 429 itself is logged by log_request)
+    allowed, retry_after = rate_limit_check(client_ip)
+    if not allowed:
+        response = jsonify({'error': 'Rate limit exceeded'})
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response, 429
+
+@app.after_request
+def log_request(response):
+    start = g.get('request_start')
+    elapsed = time.perf_counter() - start if start else None
+    # Unmatched paths share one label so scanners can't blow up the series count
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    if elapsed is not None:
+        REQUEST_SECONDS.observe(elapsed, method=request.method, route=route)
     
-    # Log request
-    logger.info(f"Request from {client_ip}: {request.method} {request.path}")
+    rule = request.url_rule.rule if request.url_rule else request.path
+    if request_sampler.should_log(request.method, rule, response.status_code):
+        logger.info('request', extra={'fields': {
+            'ip': request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr),
+            'm': request.method,
+            'p': request.path,
+            's': response.status_code,
+            'ms': round(elapsed * 1000, 2) if elapsed is not None else None,
+            'sr': request_sampler.rate_for(request.method, rule),
+        }})
+    return response
+
+@app.after_request
+def compress_response(response):
+    return compressor.process(request, response)
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    """Point url_for('static', ...) at the hashed copy written by ``assets.py build``"""
+    if endpoint == 'static' and asset_manifest:
+        hashed = asset_manifest.get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
 
 # Endpoint to receive alerts from security tools
 @app.route('/api/alerts', methods=['POST'])
@@ -182,49 +371,28 @@ def receive_alert():
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
         
-        # Validate required fields
-        is_valid, message = validate_input(data, ['tool_name', 'alert_type', 'severity'])
-        if not is_valid:
-            return jsonify({'error': message}), 400
-        
-        # Validate severity level
-        valid_severities = ['low', 'medium', 'high', 'critical']
-        if data['severity'] not in valid_severities:
-            return jsonify({'error': 'Invalid severity level'}), 400
-        
-        # Generate unique ID and get client IP
-        alert_id = str(uuid.uuid4())
+        # Validate and build the row (generates a unique ID)
         client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+        row, message = prepare_alert(data, client_ip)
+        if row is None:
+            return jsonify({'error': message}), 400
+        alert_id = row[0]
         
         # Store in database
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-        
         try:
-            c = conn.cursor()
-            c.execute(
-                """INSERT INTO alerts 
-                   (id, tool_name, alert_type, severity, description, raw_data, source_ip)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-                (
-                    alert_id,
-                    data['tool_name'][:100],  # Truncate to fit schema
-                    data['alert_type'][:100],
-                    data['severity'],
-                    data.get('description', '')[:1000],  # Limit description length
-                    json.dumps(data.get('raw_data', {}))[:5000],  # Limit raw data
-                    client_ip
-                )
-            )
-            conn.commit()
+            if store_row('alerts', ALERT_COLUMNS, row):
+                return jsonify({'id': alert_id, 'status': 'queued'}), 202
             logger.info(f"Alert {alert_id} stored successfully")
             
+        except BufferFull as e:
+            logger.warning(f"Rejected alert: {e}")
+            return jsonify({'error': 'Ingest queue full, retry later'}), 503
+        except PoolError as e:
+            logger.error(f"Database connection failed: {e}")
+            return jsonify({'error': 'Database connection failed'}), 500
         except Exception as e:
             logger.error(f"Database error storing alert: {e}")
             return jsonify({'error': 'Database error'}), 500
-        finally:
-            conn.close()
         
         return jsonify({'id': alert_id, 'status': 'received'}), 201
         
@@ -232,14 +400,285 @@ def receive_alert():
         logger.error(f"Error processing alert: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def parse_batch_body():
+    """Parse a batch request body given as a JSON array or NDJSON
+
+    Returns a list where each entry is either the decoded item or an
+    Exception describing why that line could not be parsed.
+    """
+    body = request.get_data(as_text=True)
+    content_type = (request.mimetype or '').lower()
+    
+    if content_type not in ('application/x-ndjson', 'application/ndjson'):
+        try:
+            items = json.loads(body)
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            return items
+        if content_type == 'application/json':
+            raise ValueError('Expected a JSON array of alerts')
+    
+    # NDJSON: one alert object per line, blank lines ignored
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(e)
+    return items
+
+# Endpoint to receive many alerts in one request
+@app.route('/api/alerts/batch', methods=['POST'])
+def receive_alert_batch():
+    try:
+        try:
+            items = parse_batch_body()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not items:
+            return jsonify({'error': 'No alerts provided'}), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} alerts)'}), 413
+        
+        client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+        results = []
+        rows = []
+        for index, item in enumerate(items):
+            if isinstance(item, Exception):
+                results.append({'index': index, 'error': 'Invalid JSON'})
+                continue
+            row, message = prepare_alert(item, client_ip)
+            if row is None:
+                results.append({'index': index, 'error': message})
+                continue
+            rows.append(row)
+            results.append({'index': index, 'id': row[0], 'status': 'received'})
+        
+        if rows:
+            try:
+                insert_alerts(rows)
+            except PoolError as e:
+                logger.error(f"Database connection failed: {e}")
+                return jsonify({'error': 'Database connection failed'}), 500
+            except Exception as e:
+                logger.error(f"Database error storing alert batch: {e}")
+                return jsonify({'error': 'Database error'}), 500
+            logger.info(f"Stored batch of {len(rows)} alerts")
+        
+        rejected = len(items) - len(rows)
+        status = 201 if rows else 400
+        return jsonify({
+            'received': len(rows),
+            'rejected': rejected,
+            'results': results
+        }), status
+        
+    except Exception as e:
+        logger.error(f"Error processing alert batch: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def wants_stream():
+    """True when the client asked for a streamed (constant-memory) response"""
+    if request.args.get('format') == 'columnar':
+        return False
+    if request.args.get('format') == 'ndjson':
+        return True
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def stream_rows(table, conditions, params, hint=''):
+    """Stream a list query straight from an unbuffered server-side cursor
+
+    Rows are encoded and sent in chunks as MySQL returns them, so an export
+    of any size uses constant memory and the first byte goes out as soon as
+    the first chunk is read. ?format=ndjson (or Accept: application/x-ndjson)
+    sends one object per line; ?stream=1 sends a regular JSON array. No row
+    limit applies unless ?limit= is given, and no next cursor is returned.
+    """
+    limit = request.args.get('limit')
+    limit = parse_limit(limit) if limit else None
+    select_columns, output_columns = parse_fields(table, request.args.get('fields'))
+    query, params = build_page_query(
+        table, select_columns, conditions, params, request.args.get('cursor'), limit, hint
+    )
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    
+    def generate():
+        # If the client disconnects mid-stream the unread result makes the
+        # pool's rollback fail, so the connection is discarded, not reused.
+        with db_pool.connection() as conn:
+            c = conn.cursor(db_pool.backend.stream_cursor)
+            c.execute(query, params)
+            sent = 0
+            first = True
+            if not ndjson:
+                yield b'['
+            while True:
+                rows = c.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                if limit is not None:
+                    rows = rows[:limit - sent]
+                sent += len(rows)
+                if output_columns is not None:
+                    rows = [{name: row[name] for name in output_columns} for row in rows]
+                encoded = encode_lines(table, rows)
+                if ndjson:
+                    yield b'\n'.join(encoded) + b'\n'
+                else:
+                    yield (b'' if first else b',') + b','.join(encoded)
+                first = False
+                if limit is not None and sent >= limit:
+                    break
+            c.close()
+            if not ndjson:
+                yield b']'
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+def serve_cached(tables, render):
+    """Answer a GET from the shared response cache, rendering it on a miss
+
+    The key is the URL plus its sorted query arguments, and the entry is
+    dropped as soon as any of ``tables`` is written. Concurrent misses for
+    the same key run ``render()`` once. A client whose If-None-Match still
+    matches the cached ETag gets a 304 without touching the database.
+    """
+    def render_entry():
+        response = app.make_response(render())
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() != 'content-length']
+        return CachedResponse(response.status_code, headers, response.get_data())
+    
+    parts = [request.base_url, sorted(request.args.items(multi=True))]
+    entry = response_cache.get_or_set(parts, tables, render_entry)
+    etag = entry.header('ETag')
+    if entry.status == 200 and etag and request.if_none_match.contains_weak(unquote_etag(etag)[0]):
+        response = Response(status=304)
+        response.set_etag(unquote_etag(etag)[0])
+        response.headers['Cache-Control'] = entry.header('Cache-Control', 'no-cache')
+        return response
+    return Response(entry.body, status=entry.status, headers=entry.headers)
+
+def fetch_page(table, conditions, params, hint=''):
+    """Run one keyset-paginated page of a list endpoint
+
+    Honors ?limit=, ?cursor= and ?fields= and returns a JSON array. The
+    cursor for the following page is sent in the X-Next-Cursor and Link
+    headers so existing clients that expect a plain array keep working.
+    ?format=columnar returns one array per column instead (see serializers.py).
+    Streaming requests are handed to stream_rows().
+
+    For delta polling, ?after=<cursor> (or ?since=<timestamp>) returns only
+    newer rows, and X-Latest-Cursor carries the value to send next time.
+    ?after= responses also repeat the rows of the DELTA_OVERLAP seconds
+    before the cursor, so rows committed late still arrive; clients skip
+    the ids they already have.
+    ``hint`` (backend.index_hint()) pins the index the query reads.
+    Responses have an ETag built from the table's change counter, so an
+    unchanged If-None-Match is answered with 304 before any query runs.
+    """
+    if wants_stream():
+        return stream_rows(table, conditions, params, hint)
+    return serve_cached((table,), lambda: render_list(table, conditions, params, hint))
+
+def list_response(table, rows, columns):
+    """JSON array of rows, or one array per column with ?format=columnar"""
+    if request.args.get('format') == 'columnar':
+        return Response(encode_columnar(table, rows, columns), mimetype='application/json')
+    return Response(encode_rows(table, rows), mimetype='application/json')
+
+def list_etag(table):
+    """ETag for a list response: the table's change counter plus the query"""
+    # Relative windows (?hours=) drift even without writes, so the tag also
+    # rolls over once a minute to let aged-out rows disappear.
+    return hashlib.sha1(
+        f"{table}:{get_data_version(table)}:{int(time.time() // 60)}:"
+        f"{sorted(request.args.items(multi=True))}".encode()
+    ).hexdigest()
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def render_list(table, conditions, params, hint=''):
+    """Build the (uncached) response for fetch_page()"""
+    etag = list_etag(table)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    limit = parse_limit(request.args.get('limit'))
+    select_columns, output_columns = parse_fields(table, request.args.get('fields'))
+    after = request.args.get('after')
+    since = request.args.get('since')
+    delta = bool(after or since)
+    overlap = None
+    if delta:
+        if after:
+            overlap = build_overlap_query(table, select_columns, conditions, params, after, limit, hint)
+        query, params = build_delta_query(
+            table, select_columns, conditions, params, after, since, limit, hint
+        )
+    else:
+        query, params = build_page_query(
+            table, select_columns, conditions, params, request.args.get('cursor'), limit, hint
+        )
+    
+    repeated = []
+    with db_pool.connection() as conn:
+        c = conn.cursor(db_pool.backend.dict_cursor)  # Use dictionary cursor
+        c.execute(query, params)
+        rows = c.fetchall()
+        if overlap:
+            c.execute(*overlap)
+            repeated = c.fetchall()
+    
+    if delta:
+        if output_columns is not None:
+            repeated = [{name: row[name] for name in output_columns} for row in repeated]
+        rows, latest_cursor, has_more = split_delta(rows, limit, output_columns, repeated)
+        response = list_response(table, rows, output_columns or select_columns)
+        # Nothing new: the client keeps using the cursor it sent
+        response.headers['X-Latest-Cursor'] = latest_cursor or after or ''
+        response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    else:
+        latest_cursor = None
+        if rows and not request.args.get('cursor'):
+            latest_cursor = encode_cursor(rows[0])
+        rows, next_cursor = split_page(rows, limit, output_columns)
+        response = list_response(table, rows, output_columns or select_columns)
+        if latest_cursor:
+            response.headers['X-Latest-Cursor'] = latest_cursor
+        if next_cursor:
+            args = request.args.to_dict()
+            args['cursor'] = next_cursor
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    
+    response.set_etag(etag)
+    # Browsers revalidate every poll, so unchanged tables cost a 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def deauth_conditions():
+    """Optional ?hours= time filter shared by /logs and /api/deauth_logs"""
+    hours = request.args.get('hours', type=int)
+    if hours is None:
+        return [], []
+    return [f"timestamp >= {db_pool.backend.hours_ago()}"], [hours]
+
 @app.route('/logs')
 def get_logs():
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor(MySQLdb.cursors.DictCursor)  # Use dictionary cursor
-    c.execute("SELECT * FROM network_attacks ORDER BY timestamp DESC")
-    logs = c.fetchall()
-    conn.close()
-    return jsonify(logs)
+    conditions, params = deauth_conditions()
+    return fetch_page('network_attacks', conditions, params)
 
 # Endpoint to receive GPS data
 @app.route('/api/gps', methods=['POST'])
@@ -249,26 +688,30 @@ def receive_gps():
     # Validate required fields
     if 'latitude' not in data or 'longitude' not in data:
         return jsonify({'error': 'Missing required GPS coordinates'}), 400
+    try:
+        geohash = spatial.encode(data['latitude'], data['longitude'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'GPS coordinates must be numbers'}), 400
     
     # Generate unique ID and timestamp
-    gps_id = str(uuid.uuid4())
+    gps_id = new_id()
     timestamp = datetime.datetime.now().isoformat()
     
     # Store in database
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO gps_data VALUES (%s, %s, %s, %s, %s)",
-        (
-            gps_id,
-            data['latitude'],
-            data['longitude'],
-            timestamp,
-            data.get('device_id', '')
-        )
+    row = (
+        gps_id,
+        data['latitude'],
+        data['longitude'],
+        timestamp,
+        data.get('device_id', ''),
+        geohash
     )
-    conn.commit()
-    conn.close()
+    try:
+        if store_row('gps_data', GPS_COLUMNS, row):
+            return jsonify({'id': gps_id, 'timestamp': timestamp, 'status': 'queued'}), 202
+    except BufferFull as e:
+        logger.warning(f"Rejected GPS reading: {e}")
+        return jsonify({'error': 'Ingest queue full, retry later'}), 503
     
     return jsonify({'id': gps_id, 'timestamp': timestamp}), 201
 
@@ -281,29 +724,18 @@ def get_alerts():
     hours = request.args.get('hours', 24, type=int)  # Default to last 24 hours
     
     # Build query with possible filters
-    query = "SELECT * FROM alerts WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
+    conditions = [f"timestamp >= {db_pool.backend.hours_ago()}"]
     params = [hours]
     
     if tool_name:
-        query += " AND tool_name = %s"
+        conditions.append("tool_name = %s")
         params.append(tool_name)
     
     if severity:
-        query += " AND severity = %s"
+        conditions.append("severity = %s")
         params.append(severity)
     
-    query += " ORDER BY timestamp DESC"
-    
-    # Execute query
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor(MySQLdb.cursors.DictCursor)  # Use dictionary cursor
-    c.execute(query, params)
-    
-    # Convert results to list of dictionaries
-    alerts = c.fetchall()
-    conn.close()
-    
-    return jsonify(alerts)
+    return fetch_page('alerts', conditions, params)
 
 # Endpoint to get GPS data
 @app.route('/api/gps', methods=['GET'])
@@ -313,123 +745,459 @@ def get_gps():
     hours = request.args.get('hours', 24, type=int)
     
     # Build query
-    query = "SELECT * FROM gps_data WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
+    conditions = [f"timestamp >= {db_pool.backend.hours_ago()}"]
     params = [hours]
     
     if device_id:
-        query += " AND device_id = %s"
+        conditions.append("device_id = %s")
         params.append(device_id)
     
-    query += " ORDER BY timestamp DESC"
+    # Viewport: ?bbox=minLon,minLat,maxLon,maxLat, served by the geohash index
+    hint = ''
+    if request.args.get('bbox'):
+        try:
+            bbox = spatial.parse_bbox(request.args['bbox'])
+        except ValueError as e:
+            raise PaginationError(str(e))
+        bbox_conditions, bbox_params = spatial.bbox_conditions(bbox)
+        conditions.extend(bbox_conditions)
+        params.extend(bbox_params)
+        if spatial.use_index(bbox):
+            hint = db_pool.backend.index_hint(spatial.INDEX)
+    
+    max_points = parse_max_points(request.args.get('max_points'))
+    if max_points:
+        return serve_cached(('gps_data',), lambda: render_decimated_gps(conditions, params, max_points, hint))
+    return fetch_page('gps_data', conditions, params, hint)
+
+def parse_max_points(value):
+    """Validate ?max_points= (None when absent)"""
+    if value is None or value == '':
+        return None
+    try:
+        max_points = int(value)
+    except ValueError:
+        raise PaginationError('max_points must be an integer')
+    if max_points < decimation.MIN_THRESHOLD:
+        raise PaginationError(f'max_points must be at least {decimation.MIN_THRESHOLD}')
+    for name in ('cursor', 'after', 'since'):
+        if request.args.get(name):
+            raise PaginationError(f'max_points cannot be combined with {name}')
+    return min(max_points, MAX_PAGE_SIZE)
+
+def render_decimated_gps(conditions, params, max_points, hint=''):
+    """Whole ?hours= window, each device's track thinned to its share of max_points
+
+    Readings are downsampled per device with LTTB (decimation.py) and every
+    jamming-flagged reading is kept. Rows come back newest first like a
+    regular page; X-Source-Rows tells how many the window held and
+    X-Latest-Cursor starts delta polling from the newest reading.
+    """
+    etag = list_etag('gps_data')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    select_columns, output_columns = parse_fields('gps_data', request.args.get('fields'))
+    columns = list(dict.fromkeys(select_columns + ['device_id', 'longitude', 'latitude', 'jamming_detected']))
+    query, params = build_window_query('gps_data', columns, conditions, params, hint)
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
     
-    # Execute query
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor(MySQLdb.cursors.DictCursor)
-    c.execute(query, params)
+    position = {name: i for i, name in enumerate(columns)}
+    device, lon, lat, jam = (position[name] for name in ('device_id', 'longitude', 'latitude', 'jamming_detected'))
+    tracks = {}
+    for i, row in enumerate(rows):
+        tracks.setdefault(row[device], []).append(i)
     
-    # Convert results to list of dictionaries
-    gps_data = c.fetchall()
-    conn.close()
+    if len(rows) > max_points:
+        budgets = decimation.allocate({key: len(track) for key, track in tracks.items()}, max_points)
+        kept = []
+        for key, track in tracks.items():
+            chosen = decimation.decimate_track([rows[i][lon] for i in track], [rows[i][lat] for i in track],
+                                               [rows[i][jam] for i in track], budgets[key])
+            kept.extend(track[j] for j in chosen)
+        kept.sort()
+    else:
+        kept = range(len(rows))
+    
+    output = output_columns or select_columns
+    selected = [{name: rows[i][position[name]] for name in output} for i in reversed(kept)]
+    response = list_response('gps_data', selected, output)
+    if rows:
+        newest = rows[-1]
+        response.headers['X-Latest-Cursor'] = encode_cursor(
+            {'timestamp': newest[position['timestamp']], 'id': newest[position['id']]})
+    response.headers['X-Source-Rows'] = str(len(rows))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Endpoint to export one device's simplified track
+@app.route('/api/gps/track/<device_id>', methods=['GET'])
+def get_gps_track(device_id):
+    """Compact track: ?hours= (default 24), ?tolerance= metres, ?precision= digits"""
+    hours = request.args.get('hours', 24, type=int)
+    try:
+        tolerance = float(request.args.get('tolerance', TRACK_TOLERANCE))
+        precision = int(request.args.get('precision', polyline.DEFAULT_PRECISION))
+    except ValueError:
+        raise PaginationError('tolerance must be a number and precision an integer')
+    if not tolerance >= 0:
+        raise PaginationError('tolerance must not be negative')
+    if not 1 <= precision <= 7:
+        raise PaginationError('precision must be between 1 and 7')
+    return serve_cached(('gps_data',), lambda: render_gps_track(device_id, hours, tolerance, precision))
+
+def render_gps_track(device_id, hours, tolerance, precision):
+    """Douglas-Peucker simplified track as an encoded polyline plus parallel arrays
+
+    ``timestamps`` starts with the first point's Unix time (also sent as
+    ``start``) and continues with seconds since the previous point, so a
+    running sum gives each point's Unix time. ``satellites``, ``hdop`` and
+    ``jamming`` line up with the polyline's points. Jamming-flagged
+    readings are always kept.
+    """
+    etag = list_etag('gps_data')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    columns = ['timestamp', 'latitude', 'longitude', 'satellites', 'hdop', 'jamming_detected']
+    query, params = build_window_query(
+        'gps_data', columns,
+        [f"timestamp >= {db_pool.backend.hours_ago()}", "device_id = %s"], [hours, device_id]
+    )
+    with db_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
     
-    return jsonify(gps_data)
+    kept = decimation.simplify_track([row[2] for row in rows], [row[1] for row in rows],
+                                     [row[5] for row in rows], tolerance)
+    # Stored timestamps are naive local time, like NOW() and datetime.now()
+    seconds = [int(time.mktime(rollups.parse_timestamp(rows[i][0]).timetuple())) for i in kept]
+    response = Response(dumps({
+        'device_id': device_id,
+        'hours': hours,
+        'tolerance': tolerance,
+        'precision': precision,
+        'count': len(kept),
+        'source_rows': len(rows),
+        'polyline': polyline.encode([rows[i][1] for i in kept], [rows[i][2] for i in kept], precision),
+        'start': seconds[0] if seconds else None,
+        'timestamps': seconds[:1] + [b - a for a, b in zip(seconds, seconds[1:])],
+        'satellites': [rows[i][3] or 0 for i in kept],
+        'hdop': [round(float(rows[i][4]), 2) if rows[i][4] is not None else None for i in kept],
+        'jamming': [1 if rows[i][5] else 0 for i in kept]
+    }), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Endpoint to get pre-clustered GPS points for the map
+@app.route('/api/gps/clusters', methods=['GET'])
+def get_gps_clusters():
+    """Clusters for one map view: ?zoom= (required), ?bbox=, ?hours= (default 24)"""
+    try:
+        zoom = int(request.args.get('zoom', ''))
+    except ValueError:
+        raise PaginationError('zoom must be an integer')
+    if not 0 <= zoom <= clusters.MAX_ZOOM:
+        raise PaginationError(f'zoom must be between 0 and {clusters.MAX_ZOOM}')
+    bbox = None
+    if request.args.get('bbox'):
+        try:
+            bbox = spatial.parse_bbox(request.args['bbox'])
+        except ValueError as e:
+            raise PaginationError(str(e))
+    hours = request.args.get('hours', 24, type=int)
+    return serve_cached(('gps_data',), lambda: render_gps_clusters(zoom, bbox, hours))
+
+def render_gps_clusters(zoom, bbox, hours):
+    """Read the gps_grid cells of the zoom's level (clusters.py)
+
+    The cost depends on the viewport, not on how many readings it holds.
+    """
+    etag = list_etag('gps_data')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    
+    with db_pool.connection() as conn:
+        level, cells = clusters.clusters(conn, zoom, bbox, hours)
+    
+    response = Response(dumps({
+        'zoom': zoom,
+        'level': level,
+        'hours': hours,
+        'total': sum(cell['count'] for cell in cells),
+        'clusters': cells
+    }), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # Endpoint to get summary statistics
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
+    prune_rollups_if_due()
+    return serve_cached(('alerts', 'network_attacks', 'gps_data'), render_stats)
+
+def render_stats():
+    """Build the (uncached) /api/stats response"""
     hours = request.args.get('hours', 24, type=int)
     
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor()
-    
-    # Get total alerts per tool
-    c.execute("""
-    SELECT tool_name, COUNT(*) as count 
-    FROM alerts 
-    WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)
-    GROUP BY tool_name
-    """, [hours])
-    tools_stats = {row[0]: row[1] for row in c.fetchall()}
-    
-    # Get alerts by severity
-    c.execute("""
-    SELECT severity, COUNT(*) as count 
-    FROM alerts 
-    WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)
-    GROUP BY severity
-    """, [hours])
-    severity_stats = {row[0]: row[1] for row in c.fetchall()}
-    
-    conn.close()
+    # Served from the minute/hour rollups, so cost doesn't grow with table size
+    with db_pool.connection() as conn:
+        tools_stats = rollups.window_totals(conn, 'alerts', 'tool_name', 'count', hours)
+        severity_stats = rollups.window_totals(conn, 'alerts', 'severity', 'count', hours)
+        attack_stats = rollups.window_totals(conn, 'network_attacks', 'alert_type', 'count', hours)
+        gps_readings = rollups.window_totals(conn, 'gps_data', 'device_id', 'readings', hours)
+        gps_jamming = rollups.window_totals(conn, 'gps_data', 'device_id', 'jamming', hours)
     
     return jsonify({
         'by_tool': tools_stats,
         'by_severity': severity_stats,
+        'by_attack_type': attack_stats,
+        'gps': {
+            'readings': sum(gps_readings.values()),
+            'jamming': sum(gps_jamming.values()),
+            'by_device': gps_readings,
+            'jamming_by_device': gps_jamming
+        },
         'timeframe_hours': hours
     })
 
+def prune_rollups_if_due():
+    """Drop expired minute buckets at most once an hour per worker"""
+    global last_rollup_prune
+    if time.monotonic() - last_rollup_prune < 3600:
+        return
+    # With threaded workers only one request does the prune
+    if not rollup_prune_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - last_rollup_prune < 3600:
+            return
+        last_rollup_prune = time.monotonic()
+        with db_pool.connection() as conn:
+            rollups.prune_minutes(conn)
+    except Exception as e:
+        logger.error(f"Rollup prune failed: {e}")
+    finally:
+        rollup_prune_lock.release()
+
 # Simple heartbeat endpoint
 @app.route('/api/ping', methods=['GET'])
 def ping():
     return jsonify({'status': 'online', 'timestamp': datetime.datetime.now().isoformat()})
 
+def live_updates_supported():
+    """Whether the worker serving this request can hold an SSE stream open
+
+    A sync worker handles one request at a time, so a stream would take
+    the whole worker until gunicorn's timeout killed it and the browser
+    reconnected. With SSE_ENABLED=auto, streams are served only by threaded
+    workers (gthread, the Flask dev server) and gevent workers.
+    """
+    if SSE_ENABLED in ('1', 'true', 'yes'):
+        return True
+    if SSE_ENABLED in ('0', 'false', 'no'):
+        return False
+    if request.environ.get('wsgi.multithread'):
+        return True
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('socket')
+
+# Live updates pushed as Server-Sent Events
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Push new alerts, GPS readings and deauth records as they are ingested
+
+    ?topics=alerts,gps,deauth picks the feeds (default: all). Each event id
+    packs the client's position in every topic, so a reconnect carrying
+    Last-Event-ID replays whatever was missed before going live again
+    (including rows of the overlap window before it, which the client may
+    already have). Streams end after SSE_MAX_DURATION and the browser
+    reconnects by itself.
+    
+    Workers that can't hold a stream, or already hold SSE_MAX_STREAMS of
+    them, answer 204, which tells EventSource not to reconnect; the pages
+    then poll instead.
+    """
+    if not live_updates_supported():
+        return Response(status=204)
+    requested = request.args.get('topics')
+    topics = [t.strip() for t in requested.split(',') if t.strip()] if requested else list(TOPICS)
+    unknown = [t for t in topics if t not in TOPICS]
+    if unknown or not topics:
+        return jsonify({'error': f"Unknown topics: {', '.join(unknown)}",
+                        'available': list(TOPICS)}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    resumed = decode_event_id(last_event_id)
+    if stream_slots is not None and not stream_slots.acquire(blocking=False):
+        return Response(status=204)
+    subscriber = change_feed.subscribe(topics)
+    
+    def generate():
+        try:
+            positions = {}
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            for topic in topics:
+                if topic in resumed:
+                    positions[topic] = Position(resumed[topic])
+                else:
+                    positions[topic] = change_feed.start_position(topic)
+            
+            def event_id():
+                return encode_event_id({topic: position.cursor for topic, position in positions.items()})
+            
+            yield format_event('ready', json.dumps({'topics': topics}), event_id())
+            
+            # Catch up on rows missed while the client was disconnected
+            for topic in resumed:
+                if topic not in positions:
+                    continue
+                has_more = True
+                while has_more:
+                    rows, has_more = change_feed.read_new(topic, positions[topic], STREAM_CHUNK_ROWS)
+                    for row in rows:
+                        yield format_event(topic, encode_row(TOPICS[topic], row).decode(), event_id())
+            
+            deadline = time.monotonic() + SSE_MAX_DURATION
+            while time.monotonic() < deadline and not subscriber.overflowed:
+                try:
+                    topic, row = subscriber.queue.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                # Rows already sent during catch-up are skipped
+                if not positions[topic].accept(row):
+                    continue
+                yield format_event(topic, encode_row(TOPICS[topic], row).decode(), event_id())
+        finally:
+            change_feed.unsubscribe(subscriber)
+    
+    def close():
+        # Also runs when the client went away before the stream started
+        change_feed.unsubscribe(subscriber)
+        if stream_slots is not None:
+            stream_slots.release()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.call_on_close(close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+# Connection pool usage and checkout-wait metrics for this worker
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_stats():
+    return jsonify(db_pool.stats())
+
+# Write-behind queue depth and flush/spill counters for this worker
+@app.route('/api/ingest/buffer', methods=['GET'])
+def get_ingest_buffer_stats():
+    return jsonify(dict(ingest_buffer.stats(), enabled=WRITE_BEHIND))
+
+# Response cache hit/miss counters for this worker
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+# Prometheus scrape endpoint covering every worker
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    limiter = rate_limiter.stats()
+    shared = [
+        ('rate_limit_rejections_total', 'counter', 'Requests refused by the rate limiter', {},
+         limiter['rejections']),
+        ('rate_limit_blocks_total', 'counter', 'Clients blocked for exceeding the limit', {},
+         limiter['blocks']),
+        ('rate_limit_evictions_total', 'counter', 'Tracked clients evicted from the full table', {},
+         limiter['evictions']),
+    ]
+    return Response(metrics.render(shared), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+def collect_worker_metrics():
+    """Per-worker pool, cache and write-behind figures for the metrics file"""
+    pool = db_pool.stats()
+    yield ('db_pool_connections', 'gauge', 'Open pooled connections', {'state': 'in_use'}, pool['in_use'])
+    yield ('db_pool_connections', 'gauge', 'Open pooled connections', {'state': 'idle'}, pool['idle'])
+    yield ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting', {}, pool['timeouts'])
+    cache = response_cache.stats()
+    for result in ('hits', 'collapsed', 'misses'):
+        yield ('response_cache_requests_total', 'counter', 'Cached reads by outcome',
+               {'result': result}, cache[result])
+    if WRITE_BEHIND:
+        buffer = ingest_buffer.stats()
+        yield ('ingest_queue_depth', 'gauge', 'Rows waiting in the write-behind queue', {},
+               buffer['queue_depth'])
+        for key in ('rejected', 'spilled', 'replayed', 'dead_lettered', 'dropped'):
+            yield ('ingest_buffer_rows_total', 'counter', 'Write-behind rows by outcome',
+                   {'outcome': key}, buffer[key])
+
+metrics.add_collector(collect_worker_metrics)
+
+@app.errorhandler(PaginationError)
+def handle_pagination_error(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(PoolError)
+def handle_pool_error(e):
+    logger.error(f"Database pool exhausted: {e}")
+    return jsonify({'error': 'Database busy, try again later'}), 503
+
 @app.route('/api/deauth_logs', methods=['GET'])
 def get_deauth_logs():
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor(MySQLdb.cursors.DictCursor)
-    c.execute("SELECT * FROM network_attacks ORDER BY timestamp DESC")
-    logs = c.fetchall()
-    conn.close()
-    return jsonify(logs)
+    conditions, params = deauth_conditions()
+    return fetch_page('network_attacks', conditions, params)
 
 @app.route('/api/deauth_logs', methods=['POST'])
 def add_deauth_log():
     data = request.json
     
     # Generate unique ID
-    attack_id = str(uuid.uuid4())
+    attack_id = new_id()
     
     # Add timestamp if missing
     if 'timestamp' not in data:
         data['timestamp'] = datetime.datetime.now().isoformat()
+    try:
+        rollups.parse_timestamp(data['timestamp'])
+    except ValueError:
+        return jsonify({'error': 'Invalid timestamp'}), 400
     
     # Store in database
-    conn = MySQLdb.connect(**db_config)
-    c = conn.cursor()
-    
+    row = (
+        attack_id,
+        data.get('timestamp'),
+        data.get('alert_type', 'Deauth Attack'),
+        data.get('attacker_bssid', 'Unknown'),
+        data.get('attacker_ssid', 'Unknown'),
+        data.get('destination_bssid', 'Unknown'),
+        data.get('destination_ssid', 'Unknown'),
+        data.get('attack_count', 0)
+    )
     try:
-        c.execute(
-            """
-            INSERT INTO network_attacks 
-            (id, timestamp, alert_type, attacker_bssid, attacker_ssid, 
-            destination_bssid, destination_ssid, attack_count)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                attack_id,
-                data.get('timestamp'),
-                data.get('alert_type', 'Deauth Attack'),
-                data.get('attacker_bssid', 'Unknown'),
-                data.get('attacker_ssid', 'Unknown'),
-                data.get('destination_bssid', 'Unknown'),
-                data.get('destination_ssid', 'Unknown'),
-                data.get('attack_count', 0)
-            )
-        )
-        conn.commit()
-        conn.close()
+        if store_row('network_attacks', DEAUTH_COLUMNS, row):
+            return jsonify({'id': attack_id, 'timestamp': data.get('timestamp'), 'status': 'queued'}), 202
         return jsonify({'id': attack_id, 'timestamp': data.get('timestamp')}), 201
+    except BufferFull as e:
+        logger.warning(f"Rejected deauth log: {e}")
+        return jsonify({'error': 'Ingest queue full, retry later'}), 503
     except Exception as e:
-        conn.close()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/deauth_logs/clear', methods=['DELETE'])
 def clear_deauth_logs():
     try:
-        conn = MySQLdb.connect(**db_config)
-        c = conn.cursor()
-        c.execute("DELETE FROM network_attacks")
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            c.execute(db_pool.backend.truncate('network_attacks'))
+            after_clear(c, 'network_attacks')
+            conn.commit()
+        response_cache.invalidate('network_attacks')
         return jsonify({'success': True, 'message': 'All deauthentication logs cleared'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -438,17 +1206,19 @@ def clear_deauth_logs():
 def clear_gps_data():
     """Clear all GPS data from the database"""
     try:
-        conn = MySQLdb.connect(**db_config)
-        c = conn.cursor()
-        
-        # Delete all records from the gps_data table
-        c.execute("DELETE FROM gps_data")
-        
-        # Get count of deleted rows
-        deleted_count = c.rowcount
-        
-        conn.commit()
-        conn.close()
+        with db_pool.connection() as conn:
+            c = conn.cursor()
+            
+            # Count first: TRUNCATE doesn't report how many rows it removed
+            c.execute("SELECT COUNT(*) FROM gps_data")
+            deleted_count = c.fetchone()[0]
+            
+            # Empty the gps_data table without a row-by-row DELETE
+            c.execute(db_pool.backend.truncate('gps_data'))
+            after_clear(c, 'gps_data')
+            
+            conn.commit()
+        response_cache.invalidate('gps_data')
         
         return jsonify({
             'success': True,
@@ -459,20 +1229,58 @@ def clear_gps_data():
         return jsonify({'error': str(e)}), 500
 
 # Main routes for pages
+def serve_page(template):
+    """Render a dashboard page once per worker and answer revalidations with 304
+
+    The pages have no per-request content, so the rendered HTML is kept
+    (except in debug mode, where templates are edited live).
+    """
+    key = (template, request.script_root)
+    page = None if app.debug else page_cache.get(key)
+    if page is None:
+        html = render_template(template)
+        page = (html, hashlib.sha1(html.encode()).hexdigest())
+        if not app.debug:
+            page_cache[key] = page
+    html, etag = page
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = app.make_response(html)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/static/dist/<path:filename>')
+def hashed_asset(filename):
+    """Fingerprinted asset, precompressed and cacheable forever (see assets.py)"""
+    path = safe_join(app.static_folder, assets.DIST, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    source, encoding = assets.precompressed(path, request.accept_encodings)
+    response = send_file(source, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                         max_age=assets.IMMUTABLE_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return serve_page('index.html')
 
 @app.route('/<page>.html')
 def render_page(page):
     try:
-        return render_template(f"{page}.html")
-    except:
+        return serve_page(f"{page}.html")
+    except TemplateNotFound:
         return "Page not found", 404
 
 @app.route('/index')
 def index_alt():
-    return render_template('index.html')
+    return serve_page('index.html')
 
 # Create application instance for WSGI
 application = app
@@ -12,9 +12,15 @@ import json
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 from datetime import datetime, timedelta
-import uuid
+import sys
 import logging
 
+# spatial.py (geohash of each reading), ids.py and ingest_hooks.py live in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import spatial
+from ids import new_id, to_binary
+from ingest_hooks import after_insert
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -43,7 +49,7 @@ def get_gps():
     hours = request.args.get('hours', 24, type=int)
     
     # Build query for MySQL
-    query = "SELECT * FROM gps_data WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
+    query = "SELECT BIN_TO_UUID(id) AS id, latitude, longitude, timestamp, device_id, satellites, hdop, jamming_detected FROM gps_data WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
     params = [hours]
     
     if device_id:
@@ -84,7 +90,7 @@ def receive_gps():
         c = conn.cursor()
         
         # Generate unique ID and timestamp
-        gps_id = str(uuid.uuid4())
+        gps_id = new_id()
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # Determine if jamming is detected (if not explicitly provided)
@@ -97,24 +103,31 @@ def receive_gps():
             jamming_detected = 1 if (satellites < 3 or hdop > 2.0) else 0
         
         # Insert into database - MySQL uses %s for all param types
+        columns = ('id', 'latitude', 'longitude', 'timestamp', 'device_id',
+                   'satellites', 'hdop', 'jamming_detected', 'geohash')
+        row = (
+            gps_id,
+            data['latitude'],
+            data['longitude'],
+            timestamp,
+            data.get('device_id', 'ESP32-GPS'),
+            satellites,
+            hdop,
+            jamming_detected,
+            spatial.encode(data['latitude'], data['longitude'])
+        )
         c.execute(
             """
             INSERT INTO gps_data (id, latitude, longitude, timestamp, 
-                                device_id, satellites, hdop, jamming_detected)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                                device_id, satellites, hdop, jamming_detected, geohash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (
-                gps_id,
-                data['latitude'],
-                data['longitude'],
-                timestamp,
-                data.get('device_id', 'ESP32-GPS'),
-                satellites,
-                hdop,
-                jamming_detected
-            )
+            (to_binary(row[0]),) + row[1:]
         )
         
+        # Keep dashboard stats, the cluster grid and ETags in step with this insert
+        after_insert(c, 'gps_data', columns, [row])
+        
         conn.commit()
         conn.close()
         
@@ -3,14 +3,20 @@
 GPS Data Simulator for testing the GPS jamming detection system.
 This script simulates GPS readings and sends them to the MySQL database.
 """
+import os
 import MySQLdb
 import time
 import random
-import uuid
 from datetime import datetime
 import sys
 import argparse
 
+# spatial.py (geohash of each reading), ids.py and ingest_hooks.py live in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import spatial
+from ids import new_id, to_binary
+from ingest_hooks import after_insert
+
 # MySQL database configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -43,7 +49,7 @@ def simulate_gps_reading(base_lat, base_lon, device_id, simulate_jamming=False):
     
     # Generate the reading
     reading = {
-        'id': str(uuid.uuid4()),
+        'id': new_id(),
         'latitude': base_lat + lat_variation,
         'longitude': base_lon + lon_variation,
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -61,24 +67,31 @@ def save_to_database(reading):
         conn = MySQLdb.connect(**DB_CONFIG)
         cursor = conn.cursor()
         
+        columns = ('id', 'latitude', 'longitude', 'timestamp', 'device_id',
+                   'satellites', 'hdop', 'jamming_detected', 'geohash')
+        row = (
+            reading['id'],
+            reading['latitude'],
+            reading['longitude'],
+            reading['timestamp'],
+            reading['device_id'],
+            reading['satellites'],
+            reading['hdop'],
+            reading['jamming_detected'],
+            spatial.encode(reading['latitude'], reading['longitude'])
+        )
         cursor.execute(
             """
             INSERT INTO gps_data (id, latitude, longitude, timestamp, 
-                                 device_id, satellites, hdop, jamming_detected)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                                 device_id, satellites, hdop, jamming_detected, geohash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (
-                reading['id'],
-                reading['latitude'],
-                reading['longitude'],
-                reading['timestamp'],
-                reading['device_id'],
-                reading['satellites'],
-                reading['hdop'],
-                reading['jamming_detected']
-            )
+            (to_binary(row[0]),) + row[1:]
         )
         
+        # Keep dashboard stats, the cluster grid and ETags in step with this insert
+        after_insert(cursor, 'gps_data', columns, [row])
+        
         conn.commit()
         conn.close()
         return True
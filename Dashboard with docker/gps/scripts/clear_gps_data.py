@@ -4,9 +4,15 @@ Clear GPS Data Script
 This script provides a function to clear GPS data from the database
 """
 
+import os
+import sys
 import MySQLdb
 import logging
 
+# ingest_hooks.py lives in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ingest_hooks import after_clear
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -35,6 +41,9 @@ def clear_gps_data():
         # Get count of deleted rows
         deleted_count = c.rowcount
         
+        # Empty the stats rollups and the cluster grid with the rows they count
+        after_clear(c, 'gps_data')
+        
         conn.commit()
         conn.close()
         
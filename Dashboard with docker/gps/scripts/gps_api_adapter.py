@@ -9,13 +9,20 @@ import os
 import MySQLdb
 import MySQLdb.cursors
 import json
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 from datetime import datetime, timedelta
-import uuid
+import sys
 import logging
 import threading
 import time
+from collections import deque
+
+# spatial.py (geohash of each reading), ids.py and ingest_hooks.py live in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import spatial
+from ids import new_id, to_binary
+from ingest_hooks import after_insert, after_clear
 
 # Configure logging
 logging.basicConfig(
@@ -29,16 +36,37 @@ logger = logging.getLogger("GPS_API_Adapter")
 app = Flask(__name__)
 CORS(app)
 
-# In-memory cache for recent data to improve performance
+# In-memory cache for recent data to improve performance. Readings in the
+# window are kept newest first; 'ids' holds their ids so a reading is never
+# added or counted twice, and 'high_water' is the newest timestamp seen.
 gps_cache = {
     'last_update': datetime.now(),
-    'data': [],
+    'data': deque(),
+    'ids': set(),
+    'high_water': None,
+    'last_reconcile': None,
     'stats': {
         'total': 0,
         'anomalies': 0,
         'recent_count': 0
     }
 }
+gps_cache_lock = threading.Lock()
+
+# The cache holds the last hour. Every CACHE_REFRESH_SECONDS it reads only
+# rows past its high-water mark and evicts rows that aged out; every
+# CACHE_RECONCILE_SECONDS it reloads the window and recounts the totals,
+# which catches rows deleted behind its back (retention, another process).
+CACHE_WINDOW = timedelta(hours=1)
+CACHE_REFRESH_SECONDS = 5
+CACHE_RECONCILE_SECONDS = 300
+# Rows can commit a little after their timestamp (the dashboard's
+# write-behind buffer, slow writers), so each refresh re-reads this far
+# behind the mark; ids already cached are skipped
+CACHE_OVERLAP = timedelta(seconds=30)
+
+CACHE_COLUMNS = ("BIN_TO_UUID(id) AS id, latitude, longitude, timestamp, device_id, satellites, "
+                 "hdop, jamming_detected")
 
 # MySQL Database configuration
 DB_CONFIG = {
@@ -48,6 +76,43 @@ DB_CONFIG = {
     'db': 'security_dashboard',
 }
 
+# Rows fetched from the server-side cursor per streamed chunk
+STREAM_CHUNK_ROWS = 500
+
+def stream_query(query, params, ndjson):
+    """Stream query results from an unbuffered server-side cursor
+
+    Rows are encoded as they are fetched, so memory stays flat no matter how
+    many rows match and the client receives the first chunk immediately.
+    """
+    def generate():
+        conn = MySQLdb.connect(**DB_CONFIG)
+        try:
+            c = conn.cursor(MySQLdb.cursors.SSDictCursor)
+            c.execute(query, params)
+            first = True
+            if not ndjson:
+                yield '['
+            while True:
+                rows = c.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                encoded = [app.json.dumps(row) for row in rows]
+                if ndjson:
+                    yield '\n'.join(encoded) + '\n'
+                else:
+                    yield ('' if first else ',') + ','.join(encoded)
+                first = False
+            if not ndjson:
+                yield ']'
+        except Exception as e:
+            logger.error(f"Database error while streaming: {e}")
+        finally:
+            conn.close()
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 @app.route('/api/gps', methods=['GET'])
 def get_gps():
     """Get GPS data from MySQL database"""
@@ -56,7 +121,7 @@ def get_gps():
     hours = request.args.get('hours', 24, type=int)
     
     # Build query for MySQL
-    query = "SELECT * FROM gps_data WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
+    query = "SELECT BIN_TO_UUID(id) AS id, latitude, longitude, timestamp, device_id, satellites, hdop, jamming_detected FROM gps_data WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)"
     params = [hours]
     
     if device_id:
@@ -65,6 +130,11 @@ def get_gps():
     
     query += " ORDER BY timestamp DESC"
     
+    # Streamed export: ?format=ndjson for one object per line, ?stream=1 for a JSON array
+    ndjson = request.args.get('format') == 'ndjson'
+    if ndjson or request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return stream_query(query, params, ndjson)
+    
     # Execute query
     try:
         conn = MySQLdb.connect(**DB_CONFIG)
@@ -97,8 +167,9 @@ def receive_gps():
         c = conn.cursor()
         
         # Generate unique ID and timestamp
-        gps_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        gps_id = new_id()
+        received = datetime.now().replace(microsecond=0)
+        timestamp = received.strftime('%Y-%m-%d %H:%M:%S')
         
         # Determine if jamming is detected (if not explicitly provided)
         satellites = data.get('satellites', 0)
@@ -110,24 +181,31 @@ def receive_gps():
             jamming_detected = 1 if (satellites < 3 or hdop > 2.0) else 0
         
         # Insert into database - MySQL uses %s for all param types
+        columns = ('id', 'latitude', 'longitude', 'timestamp', 'device_id',
+                   'satellites', 'hdop', 'jamming_detected', 'geohash')
+        row = (
+            gps_id,
+            data['latitude'],
+            data['longitude'],
+            timestamp,
+            data.get('device_id', 'ESP32-GPS'),
+            satellites,
+            hdop,
+            jamming_detected,
+            spatial.encode(data['latitude'], data['longitude'])
+        )
         c.execute(
             """
             INSERT INTO gps_data (id, latitude, longitude, timestamp, 
-                                device_id, satellites, hdop, jamming_detected)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                                device_id, satellites, hdop, jamming_detected, geohash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (
-                gps_id,
-                data['latitude'],
-                data['longitude'],
-                timestamp,
-                data.get('device_id', 'ESP32-GPS'),
-                satellites,
-                hdop,
-                jamming_detected
-            )
+            (to_binary(row[0]),) + row[1:]
         )
         
+        # Keep dashboard stats, the cluster grid and ETags in step with this insert
+        after_insert(c, 'gps_data', columns, [row])
+        
         conn.commit()
         conn.close()
         
@@ -141,24 +219,20 @@ def receive_gps():
             'jamming_detected': bool(jamming_detected)
         }
         
-        # Add the new entry to the cache immediately
+        # Add the new entry to the cache immediately; the next refresh
+        # recognizes its id and doesn't count it again
         new_entry = {
             'id': gps_id,
             'latitude': data['latitude'],
             'longitude': data['longitude'],
-            'timestamp': timestamp,
+            'timestamp': received,
             'device_id': data.get('device_id', 'ESP32-GPS'),
             'satellites': satellites,
             'hdop': hdop,
             'jamming_detected': jamming_detected
         }
-        
-        # Update cache with new entry (at the beginning of the list)
-        gps_cache['data'].insert(0, new_entry)
-        gps_cache['stats']['total'] += 1
-        gps_cache['stats']['recent_count'] += 1
-        if jamming_detected:
-            gps_cache['stats']['anomalies'] += 1
+        with gps_cache_lock:
+            add_to_cache([new_entry])
         
         return jsonify(response_data), 201
     except Exception as e:
@@ -198,32 +272,83 @@ def test_gps_api():
         'result': result
     })
 
-# Function to update the GPS cache
+# Functions to update the GPS cache
+def add_to_cache(rows):
+    """Add readings (oldest first) the cache doesn't hold yet; call with gps_cache_lock held"""
+    data, ids, stats = gps_cache['data'], gps_cache['ids'], gps_cache['stats']
+    late = []
+    for row in rows:
+        if row['id'] in ids:
+            continue
+        ids.add(row['id'])
+        stats['total'] += 1
+        if row['jamming_detected']:
+            stats['anomalies'] += 1
+        if not data or row['timestamp'] >= data[0]['timestamp']:
+            data.appendleft(row)
+        else:
+            late.append(row)
+        if gps_cache['high_water'] is None or row['timestamp'] > gps_cache['high_water']:
+            gps_cache['high_water'] = row['timestamp']
+    if late:
+        # Committed after newer rows; rare enough that a re-sort is fine
+        gps_cache['data'] = deque(sorted(list(data) + late, key=lambda row: row['timestamp'], reverse=True))
+    stats['recent_count'] = len(gps_cache['data'])
+
+def evict_from_cache(cutoff):
+    """Drop readings older than ``cutoff``; call with gps_cache_lock held"""
+    data = gps_cache['data']
+    while data and data[-1]['timestamp'] < cutoff:
+        gps_cache['ids'].discard(data.pop()['id'])
+    gps_cache['stats']['recent_count'] = len(data)
+
+def reconcile_gps_cache(c, now):
+    """Reload the whole window and recount the totals from the database"""
+    c.execute(f"SELECT {CACHE_COLUMNS} FROM gps_data WHERE timestamp >= %s ORDER BY timestamp ASC",
+              (now - CACHE_WINDOW,))
+    rows = c.fetchall()
+    c.execute("SELECT COUNT(*) AS total, COALESCE(SUM(jamming_detected = 1), 0) AS anomalies FROM gps_data")
+    counts = c.fetchone()
+    with gps_cache_lock:
+        first = gps_cache['last_reconcile'] is None
+        drift = gps_cache['stats']['total'] - counts['total']
+        gps_cache['data'] = deque()
+        gps_cache['ids'] = set()
+        gps_cache['high_water'] = None
+        add_to_cache(rows)
+        gps_cache['stats']['total'] = int(counts['total'])
+        gps_cache['stats']['anomalies'] = int(counts['anomalies'])
+        gps_cache['last_reconcile'] = time.monotonic()
+    if drift and not first:
+        logger.info(f"Cache reconciled; running total was off by {drift}")
+
+def refresh_gps_cache(c, now):
+    """Add rows past the high-water mark and evict rows that left the window"""
+    cutoff = now - CACHE_WINDOW
+    since = cutoff if gps_cache['high_water'] is None else max(cutoff, gps_cache['high_water'] - CACHE_OVERLAP)
+    c.execute(f"SELECT {CACHE_COLUMNS} FROM gps_data WHERE timestamp >= %s ORDER BY timestamp ASC", (since,))
+    rows = c.fetchall()
+    with gps_cache_lock:
+        add_to_cache(rows)
+        evict_from_cache(cutoff)
+
 def update_gps_cache():
     """Update the in-memory cache of GPS data"""
     try:
         conn = MySQLdb.connect(**DB_CONFIG)
         c = conn.cursor(MySQLdb.cursors.DictCursor)
         
-        # Get recent data (last hour)
-        c.execute("""
-            SELECT * FROM gps_data 
-            WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 1 HOUR)
-            ORDER BY timestamp DESC
-        """)
+        # Window edges follow the database clock, like the timestamps it stores
+        c.execute("SELECT NOW() AS now")
+        now = c.fetchone()['now']
         
-        gps_cache['data'] = c.fetchall()
+        last_reconcile = gps_cache['last_reconcile']
+        if last_reconcile is None or time.monotonic() - last_reconcile >= CACHE_RECONCILE_SECONDS:
+            reconcile_gps_cache(c, now)
+        else:
+            refresh_gps_cache(c, now)
         gps_cache['last_update'] = datetime.now()
         
-        # Update statistics
-        c.execute("SELECT COUNT(*) as total FROM gps_data")
-        gps_cache['stats']['total'] = c.fetchone()['total']
-        
-        c.execute("SELECT COUNT(*) as anomalies FROM gps_data WHERE jamming_detected = 1")
-        gps_cache['stats']['anomalies'] = c.fetchone()['anomalies']
-        
-        gps_cache['stats']['recent_count'] = len(gps_cache['data'])
-        
         conn.close()
         logger.debug(f"Cache updated with {len(gps_cache['data'])} entries")
     except Exception as e:
@@ -234,14 +359,15 @@ def cache_updater():
     """Background thread to update cache periodically"""
     while True:
         update_gps_cache()
-        time.sleep(5)  # Update every 5 seconds
+        time.sleep(CACHE_REFRESH_SECONDS)
 
 # Add new endpoint for optimized data retrieval
 @app.route('/api/gps/fast', methods=['GET'])
 def get_gps_fast():
     """Get GPS data from cache for faster dashboard updates"""
     # Initialize with data from memory cache
-    response_data = gps_cache['data']
+    with gps_cache_lock:
+        response_data = list(gps_cache['data'])
     
     # Check if the client sent a last-id parameter
     # This is used for efficient polling (only get updates since last fetch)
@@ -258,7 +384,8 @@ def get_gps_fast():
 @app.route('/api/gps/stats', methods=['GET'])
 def get_gps_stats():
     """Get GPS statistics from cache"""
-    return jsonify(gps_cache['stats'])
+    with gps_cache_lock:
+        return jsonify(dict(gps_cache['stats']))
 
 @app.route('/api/gps/clear', methods=['POST'])
 def clear_gps_data():
@@ -272,16 +399,20 @@ def clear_gps_data():
         
         # Get count of deleted rows
         deleted_count = c.rowcount
+        after_clear(c, 'gps_data')
         
         conn.commit()
         conn.close()
         
         # Clear the cache
-        gps_cache['data'] = []
-        gps_cache['stats']['total'] = 0
-        gps_cache['stats']['anomalies'] = 0
-        gps_cache['stats']['recent_count'] = 0
-        gps_cache['last_update'] = datetime.now()
+        with gps_cache_lock:
+            gps_cache['data'] = deque()
+            gps_cache['ids'] = set()
+            gps_cache['high_water'] = None
+            gps_cache['stats']['total'] = 0
+            gps_cache['stats']['anomalies'] = 0
+            gps_cache['stats']['recent_count'] = 0
+            gps_cache['last_update'] = datetime.now()
         
         logger.info(f"Cleared {deleted_count} GPS records from database")
         
@@ -2,17 +2,25 @@
 """
 GPS Jamming Detector - Python version
 This script reads data from a GPS module, detects possible jamming,
-and saves the data to the MySQL security_dashboard database.
+and saves the data to the security_dashboard database (MySQL, or the
+embedded SQLite file when DB_BACKEND=sqlite).
 """
+import os
 import serial
 import time
-import MySQLdb  # Using MySQL instead of SQLite
-import uuid
 from datetime import datetime
 import pynmea2  # For parsing NMEA GPS data
 import sys
 import logging
 
+# storage.py, migrations.py and ingest_hooks.py live in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from storage import get_backend
+from migrations import migrate
+from ids import new_id, to_binary
+from ingest_hooks import after_insert
+import spatial
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,7 +32,7 @@ logger = logging.getLogger("GPS_Detector")
 # Configuration
 SERIAL_PORT = '/dev/ttyUSB0'  # Change this to match your GPS module's port
 BAUD_RATE = 9600
-# MySQL database configuration
+# MySQL database configuration (ignored when DB_BACKEND=sqlite)
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'dashboard',
@@ -39,6 +47,7 @@ class GPSJammingDetector:
         self.port = port
         self.baud = baud
         self.db_config = db_config
+        self.conn = None
         self.serial = None
         self.last_valid_lat = None
         self.last_valid_lon = None
@@ -107,42 +116,63 @@ class GPSJammingDetector:
             return True
         return False
     
+    def get_connection(self):
+        """Open the database connection on first use and reuse it afterwards"""
+        if self.conn is None:
+            self.conn = get_backend().connect(**self.db_config)
+            migrate(self.conn)
+        return self.conn
+
+    def drop_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
     def save_to_database(self):
-        """Save GPS data to the MySQL security_dashboard database"""
+        """Save GPS data to the security_dashboard database"""
         if not self.has_valid_position():
             logger.warning("No valid position to save")
             return False
         
         try:
-            conn = MySQLdb.connect(**self.db_config)
+            conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Generate a unique ID
-            gps_id = str(uuid.uuid4())
+            # Generate a unique, time-ordered ID
+            gps_id = new_id()
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             jamming_detected = self.detect_jamming()
             
-            # Insert the data - MySQL uses %s placeholders regardless of data type
+            # Insert the data - both backends take %s placeholders regardless of data type
+            columns = ('id', 'latitude', 'longitude', 'timestamp', 'device_id',
+                       'satellites', 'hdop', 'jamming_detected', 'geohash')
+            row = (
+                gps_id,
+                self.last_valid_lat,
+                self.last_valid_lon,
+                timestamp,
+                DEVICE_ID,
+                self.satellites,
+                self.hdop,
+                jamming_detected,
+                spatial.encode(self.last_valid_lat, self.last_valid_lon)
+            )
             cursor.execute(
                 """
                 INSERT INTO gps_data (id, latitude, longitude, timestamp, 
-                                     device_id, satellites, hdop, jamming_detected)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                                     device_id, satellites, hdop, jamming_detected, geohash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """,
-                (
-                    gps_id,
-                    self.last_valid_lat,
-                    self.last_valid_lon,
-                    timestamp,
-                    DEVICE_ID,
-                    self.satellites,
-                    self.hdop,
-                    jamming_detected
-                )
+                (to_binary(gps_id),) + row[1:]
             )
             
+            # Keep dashboard stats and ETags in step with this insert
+            after_insert(cursor, 'gps_data', columns, [row])
+            
             conn.commit()
-            conn.close()
             
             # Log status
             if jamming_detected:
@@ -156,6 +186,7 @@ class GPSJammingDetector:
             
         except Exception as e:
             logger.error(f"Database error: {e}")
+            self.drop_connection()
             return False
     
     def run(self):
@@ -182,6 +213,7 @@ class GPSJammingDetector:
         finally:
             if self.serial:
                 self.serial.close()
+            self.drop_connection()
 
 if __name__ == "__main__":
     # Check for command line arguments to override defaults
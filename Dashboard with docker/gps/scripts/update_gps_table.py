@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
-Update the gps_data table schema to include columns needed for GPS jamming detection.
+Bring the security_dashboard schema (including the gps_data jamming detection
+columns) up to date. The steps themselves live in the dashboard's migrations.py.
 """
-import MySQLdb
 import sys
 import os
 
-# MySQL database configuration
+# migrations.py and storage.py live in the dashboard directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from storage import get_backend
+from migrations import migrate, LATEST_VERSION
+
+# MySQL database configuration (ignored when DB_BACKEND=sqlite)
 DB_CONFIG = {
     'host': 'localhost',
     'user': 'dashboard',
@@ -15,58 +20,21 @@ DB_CONFIG = {
 }
 
 def update_gps_table():
-    """Add columns to the gps_data table for jamming detection"""
+    """Apply any pending schema migrations"""
     
-    print(f"Updating MySQL database schema...")
+    backend = get_backend()
+    print(f"Updating {backend.name} database schema...")
     
     conn = None
     try:
-        conn = MySQLdb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # Check if the table exists
-        cursor.execute("SHOW TABLES LIKE 'gps_data'")
-        if not cursor.fetchone():
-            print("Creating gps_data table...")
-            cursor.execute("""
-            CREATE TABLE gps_data (
-                id VARCHAR(36) PRIMARY KEY,
-                latitude FLOAT NOT NULL,
-                longitude FLOAT NOT NULL,
-                timestamp TIMESTAMP NOT NULL,
-                device_id VARCHAR(100),
-                satellites INT,
-                hdop FLOAT,
-                jamming_detected BOOLEAN DEFAULT FALSE
-            )
-            """)
-            print("Table created successfully.")
-            return True
-            
-        # Get existing columns
-        cursor.execute("DESCRIBE gps_data")
-        columns = [row[0] for row in cursor.fetchall()]
-        
-        # Add satellites column if it doesn't exist
-        if 'satellites' not in columns:
-            print("Adding 'satellites' column...")
-            cursor.execute("ALTER TABLE gps_data ADD COLUMN satellites INT")
-        
-        # Add hdop column if it doesn't exist
-        if 'hdop' not in columns:
-            print("Adding 'hdop' column...")
-            cursor.execute("ALTER TABLE gps_data ADD COLUMN hdop FLOAT")
-        
-        # Add jamming_detected column if it doesn't exist
-        if 'jamming_detected' not in columns:
-            print("Adding 'jamming_detected' column...")
-            cursor.execute("ALTER TABLE gps_data ADD COLUMN jamming_detected BOOLEAN DEFAULT FALSE")
-        
-        conn.commit()
-        print("Database schema updated successfully.")
+        conn = backend.connect(**DB_CONFIG)
+        applied = migrate(conn)
+        if applied:
+            print(f"Applied migrations {', '.join(map(str, applied))}.")
+        print(f"Database schema is up to date (version {LATEST_VERSION}).")
         return True
         
-    except sqlite3.Error as e:
+    except Exception as e:
         print(f"Database error: {e}")
         return False
         
@@ -75,4 +43,4 @@ def update_gps_table():
             conn.close()
 
 if __name__ == "__main__":
-    update_gps_table()
+    sys.exit(0 if update_gps_table() else 1)
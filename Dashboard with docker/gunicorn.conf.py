@@ -6,10 +6,52 @@ import os
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 backlog = 2048
 
-# Worker processes
-workers = min(multiprocessing.cpu_count() * 2 + 1, 8)
-worker_class = "sync"
-worker_connections = 1000
+# Concurrency profile, picked with GUNICORN_PROFILE:
+#   gthread (default) - a few processes with a thread pool each; MySQL calls
+#                       release the GIL, so a slow dashboard query ties up
+#                       one thread instead of a whole worker
+#   gevent            - cooperative greenlets; the app is monkey-patched
+#                       before it loads and talks to MySQL through PyMySQL,
+#                       whose sockets yield to other requests
+#   sync              - one request per process (the old behaviour)
+# None of the worker, thread or profile defaults below has been benchmarked
+# against MySQL; compare them on the real database with bench_profiles.py.
+profile = os.environ.get('GUNICORN_PROFILE', 'gthread').lower()
+cpus = multiprocessing.cpu_count()
+pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
+
+# Every worker may hold pool_size connections; keep the total under
+# MySQL's max_connections (151 by default) with some room for other clients
+db_connection_budget = int(os.environ.get('DB_MAX_CONNECTIONS', 140))
+max_workers = max(1, min(8, db_connection_budget // pool_size))
+
+if profile == 'gthread':
+    worker_class = "gthread"
+    workers = min(cpus + 1, max_workers)
+    # Twice the pool size, so threads beyond the pool can serve cache hits,
+    # pings and SSE streams; an unmeasured starting point, see bench_profiles.py
+    threads = int(os.environ.get('GUNICORN_THREADS', pool_size * 2))
+    # Leave at least half the threads for regular requests; further SSE
+    # clients get 204 and poll. Workers inherit this from the master.
+    os.environ.setdefault('SSE_MAX_STREAMS', str(max(1, threads // 2)))
+elif profile == 'gevent':
+    # Must happen before preload_app imports flaskkk, so the pool's locks and
+    # queues are created as gevent-aware objects
+    from gevent import monkey
+    monkey.patch_all()
+    if os.environ.get('DB_DRIVER', 'pymysql') == 'pymysql':
+        import pymysql
+        pymysql.install_as_MySQLdb()
+    worker_class = "gevent"
+    workers = min(cpus, max_workers)
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+elif profile == 'sync':
+    worker_class = "sync"
+    workers = min(cpus * 2 + 1, max_workers)
+else:
+    raise ValueError(f"Unknown GUNICORN_PROFILE {profile!r} (use gthread, gevent or sync)")
+
+workers = int(os.environ.get('GUNICORN_WORKERS', workers))
 timeout = 30
 keepalive = 2
 max_requests = 1000
@@ -21,7 +63,9 @@ limit_request_fields = 100
 limit_request_field_size = 8190
 
 # Logging
-accesslog = "-"  # Log to stdout
+# The app writes its own sampled request log, so gunicorn's per-request
+# access log is off unless GUNICORN_ACCESS_LOG is set (e.g. "-" for stdout)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
 errorlog = "-"   # Log to stderr
 loglevel = os.environ.get('LOG_LEVEL', 'info')
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
@@ -47,8 +91,14 @@ preload_app = True
 max_requests = 1000
 max_requests_jitter = 50
 
+def on_starting(server):
+    # Metric files from a previous run would otherwise be counted again
+    from metrics import clear_directory
+    clear_directory()
+
 def when_ready(server):
     server.log.info("Server is ready. Spawning workers")
+    server.log.info("Profile %s: %s %s workers", profile, workers, worker_class)
 
 def worker_int(worker):
     worker.log.info("worker received INT or QUIT signal")
@@ -64,3 +114,12 @@ def post_worker_init(worker):
 
 def worker_abort(worker):
     worker.log.info("Worker received SIGABRT signal")
+
+def worker_exit(server, worker):
+    # Flush queued writes, then close pooled MySQL connections so the
+    # server frees the slots right away
+    from flaskkk import db_pool, ingest_buffer, metrics
+    ingest_buffer.stop()
+    db_pool.close_all()
+    # Final counters, so nothing recorded since the last write is lost
+    metrics.write(force=True)
@@ -0,0 +1,94 @@
+"""
+Time-ordered row ids for alerts, gps_data and network_attacks
+
+New rows get UUIDv7 ids: a 48-bit millisecond timestamp followed by a
+per-process counter and random bits. They are stored as BINARY(16), so
+inserts append to the end of the InnoDB clustered index instead of
+landing on random pages, and secondary indexes carry 16 bytes per entry
+instead of 36. The API still speaks the usual string form; queries
+convert at the edge with UUID_TO_BIN()/BIN_TO_UUID(), which are MySQL 8
+built-ins and registered as functions on SQLite connections. Writers
+bind the 16 bytes directly (``bind_rows``), which keeps INSERT statements
+plain enough for the drivers to batch executemany into one statement.
+"""
+import os
+import time
+import uuid
+import threading
+
+# SQL for comparing against a string id and for reading one back under its own name
+ID_PARAM = 'UUID_TO_BIN(%s)'
+ID_SELECT = 'BIN_TO_UUID(id) AS id'
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """UUIDv7 (RFC 9562); ids from one process are strictly increasing"""
+    global _last_ms, _counter
+    ms = time.time_ns() // 1_000_000
+    with _lock:
+        if ms > _last_ms:
+            _last_ms = ms
+            # Start low in the 12-bit counter so a burst has room to count up
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x3FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # More than ~3000 ids this millisecond: borrow the next one
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id():
+    """String form of a fresh UUIDv7, as returned by the API"""
+    return str(uuid7())
+
+
+def is_valid(text):
+    try:
+        uuid.UUID(str(text))
+        return True
+    except ValueError:
+        return False
+
+
+def select_columns(columns):
+    """SELECT list for ``columns`` with the binary id converted back to text"""
+    return ', '.join(ID_SELECT if name == 'id' else name for name in columns)
+
+
+def to_binary(text):
+    """16-byte storage form of a string id"""
+    return uuid.UUID(text).bytes
+
+
+def bind_rows(columns, rows):
+    """Copies of ``rows`` with the ``id`` column in binary, ready for INSERT"""
+    if 'id' not in columns:
+        return rows
+    index = list(columns).index('id')
+    return [tuple(to_binary(v) if i == index else v for i, v in enumerate(row)) for row in rows]
+
+
+def uuid_to_bin(text):
+    """SQLite implementation of MySQL's UUID_TO_BIN()"""
+    if text is None or isinstance(text, bytes):
+        return text
+    return uuid.UUID(text).bytes
+
+
+def bin_to_uuid(value):
+    """SQLite implementation of MySQL's BIN_TO_UUID()
+
+    Ids still stored as text (not yet migrated) are passed through.
+    """
+    if isinstance(value, bytes) and len(value) == 16:
+        return str(uuid.UUID(bytes=value))
+    return value
@@ -0,0 +1,288 @@
+"""
+Write-behind ingest buffer for the Security Dashboard
+
+Sensor POSTs put their rows on a bounded in-process queue and return right
+away. A background thread drains the queue and writes multi-row INSERTs
+whenever a table has collected enough rows or the flush interval passes.
+If MySQL is unavailable the rows are appended to a local NDJSON spill file
+and replayed once the database accepts writes again. A batch the database
+rejects for its content (a data or integrity error) is split until the
+offending rows are isolated; those go to a dead-letter file and the rest
+of the batch is written.
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+
+from ids import bind_rows, to_binary
+from db_pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """Raised when the ingest queue has no room for another row"""
+
+
+class WriteBehindBuffer:
+    """Bounded queue plus background flusher that batches inserts per table"""
+
+    def __init__(self, pool, spill_dir, max_queue=10000, flush_size=500,
+                 flush_interval=1.0, retry_interval=5.0, before_commit=None, after_commit=None):
+        self.pool = pool
+        # Optional hooks run as before_commit(cursor, table, columns, rows)
+        # inside each flush transaction and after_commit(table, rows) once it commits
+        self.before_commit = before_commit
+        self.after_commit = after_commit
+        self.spill_dir = spill_dir
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._last_replay_attempt = 0.0
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'queued': 0,
+            'rejected': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'flush_errors': 0,
+            'dead_lettered': 0,
+            'dropped': 0,
+        }
+
+    def _ensure_started(self):
+        """Start the flusher lazily so each gunicorn worker gets its own thread"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._stop.clear()
+            self._stats = self._empty_stats()
+            self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"Write-behind flusher started (pid {self._pid})")
+
+    def submit(self, table, columns, row):
+        """Queue one row for ``table``; raises BufferFull when the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((table, tuple(columns), tuple(row)))
+        except queue.Full:
+            self._stats['rejected'] += 1
+            raise BufferFull(f"Ingest queue full ({self.max_queue} rows)")
+        self._stats['queued'] += 1
+
+    def stop(self, timeout=10):
+        """Flush whatever is queued and stop the background thread"""
+        if not self._thread or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Flusher thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        pending = {}
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                table, columns, row = self._queue.get(timeout=timeout)
+                pending.setdefault((table, columns), []).append(row)
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            due = time.monotonic() - last_flush >= self.flush_interval
+            for key in list(pending):
+                rows = pending[key]
+                if rows and (due or stopping or len(rows) >= self.flush_size):
+                    self._flush(key[0], key[1], rows)
+                    del pending[key]
+            if due:
+                last_flush = time.monotonic()
+                self._maybe_replay()
+
+            if stopping and self._queue.empty():
+                for (table, columns), rows in pending.items():
+                    if rows:
+                        self._flush(table, columns, rows)
+                return
+
+    def _insert(self, table, columns, rows, replay=False):
+        """Insert ``rows`` in one transaction; returns the rows actually written
+
+        A replayed batch may already have been committed before its
+        connection was lost, so rows whose id is stored are left out and
+        the hooks only ever see rows this transaction inserted.
+        """
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            if replay:
+                rows = self._unstored(c, table, columns, rows)
+            if rows:
+                c.executemany(self.pool.backend.insert(table, columns), bind_rows(columns, rows))
+                if self.before_commit:
+                    self.before_commit(c, table, columns, rows)
+            conn.commit()
+        if rows and self.after_commit:
+            self.after_commit(table, rows)
+        return rows
+
+    @staticmethod
+    def _unstored(cursor, table, columns, rows):
+        """The subset of ``rows`` whose id isn't in ``table`` yet"""
+        if 'id' not in columns:
+            return rows
+        index = list(columns).index('id')
+        cursor.execute(
+            f"SELECT id FROM {table} WHERE id IN ({', '.join(['%s'] * len(rows))})",
+            [to_binary(row[index]) for row in rows]
+        )
+        stored = {bytes(row[0]) for row in cursor.fetchall()}
+        return [row for row in rows if to_binary(row[index]) not in stored]
+
+    def _unavailable(self, error):
+        """True when ``error`` means the database can't be reached, not that the rows are bad"""
+        return isinstance(error, (PoolError, self.pool.backend.OperationalError))
+
+    def _write(self, table, columns, rows, replay=False):
+        """Insert ``rows``, setting aside the ones the database rejects
+
+        A batch that fails for any reason but an unavailable database is
+        split in halves until each bad row is on its own; those rows go to
+        the dead-letter file. Returns the number of rows written. Errors
+        meaning the database is unavailable propagate to the caller.
+        """
+        try:
+            return len(self._insert(table, columns, rows, replay))
+        except Exception as e:
+            if self._unavailable(e):
+                raise
+            if len(rows) == 1:
+                self._dead_letter(table, columns, rows[0], e)
+                return 0
+        middle = len(rows) // 2
+        return (self._write(table, columns, rows[:middle], replay)
+                + self._write(table, columns, rows[middle:], replay))
+
+    def _flush(self, table, columns, rows):
+        for start in range(0, len(rows), self.flush_size):
+            chunk = rows[start:start + self.flush_size]
+            try:
+                self._stats['flushed'] += self._write(table, columns, chunk)
+                self._stats['flushes'] += 1
+            except Exception as e:
+                # Only an unavailable database gets here; rows already written
+                # from this chunk are skipped when the spill file is replayed
+                self._stats['flush_errors'] += 1
+                logger.error(f"Write-behind flush to {table} failed, spilling {len(chunk)} rows: {e}")
+                try:
+                    self._spill(table, columns, chunk)
+                except OSError as spill_error:
+                    self._stats['dropped'] += len(chunk)
+                    logger.critical(f"Could not spill {len(chunk)} {table} rows, data lost: {spill_error}")
+
+    # ------------------------------------------------------------------
+    # Spill file handling
+    # ------------------------------------------------------------------
+    def _spill_path(self, kind='spill'):
+        return os.path.join(self.spill_dir, f"{kind}-{os.getpid()}.ndjson")
+
+    def _append(self, path, records):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spill(self, table, columns, rows):
+        self._append(self._spill_path(), ({'table': table, 'columns': columns, 'row': row} for row in rows))
+        self._stats['spilled'] += len(rows)
+
+    def _dead_letter(self, table, columns, row, error):
+        """Set aside a row the database refused, so it is never retried"""
+        logger.error(f"Dead-lettering a {table} row the database rejected: {error}")
+        try:
+            self._append(self._spill_path('dead-letter'),
+                         [{'table': table, 'columns': columns, 'row': row, 'error': str(error)}])
+        except OSError as e:
+            self._stats['dropped'] += 1
+            logger.critical(f"Could not dead-letter a {table} row, data lost: {e}")
+            return
+        self._stats['dead_lettered'] += 1
+
+    def _maybe_replay(self):
+        now = time.monotonic()
+        if now - self._last_replay_attempt < self.retry_interval:
+            return
+        self._last_replay_attempt = now
+        for path in glob.glob(os.path.join(self.spill_dir, 'spill-*.ndjson')):
+            # Renaming claims the file so only one worker replays it
+            claimed = os.path.join(self.spill_dir, f"replay-{os.getpid()}-{uuid.uuid4().hex}.ndjson")
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            if not self._replay_file(claimed):
+                # Database still down: hand the file back for the next attempt
+                # and carry on, so one file never holds up the others
+                os.rename(claimed, os.path.join(self.spill_dir, f"spill-{os.getpid()}-{uuid.uuid4().hex}.ndjson"))
+
+    def _replay_file(self, path):
+        batches = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt spill record in {path}")
+                    continue
+                key = (record['table'], tuple(record['columns']))
+                batches.setdefault(key, []).append(tuple(record['row']))
+        replayed = 0
+        try:
+            for (table, columns), rows in batches.items():
+                for start in range(0, len(rows), self.flush_size):
+                    # Rows carry their own ids, so a partially replayed file is safe to retry
+                    replayed += self._write(table, columns, rows[start:start + self.flush_size], replay=True)
+        except Exception as e:
+            # Rows written before the failure are skipped on the next attempt
+            logger.warning(f"Spill replay deferred, database still unavailable: {e}")
+            return False
+        self._stats['replayed'] += replayed
+        os.remove(path)
+        logger.info(f"Replayed {replayed} spilled rows from {os.path.basename(path)}")
+        return True
+
+    def stats(self):
+        """Queue depth and flush/spill counters for this worker"""
+        stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize() if self._queue else 0
+        stats['max_queue'] = self.max_queue
+        stats['spill_files'] = len(glob.glob(os.path.join(self.spill_dir, 'spill-*.ndjson')))
+        stats['dead_letter_files'] = len(glob.glob(os.path.join(self.spill_dir, 'dead-letter-*.ndjson')))
+        return stats
@@ -0,0 +1,38 @@
+"""
+Bookkeeping that must happen in the same transaction as every ingest
+
+Any writer that inserts into alerts, gps_data or network_attacks (the Flask
+app, the write-behind flusher, detector.py) calls after_insert() before it
+commits, so the ETag change counters, the /api/stats rollups and the
+/api/gps/clusters grid can never drift from the raw rows. A writer that
+empties one of those tables calls after_clear() the same way.
+"""
+from rollups import apply_rollups, clear_rollups
+from clusters import apply_clusters, clear_clusters
+from storage import get_backend
+
+
+def bump_data_version(cursor, table):
+    """Mark ``table`` as changed inside the caller's transaction
+
+    Read endpoints derive their ETag from this counter, so conditional
+    requests can be answered with a primary-key lookup instead of the query.
+    """
+    cursor.execute(
+        get_backend().upsert_add('data_versions', ('table_name', 'version'), ('table_name',), ('version',)),
+        (table, 1)
+    )
+
+
+def after_insert(cursor, table, columns, rows):
+    """Update change counters, rollups and the cluster grid for rows just inserted into ``table``"""
+    apply_rollups(cursor, table, columns, rows)
+    apply_clusters(cursor, table, columns, rows)
+    bump_data_version(cursor, table)
+
+
+def after_clear(cursor, table):
+    """Empty the rollups and the cluster grid of ``table`` and bump its change counter"""
+    clear_rollups(cursor, table)
+    clear_clusters(cursor, table)
+    bump_data_version(cursor, table)
@@ -0,0 +1,323 @@
+"""
+Prometheus metrics aggregated across gunicorn workers
+
+Each worker records counters and histograms in memory and a background
+thread writes them to its own JSON file in a shared directory about once a
+second. ``GET /metrics`` merges the files of all workers into one Prometheus
+text exposition. Files of workers that have exited are folded into an
+archive file, so counters keep growing across worker restarts instead of
+dropping back. Gauges (pool size, queue depth) only count live workers.
+"""
+import os
+import re
+import glob
+import json
+import time
+import fcntl
+import tempfile
+import threading
+from functools import lru_cache
+
+# Request and query latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def default_metrics_dir():
+    """Prefer RAM-backed /dev/shm so metric files never touch disk"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'security_dashboard_metrics')
+
+
+def clear_directory(directory=None):
+    """Remove metric files left by a previous server run (call before forking)"""
+    directory = directory or os.getenv('METRICS_DIR') or default_metrics_dir()
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement):
+    """Collapse a SQL statement to a low-cardinality label
+
+    Literals become ``?`` and multi-row VALUES lists collapse to one group,
+    so "SELECT ... INTERVAL 48 HOUR" and the same query with another
+    number share a series.
+    """
+    text = ' '.join(str(statement).split())
+    text = re.sub(r"'(?:[^'\\]|\\.)*'", '?', text)
+    text = re.sub(r'\b\d+(?:\.\d+)?\b', '?', text)
+    text = re.sub(r'%s', '?', text)
+    text = re.sub(r'(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+', r'\1', text)
+    return text[:200]
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, registry, name):
+        self._registry = registry
+        self.name = name
+
+    def inc(self, amount=1, **labels):
+        self._registry._add(self.name, _label_key(labels), amount)
+
+
+class Histogram:
+    def __init__(self, registry, name, buckets):
+        self._registry = registry
+        self.name = name
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self._registry._observe(self.name, self.buckets, _label_key(labels), value)
+
+
+class MetricsRegistry:
+    """Per-worker metric store that is flushed to a shared directory"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory or default_metrics_dir()
+        self.flush_interval = flush_interval
+        self._meta = {}          # name -> (type, help)
+        self._counters = {}      # (name, labels) -> value
+        self._histograms = {}    # (name, labels) -> [buckets, bucket counts, sum, count]
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._pid = None
+        self._thread = None
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text)
+        return Counter(self, name)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = ('histogram', help_text)
+        return Histogram(self, name, buckets)
+
+    def add_collector(self, collect):
+        """Register ``collect()`` returning (name, type, help, labels, value) samples
+
+        Collectors are read when the worker writes its file; use them for
+        values other modules already track (pool size, queue depth, ...).
+        """
+        self._collectors.append(collect)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def _check_fork(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Values inherited from the master belong to the master's file
+            self._pid = os.getpid()
+            self._counters = {}
+            self._histograms = {}
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def _add(self, name, labels, amount):
+        self._check_fork()
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    def _observe(self, name, buckets, labels, value):
+        self._check_fork()
+        with self._lock:
+            key = (name, labels)
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [list(buckets), [0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[1][i] += 1
+                    break
+            state[2] += value
+            state[3] += 1
+            self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Worker files
+    # ------------------------------------------------------------------
+    def _path(self, pid):
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write()
+            except Exception:
+                pass
+
+    def write(self, force=False):
+        """Write this worker's current values to its file"""
+        self._check_fork()
+        with self._lock:
+            if not (self._dirty or force or self._collectors):
+                return
+            self._dirty = False
+            snapshot = {
+                'meta': dict(self._meta),
+                'counters': [[n, list(l), v] for (n, l), v in self._counters.items()],
+                'histograms': [[n, list(l)] + [list(s[0]), list(s[1]), s[2], s[3]]
+                               for (n, l), s in self._histograms.items()],
+                'gauges': [],
+            }
+        for collect in self._collectors:
+            for name, kind, help_text, labels, value in collect():
+                snapshot['meta'][name] = (kind, help_text)
+                section = 'gauges' if kind == 'gauge' else 'counters'
+                snapshot[section].append([name, list(_label_key(labels)), value])
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, self._path(os.getpid()))
+
+    # ------------------------------------------------------------------
+    # Aggregation
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _merge(total, snapshot, include_gauges=True):
+        total['meta'].update({k: tuple(v) for k, v in snapshot.get('meta', {}).items()})
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(tuple(p) for p in labels))
+            total['counters'][key] = total['counters'].get(key, 0) + value
+        for name, labels, buckets, counts, total_sum, count in snapshot.get('histograms', []):
+            key = (name, tuple(tuple(p) for p in labels))
+            state = total['histograms'].get(key)
+            if state is None or state[0] != buckets:
+                state = total['histograms'][key] = [buckets, [0] * len(buckets), 0.0, 0]
+            state[1] = [a + b for a, b in zip(state[1], counts)]
+            state[2] += total_sum
+            state[3] += count
+        if include_gauges:
+            for name, labels, value in snapshot.get('gauges', []):
+                key = (name, tuple(tuple(p) for p in labels))
+                total['gauges'][key] = total['gauges'].get(key, 0) + value
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _archive_dead_workers(self):
+        """Fold files of exited workers into archive.json (counters only)"""
+        archive_path = os.path.join(self.directory, 'archive.json')
+        with open(os.path.join(self.directory, 'archive.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+                pid = int(os.path.basename(path)[7:-5])
+                if pid != os.getpid() and not self._alive(pid):
+                    dead.append(path)
+            if not dead:
+                return
+            total = {'meta': {}, 'counters': {}, 'histograms': {}, 'gauges': {}}
+            archive = self._load(archive_path)
+            if archive:
+                self._merge(total, archive)
+            for path in dead:
+                snapshot = self._load(path)
+                if snapshot:
+                    self._merge(total, snapshot, include_gauges=False)
+            merged = {
+                'meta': total['meta'],
+                'counters': [[n, list(l), v] for (n, l), v in total['counters'].items()],
+                'histograms': [[n, list(l)] + s for (n, l), s in total['histograms'].items()],
+                'gauges': [],
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(merged, f, separators=(',', ':'))
+            os.replace(tmp_path, archive_path)
+            for path in dead:
+                os.remove(path)
+
+    def collect(self):
+        """Merged values of every worker, past and present"""
+        self.write(force=True)
+        self._archive_dead_workers()
+        total = {'meta': dict(self._meta), 'counters': {}, 'histograms': {}, 'gauges': {}}
+        for path in [os.path.join(self.directory, 'archive.json')] + \
+                glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            snapshot = self._load(path)
+            if snapshot:
+                self._merge(total, snapshot)
+        return total
+
+    def render(self, extra=()):
+        """Prometheus text format for all workers plus ``extra`` samples
+
+        ``extra`` holds (name, type, help, labels, value) samples that are
+        already global (e.g. read from shared memory) and must not be summed.
+        """
+        total = self.collect()
+        samples = {}
+        for (name, labels), value in sorted(list(total['counters'].items()) + list(total['gauges'].items())):
+            samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, kind, help_text, labels, value in extra:
+            total['meta'][name] = (kind, help_text)
+            samples.setdefault(name, []).append(
+                f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        for (name, labels), (buckets, counts, total_sum, count) in sorted(total['histograms'].items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total_sum)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        out = []
+        for name in sorted(samples):
+            kind, help_text = total['meta'].get(name, ('untyped', ''))
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(samples[name])
+        return '\n'.join(out) + '\n'
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Convert the VARCHAR(36) ids of alerts, gps_data and network_attacks to BINARY(16)
+
+Existing ids keep their value (the API returns the same strings); only the
+storage changes. On MySQL the conversion runs online:
+
+    python migrate_ids.py copy      # shadow tables + triggers + chunked backfill
+    python migrate_ids.py swap      # atomic RENAME, run while the app restarts
+    python migrate_ids.py cleanup   # drop the old *_varchar_ids tables
+
+``copy`` creates ``<table>_new_ids`` with a BINARY(16) id, installs
+triggers that mirror every insert and delete on the live table into it,
+then copies the existing rows in short keyset-ordered chunks with INSERT
+IGNORE, so it can be interrupted and re-run. The old code keeps writing
+throughout. ``swap`` renames both tables in one statement; stop the old
+app just before it and start the new one right after, because the two
+versions write ids in different forms.
+
+On SQLite the ids are converted in place, chunk by chunk; the new code
+reads both forms, so no swap is needed.
+"""
+import os
+import sys
+import time
+import logging
+
+from storage import get_backend
+from migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('alerts', 'gps_data', 'network_attacks')
+
+CHUNK_SIZE = int(os.getenv('MIGRATE_CHUNK_SIZE', 2000))
+CHUNK_PAUSE = float(os.getenv('MIGRATE_CHUNK_PAUSE', 0.05))  # seconds between chunks
+
+
+def shadow_table(table):
+    return f"{table}_new_ids"
+
+
+def old_table(table):
+    return f"{table}_varchar_ids"
+
+
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,)
+    )
+    return cursor.fetchall()
+
+
+def id_is_binary(cursor, table):
+    return any(name == 'id' and kind == 'binary' for name, kind in table_columns(cursor, table))
+
+
+def table_exists(cursor, table):
+    return bool(table_columns(cursor, table))
+
+
+def create_shadow(conn, table):
+    """Empty copy of ``table`` with a BINARY(16) id, plus mirroring triggers"""
+    c = conn.cursor()
+    shadow = shadow_table(table)
+    c.execute(f"CREATE TABLE IF NOT EXISTS {shadow} LIKE {table}")
+    if not id_is_binary(c, shadow):
+        c.execute(f"ALTER TABLE {shadow} MODIFY id BINARY(16) NOT NULL")
+
+    columns = [name for name, _ in table_columns(c, table)]
+    new_values = ', '.join('UUID_TO_BIN(NEW.id)' if name == 'id' else f"NEW.{name}" for name in columns)
+    triggers = {
+        f"{table}_ids_ins": (
+            f"AFTER INSERT ON {table} FOR EACH ROW "
+            f"REPLACE INTO {shadow} ({', '.join(columns)}) VALUES ({new_values})"
+        ),
+        f"{table}_ids_del": (
+            f"AFTER DELETE ON {table} FOR EACH ROW "
+            f"DELETE FROM {shadow} WHERE id = UUID_TO_BIN(OLD.id) AND timestamp = OLD.timestamp"
+        ),
+    }
+    c.execute(
+        "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS "
+        "WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = %s",
+        (table,)
+    )
+    existing = {row[0] for row in c.fetchall()}
+    for name, body in triggers.items():
+        if name not in existing:
+            c.execute(f"CREATE TRIGGER {name} {body}")
+    conn.commit()
+    return columns
+
+
+def backfill(conn, table, columns, chunk_size=CHUNK_SIZE, pause=CHUNK_PAUSE):
+    """Copy existing rows into the shadow table in (timestamp, id) order"""
+    c = conn.cursor()
+    shadow = shadow_table(table)
+    select = ', '.join('UUID_TO_BIN(id)' if name == 'id' else name for name in columns)
+    last = None
+    copied = 0
+    started = time.monotonic()
+    while True:
+        after, params = '', []
+        if last:
+            after = "WHERE timestamp > %s OR (timestamp = %s AND id > %s)"
+            params = [last[0], last[0], last[1]]
+        c.execute(f"SELECT timestamp, id FROM {table} {after} ORDER BY timestamp, id LIMIT %s",
+                  params + [chunk_size])
+        keys = c.fetchall()
+        if not keys:
+            break
+        end = keys[-1]
+        conditions = ["(timestamp < %s OR (timestamp = %s AND id <= %s))"]
+        if last:
+            conditions.append("(timestamp > %s OR (timestamp = %s AND id > %s))")
+        c.execute(
+            f"INSERT IGNORE INTO {shadow} ({', '.join(columns)}) "
+            f"SELECT {select} FROM {table} WHERE {' AND '.join(conditions)}",
+            [end[0], end[0], end[1]] + params
+        )
+        conn.commit()
+        copied += len(keys)
+        last = end
+        if copied % (chunk_size * 50) == 0:
+            logger.info(f"{table}: {copied} rows copied ({copied / (time.monotonic() - started):.0f} rows/s)")
+        time.sleep(pause)
+    logger.info(f"{table}: backfill done, {copied} rows copied")
+    return copied
+
+
+def swap(conn, table):
+    """Put the shadow table in place of ``table`` in one RENAME"""
+    c = conn.cursor()
+    if not table_exists(c, shadow_table(table)):
+        return False
+    c.execute(f"RENAME TABLE {table} TO {old_table(table)}, {shadow_table(table)} TO {table}")
+    # The triggers moved with the old table, which nothing writes to any more
+    c.execute(f"DROP TRIGGER IF EXISTS {table}_ids_ins")
+    c.execute(f"DROP TRIGGER IF EXISTS {table}_ids_del")
+    return True
+
+
+def convert_sqlite(conn, table, chunk_size=CHUNK_SIZE, pause=CHUNK_PAUSE):
+    """Rewrite text ids as 16-byte blobs in place, one short transaction per chunk"""
+    converted = 0
+    while True:
+        c = conn.cursor()
+        c.execute(
+            f"UPDATE {table} SET id = UUID_TO_BIN(id) WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE typeof(id) = 'text' LIMIT %s)",
+            (chunk_size,)
+        )
+        count = c.rowcount
+        conn.commit()
+        converted += max(count, 0)
+        if count < chunk_size:
+            logger.info(f"{table}: {converted} ids converted")
+            return converted
+        time.sleep(pause)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'dashboard'),
+        'passwd': os.getenv('DB_PASSWORD', 'securepass'),
+        'db': os.getenv('DB_NAME', 'security_dashboard'),
+    }
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    tables = sys.argv[2:] or TABLES
+    backend = get_backend()
+    conn = backend.connect(**db_config)
+    try:
+        if backend.name == 'sqlite':
+            if command != 'copy':
+                print("On SQLite only 'copy' is needed; it converts the ids in place")
+                sys.exit(0 if command in ('swap', 'cleanup') else 1)
+            migrate(conn, check_ids=False)
+            for table in tables:
+                convert_sqlite(conn, table)
+        elif command == 'copy':
+            c = conn.cursor()
+            for table in tables:
+                if id_is_binary(c, table):
+                    print(f"{table}: ids are already BINARY(16)")
+                    continue
+                columns = create_shadow(conn, table)
+                backfill(conn, table, columns)
+        elif command == 'swap':
+            for table in tables:
+                print(f"{table}: {'swapped' if swap(conn, table) else 'no shadow table, skipped'}")
+        elif command == 'cleanup':
+            c = conn.cursor()
+            for table in tables:
+                c.execute(f"DROP TABLE IF EXISTS {old_table(table)}")
+                print(f"{table}: dropped {old_table(table)}")
+        else:
+            print(f"Usage: {sys.argv[0]} copy | swap | cleanup [table ...]")
+            sys.exit(1)
+    finally:
+        conn.close()
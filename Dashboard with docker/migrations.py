@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the dashboard database
+
+Every schema change is a numbered step in MIGRATIONS; ``schema_migrations``
+records the steps a database has already run. ``migrate()`` is called once
+at startup by the app (in the gunicorn master, before the workers fork),
+detector.py and gps_detector.py. When the schema is current it costs one
+``SELECT MAX(version)``; otherwise it takes a lock so concurrent starters
+don't run the same step twice, and applies the missing steps in order.
+
+    python migrations.py migrate    # apply pending steps (the default)
+    python migrations.py status     # applied and pending steps
+    python migrations.py explain    # check every endpoint query's plan
+
+``explain`` runs EXPLAIN on the queries the read endpoints issue and exits
+non-zero if any of them scans a whole table, sorts its result instead of
+reading it in index order (bbox viewport queries are allowed to sort) or
+reads another index than the one it was designed for; run it in CI
+against a migrated database (tests/test_explain.py does on SQLite).
+
+Two conversions of existing MySQL tables are not steps here, because they
+rewrite every row and have to run online, in chunks, over hours: the
+BINARY(16) ids (``python migrate_ids.py``) and the time partitioning
+(``python retention.py partition``). New databases get both from step 1.
+Code that writes BINARY(16) ids can't run against VARCHAR(36) ids, so
+``migrate()`` refuses to start on such a database until migrate_ids.py has
+swapped the tables. Unpartitioned tables keep working; retention deletes
+their expired rows in batches instead of dropping partitions.
+"""
+import os
+import sys
+import logging
+import datetime
+
+import rollups
+import spatial
+import clusters
+from storage import get_backend, StorageError
+from pagination import (TABLE_COLUMNS, build_page_query, build_delta_query, build_overlap_query,
+                        build_window_query, encode_cursor)
+
+logger = logging.getLogger(__name__)
+
+# How long a starter waits for another process to finish migrating
+LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', 300))
+
+# Composite indexes matched to the endpoint queries. Every list query
+# filters on a timestamp range (plus an optional equality) and orders by
+# (timestamp, id), so the equality column leads and (timestamp, id) follows:
+# the range is one index seek and rows come back already in order.
+COMPOSITE_INDEXES = {
+    'alerts': {
+        'idx_alerts_time_id': ('timestamp', 'id'),
+        'idx_alerts_tool_time': ('tool_name', 'timestamp', 'id'),
+        'idx_alerts_severity_time': ('severity', 'timestamp', 'id'),
+        'idx_alerts_tool_severity_time': ('tool_name', 'severity', 'timestamp', 'id'),
+    },
+    'gps_data': {
+        'idx_gps_data_time_id': ('timestamp', 'id'),
+        'idx_gps_data_device_time': ('device_id', 'timestamp', 'id'),
+    },
+    'network_attacks': {
+        'idx_network_attacks_time_id': ('timestamp', 'id'),
+    },
+}
+
+# Base-schema single-column indexes the composites above make redundant
+REPLACED_INDEXES = {
+    'alerts': ('timestamp', 'tool_name', 'severity'),
+    'gps_data': ('timestamp', 'device_id'),
+    'network_attacks': ('timestamp',),
+}
+
+# Columns gps_data gained for jamming detection (formerly update_gps_table.py)
+GPS_COLUMNS = {
+    'satellites': 'INT DEFAULT 0',
+    'hdop': 'DECIMAL(4,2) DEFAULT 99.99',
+    'jamming_detected': 'BOOLEAN DEFAULT 0',
+}
+
+# Viewport (bbox) lookups: geohash ranges, then the time window inside each
+GEOHASH_INDEX = {spatial.INDEX: ('geohash', 'timestamp', 'id')}
+BACKFILL_BATCH = int(os.getenv('MIGRATION_BATCH_SIZE', 5000))
+
+# Query shapes allowed to sort: a viewport's readings come out of several
+# geohash ranges, so they can't arrive in time order, but they are the few
+# rows inside the box rather than the whole window
+SORTED_QUERIES = ('bbox',)
+
+
+class LegacyLayoutError(StorageError):
+    """The database needs a conversion that migrate() can't run in place"""
+
+
+def base_schema(cursor):
+    """Raw tables, change counters and the /api/stats rollup tables"""
+    get_backend().create_schema(cursor)
+    rollups.create_tables(cursor)
+
+
+def gps_jamming_columns(cursor):
+    """Add the jamming detection columns to a gps_data table that predates them"""
+    backend = get_backend()
+    existing = backend.column_names(cursor, 'gps_data')
+    for name, definition in GPS_COLUMNS.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE gps_data ADD COLUMN {name} {definition}")
+
+
+def composite_indexes(cursor):
+    """Replace the single-column indexes with ones matching the endpoint queries"""
+    backend = get_backend()
+    for table, indexes in COMPOSITE_INDEXES.items():
+        drop = [backend.base_index_name(table, column) for column in REPLACED_INDEXES[table]]
+        backend.alter_indexes(cursor, table, indexes, drop)
+        logger.info(f"{table}: indexes {', '.join(indexes)} in place")
+
+
+def gps_geohash(cursor):
+    """Add gps_data.geohash, fill it in for existing rows and index it"""
+    backend = get_backend()
+    if 'geohash' not in backend.column_names(cursor, 'gps_data'):
+        cursor.execute(f"ALTER TABLE gps_data ADD COLUMN geohash CHAR({spatial.PRECISION})")
+    # Walk the primary key in batches, committing each, so the backfill
+    # doesn't hold one huge transaction; a rerun skips rows already done
+    last_id, filled = '', 0
+    while True:
+        cursor.execute(
+            "SELECT id, timestamp, latitude, longitude, geohash FROM gps_data "
+            "WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, BACKFILL_BATCH)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = [(spatial.encode(latitude, longitude), row_id, timestamp)
+                   for row_id, timestamp, latitude, longitude, geohash in rows if geohash is None]
+        if updates:
+            cursor.executemany("UPDATE gps_data SET geohash = %s WHERE id = %s AND timestamp = %s", updates)
+            cursor.connection.commit()
+            filled += len(updates)
+    logger.info(f"gps_data: geohash filled in for {filled} rows")
+    backend.alter_indexes(cursor, 'gps_data', GEOHASH_INDEX, [])
+
+
+def gps_cluster_grid(cursor):
+    """Create the /api/gps/clusters grid and fill it from the existing readings"""
+    clusters.create_tables(cursor)
+    clusters.rebuild(cursor)
+
+
+# (version, name, step). Append new steps; never renumber or edit applied ones.
+MIGRATIONS = [
+    (1, 'base schema', base_schema),
+    (2, 'gps_data jamming columns', gps_jamming_columns),
+    (3, 'composite endpoint indexes', composite_indexes),
+    (4, 'gps_data geohash index', gps_geohash),
+    (5, 'gps cluster grid', gps_cluster_grid),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Highest applied version, 0 for a database that has never been migrated"""
+    c = conn.cursor()
+    try:
+        c.execute("SELECT MAX(version) FROM schema_migrations")
+        version = c.fetchone()[0] or 0
+    except Exception:
+        # No bookkeeping table yet
+        version = 0
+    # Don't leave a read snapshot open on a connection headed back to the pool
+    conn.rollback()
+    return version
+
+
+def legacy_id_tables(conn):
+    """Raw tables that still have VARCHAR(36) ids (MySQL; SQLite reads both forms)"""
+    backend = get_backend()
+    if backend.name != 'mysql':
+        return []
+    c = conn.cursor()
+    tables = [table for table in COMPOSITE_INDEXES
+              if backend.column_type(c, table, 'id') not in (None, 'binary')]
+    conn.rollback()
+    return tables
+
+
+def check_layout(conn):
+    """Raise LegacyLayoutError if the ids haven't been converted by migrate_ids.py"""
+    tables = legacy_id_tables(conn)
+    if tables:
+        raise LegacyLayoutError(
+            f"{', '.join(tables)} still store VARCHAR(36) ids, which this version can't read or write. "
+            f"Convert them with 'python migrate_ids.py copy' and 'python migrate_ids.py swap' "
+            f"(see DEPLOYMENT.md, Row IDs), then start again."
+        )
+
+
+def migrate(conn, timeout=LOCK_TIMEOUT, check_ids=True):
+    """Apply pending migrations; returns the versions that were applied
+
+    Raises LegacyLayoutError on a database with VARCHAR(36) ids unless
+    ``check_ids`` is False (migrate_ids.py itself).
+    """
+    if check_ids:
+        check_layout(conn)
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+    backend = get_backend()
+    applied = []
+    with backend.migration_lock(conn, timeout):
+        c = conn.cursor()
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        conn.commit()
+        # Another process may have finished while this one waited for the lock
+        version = current_version(conn)
+        for number, name, step in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"Applying migration {number}: {name} ({backend.name})")
+            step(c)
+            c.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (number, name))
+            conn.commit()
+            applied.append(number)
+    return applied
+
+
+def applied_migrations(conn):
+    c = conn.cursor()
+    c.execute("SELECT version, name, applied_at FROM schema_migrations ORDER BY version")
+    return c.fetchall()
+
+
+def endpoint_queries():
+    """(label, index, query, params) for every query shape the read endpoints issue
+
+    Mirrors the filters built in flaskkk.py (/api/alerts, /api/gps, /logs,
+    /api/deauth_logs), event_stream.py, rollups.window_query() and
+    clusters.cluster_query(). List queries appear in their first-page,
+    next-page and delta (?after= with its overlap re-read, ?since=) forms,
+    plus the whole-window read behind /api/gps?max_points= and
+    /api/gps/track/<device_id>, and the ?bbox= viewport variants of /api/gps.
+    ``index`` is the index the query is expected to read (PRIMARY for the
+    primary key).
+    """
+    backend = get_backend()
+    recent = f"timestamp >= {backend.hours_ago()}"
+    cursor = encode_cursor({'timestamp': '2024-01-01 00:00:00',
+                            'id': '00000000-0000-7000-8000-000000000000'})
+    filters = [
+        ('alerts', 'hours', 'idx_alerts_time_id', [recent], [24]),
+        ('alerts', 'hours+tool_name', 'idx_alerts_tool_time', [recent, "tool_name = %s"], [24, 'kismet']),
+        ('alerts', 'hours+severity', 'idx_alerts_severity_time', [recent, "severity = %s"], [24, 'high']),
+        ('alerts', 'hours+tool_name+severity', 'idx_alerts_tool_severity_time',
+         [recent, "tool_name = %s", "severity = %s"], [24, 'kismet', 'high']),
+        ('gps_data', 'hours', 'idx_gps_data_time_id', [recent], [24]),
+        ('gps_data', 'hours+device_id', 'idx_gps_data_device_time', [recent, "device_id = %s"], [24, 'gps-1']),
+        ('network_attacks', 'hours', 'idx_network_attacks_time_id', [recent], [24]),
+    ]
+    for table, label, index, conditions, params in filters:
+        columns = list(TABLE_COLUMNS[table])
+        yield (f"{table} {label}", index) + build_page_query(table, columns, conditions, params, None, 1000)
+        yield (f"{table} {label} cursor", index) + build_page_query(table, columns, conditions, params,
+                                                                    cursor, 1000)
+        yield (f"{table} {label} after", index) + build_delta_query(table, columns, conditions, params,
+                                                                    cursor, None, 1000)
+        yield (f"{table} {label} overlap", index) + build_overlap_query(table, columns, conditions, params,
+                                                                        cursor, 1000)
+        yield (f"{table} {label} since", index) + build_delta_query(table, columns, conditions, params,
+                                                                    None, '2024-01-01T00:00:00', 1000)
+        if table == 'gps_data':
+            yield (f"{table} {label} max_points", index) + build_window_query(table, columns, conditions,
+                                                                              params)
+
+    bbox_conditions, bbox_params = spatial.bbox_conditions((34.9, 31.0, 35.3, 31.3))
+    hint = backend.index_hint(spatial.INDEX)
+    columns = list(TABLE_COLUMNS['gps_data'])
+    for label, conditions, params in [('hours+bbox', [recent] + bbox_conditions, [24] + bbox_params),
+                                      ('hours+device_id+bbox', [recent, "device_id = %s"] + bbox_conditions,
+                                       [24, 'gps-1'] + bbox_params)]:
+        yield (f"gps_data {label}", spatial.INDEX) + build_page_query('gps_data', columns, conditions, params,
+                                                                      None, 1000, hint)
+        yield (f"gps_data {label} cursor", spatial.INDEX) + build_page_query('gps_data', columns, conditions,
+                                                                             params, cursor, 1000, hint)
+        yield (f"gps_data {label} since", spatial.INDEX) + build_delta_query(
+            'gps_data', columns, conditions, params, None, '2024-01-01T00:00:00', 1000, hint)
+        yield (f"gps_data {label} max_points", spatial.INDEX) + build_window_query(
+            'gps_data', columns, conditions, params, hint)
+
+    for table in COMPOSITE_INDEXES:
+        yield (f"{table} stream latest", f"idx_{table}_time_id",
+               f"SELECT timestamp, BIN_TO_UUID(id) FROM {table} ORDER BY timestamp DESC, id DESC LIMIT 1",
+               [])
+    yield ('data_versions', 'PRIMARY', "SELECT version FROM data_versions WHERE table_name = %s", ['alerts'])
+
+    for zoom, bbox in [(3, None), (8, (33.0, 29.5, 37.0, 33.0)), (15, (35.85, 31.81, 35.93, 31.85))]:
+        yield (f"gps_grid zoom {zoom}", 'PRIMARY') + clusters.cluster_query(
+            clusters.level_for_zoom(zoom), bbox, '2024-01-01 00:00:00')
+
+    # /api/stats: each window_totals() call, over a window with whole hours
+    # (hour and minute tables) and one inside the current hour (minute table)
+    now = datetime.datetime(2024, 1, 2, 12, 30)
+    for table, spec in rollups.ROLLUPS.items():
+        for dimension in spec['dimensions']:
+            for measure in spec['measures']:
+                for hours in (24, 0):
+                    yield (f"{table} stats {dimension} {measure} {hours}h", 'PRIMARY') + rollups.window_query(
+                        table, dimension, measure, now, hours)
+
+
+def explain(conn):
+    """Check every endpoint query's plan; returns (label, problems) pairs with problems"""
+    backend = get_backend()
+    failures = []
+    for label, index, query, params in endpoint_queries():
+        problems = backend.plan_problems(conn, query, params)
+        if any(shape in label for shape in SORTED_QUERIES):
+            problems = [p for p in problems if 'sort' not in p]
+        used = backend.plan_indexes(conn, query, params)
+        if index not in used:
+            problems.append(f"reads {', '.join(sorted(used)) or 'no index'} instead of {index}")
+        if problems:
+            failures.append((label, problems))
+    conn.rollback()
+    return failures
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'dashboard'),
+        'passwd': os.getenv('DB_PASSWORD', 'securepass'),
+        'db': os.getenv('DB_NAME', 'security_dashboard'),
+    }
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    conn = get_backend().connect(**db_config)
+    try:
+        if command == 'migrate':
+            applied = migrate(conn)
+            print(f"Applied {', '.join(map(str, applied))}" if applied
+                  else f"Schema is current (version {LATEST_VERSION})")
+        elif command == 'status':
+            done = {row[0]: row for row in applied_migrations(conn)} if current_version(conn) else {}
+            for number, name, _ in MIGRATIONS:
+                state = f"applied {done[number][2]}" if number in done else 'pending'
+                print(f"{number:>4}  {name:<32} {state}")
+            for table in legacy_id_tables(conn):
+                print(f"      {table}: VARCHAR(36) ids, run migrate_ids.py")
+        elif command == 'explain':
+            failures = explain(conn)
+            for label, problems in failures:
+                print(f"{label}: {'; '.join(problems)}")
+            if failures:
+                sys.exit(1)
+            print("All endpoint queries use an index for their filter and order")
+        else:
+            print(f"Usage: {sys.argv[0]} [migrate | status | explain]")
+            sys.exit(1)
+    except LegacyLayoutError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        conn.close()
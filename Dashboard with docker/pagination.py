@@ -0,0 +1,234 @@
+"""
+Keyset pagination and column projection for the list endpoints
+
+Pages are ordered newest first on ``(timestamp, id)``. The cursor handed to
+clients is an opaque, URL-safe token holding the last row's key, so the next
+page is a range seek on the timestamp index instead of an OFFSET scan.
+The same cursors work in the other direction for delta polling: ``after``
+returns only rows newer than a key the client already has.
+
+Rows are keyed by the time a reading was taken, not the time it was
+committed. A write-behind batch or a sensor with a skewed clock can commit
+a row whose timestamp is already behind a client's cursor, so delta
+responses also repeat the rows of the last DELTA_OVERLAP seconds before
+the cursor, and clients drop the ids they already have.
+"""
+import os
+import json
+import base64
+import datetime
+
+import ids
+from rollups import parse_timestamp
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 1000))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 10000))
+# How far behind a cursor a late-committed row is still picked up
+DELTA_OVERLAP = float(os.getenv('DELTA_OVERLAP_SECONDS', 30))
+
+# Columns clients may ask for with ?fields=, per table
+TABLE_COLUMNS = {
+    'alerts': ('id', 'tool_name', 'alert_type', 'severity', 'description', 'raw_data',
+               'timestamp', 'source_ip'),
+    'gps_data': ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'satellites',
+                 'hdop', 'jamming_detected'),
+    'network_attacks': ('id', 'timestamp', 'alert_type', 'attacker_bssid', 'attacker_ssid',
+                        'destination_bssid', 'destination_ssid', 'attack_count', 'source_ip'),
+}
+
+# Key columns are always selected because the cursor is built from them
+KEY_COLUMNS = ('timestamp', 'id')
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed cursor, limit or field list"""
+
+
+def encode_cursor(row):
+    """Build the opaque cursor that points just past ``row``"""
+    key = [str(row['timestamp']), str(row['id'])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) pair stored in a cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not ids.is_valid(row_id):
+        raise PaginationError('Invalid cursor')
+    try:
+        parse_timestamp(timestamp)
+    except ValueError:
+        raise PaginationError('Invalid cursor')
+    return str(timestamp), str(row_id)
+
+
+def row_key(row):
+    """(timestamp, id) of a row in the order the database sorts them
+
+    A datetime and the 16 id bytes, so keys compare correctly whatever
+    text form the timestamp came in.
+    """
+    return parse_timestamp(row['timestamp']), ids.to_binary(str(row['id']))
+
+
+def cursor_key(cursor):
+    """row_key() of the row a cursor points at"""
+    timestamp, row_id = decode_cursor(cursor)
+    return row_key({'timestamp': timestamp, 'id': row_id})
+
+
+def parse_limit(value):
+    """Clamp the requested page size to [1, MAX_PAGE_SIZE]"""
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(table, value):
+    """Validate ?fields= against the table's columns
+
+    Returns (select_columns, output_columns). ``output_columns`` is None when
+    every column was requested.
+    """
+    columns = TABLE_COLUMNS[table]
+    if not value:
+        return list(columns), None
+    requested = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in columns:
+            raise PaginationError(f'Unknown field: {name}')
+        if name not in requested:
+            requested.append(name)
+    if not requested:
+        raise PaginationError('fields must name at least one column')
+    select = requested + [key for key in KEY_COLUMNS if key not in requested]
+    return select, requested
+
+
+def build_page_query(table, select_columns, conditions, params, cursor, limit, hint=''):
+    """Compose the keyset-paginated SELECT for one page
+
+    One extra row is fetched so the caller can tell whether a next page exists.
+    With ``limit=None`` the query is unbounded (used by streaming exports).
+    ``hint`` is an index hint from the backend's index_hint(), or empty.
+    """
+    conditions = list(conditions)
+    params = list(params)
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        # The leading ``timestamp <= %s`` is implied by the OR; it keeps the
+        # seek one index range in order instead of two merged and re-sorted
+        conditions.append(f"timestamp <= %s AND (timestamp < %s OR (timestamp = %s AND {table}.id < {ids.ID_PARAM}))")
+        params.extend([timestamp, timestamp, timestamp, row_id])
+
+    # ``{table}.id`` is the binary column; plain ``id`` is the text alias
+    query = f"SELECT {ids.select_columns(select_columns)} FROM {table}{hint}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY timestamp DESC, {table}.id DESC"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    return query, params
+
+
+def build_delta_query(table, select_columns, conditions, params, after, since, limit, hint=''):
+    """Compose the SELECT for rows newer than an ``after`` cursor or ``since`` time
+
+    Rows are read oldest first so a burst larger than ``limit`` is delivered
+    over several polls without gaps; split_delta() flips them back to newest
+    first for the response.
+    """
+    conditions = list(conditions)
+    params = list(params)
+    if after:
+        timestamp, row_id = decode_cursor(after)
+        conditions.append(f"timestamp >= %s AND (timestamp > %s OR (timestamp = %s AND {table}.id > {ids.ID_PARAM}))")
+        params.extend([timestamp, timestamp, timestamp, row_id])
+    if since:
+        conditions.append("timestamp > %s")
+        # Stored timestamps use a space; SQLite compares them as text
+        params.append(since.replace('T', ' ', 1))
+
+    query = f"SELECT {ids.select_columns(select_columns)} FROM {table}{hint}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY timestamp ASC, {table}.id ASC LIMIT %s"
+    params.append(limit + 1)
+    return query, params
+
+
+def build_overlap_query(table, select_columns, conditions, params, after, limit, hint=''):
+    """Compose the SELECT re-reading the DELTA_OVERLAP seconds up to an ``after`` cursor
+
+    Returns the rows at or before the cursor, newest first, that a client
+    may have missed because they were committed after it moved past their
+    timestamp. At most ``limit`` rows are read.
+    """
+    timestamp, row_id = decode_cursor(after)
+    start = parse_timestamp(timestamp) - datetime.timedelta(seconds=DELTA_OVERLAP)
+    # BETWEEN rather than two comparisons: next to the ?hours= bound, three
+    # separate range terms lead SQLite's planner to a shorter index
+    conditions = list(conditions) + [
+        f"timestamp BETWEEN %s AND %s AND (timestamp < %s OR {table}.id <= {ids.ID_PARAM})"
+    ]
+    params = list(params) + [start, timestamp, timestamp, row_id, limit]
+    query = f"SELECT {ids.select_columns(select_columns)} FROM {table}{hint}"
+    query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY timestamp DESC, {table}.id DESC LIMIT %s"
+    return query, params
+
+
+def build_window_query(table, select_columns, conditions, params, hint=''):
+    """Compose an unpaged SELECT of every matching row, oldest first
+
+    Used where the server reduces the whole window itself (GPS decimation)
+    rather than handing it out page by page.
+    """
+    query = f"SELECT {ids.select_columns(select_columns)} FROM {table}{hint}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY timestamp ASC, {table}.id ASC"
+    return query, list(params)
+
+
+def split_delta(rows, limit, output_columns, repeated=()):
+    """Return (rows newest first, cursor of the newest row, more rows pending)
+
+    ``repeated`` are the overlap rows from build_overlap_query(); they sort
+    before the cursor, so they follow the new rows in the response.
+    """
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest_cursor = encode_cursor(rows[-1]) if rows else None
+    rows.reverse()
+    rows.extend(repeated)
+    if output_columns is not None:
+        rows = [{name: row[name] for name in output_columns} for row in rows]
+    return rows, latest_cursor, has_more
+
+
+def split_page(rows, limit, output_columns):
+    """Trim the look-ahead row, build the next cursor and apply the projection"""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    if output_columns is not None:
+        rows = [{name: row[name] for name in output_columns} for row in rows]
+    return rows, next_cursor
@@ -0,0 +1,56 @@
+"""
+Encoded polyline format for /api/gps/track/<device_id>
+
+The coordinates of a track are sent as one string in Google's encoded
+polyline format, which Leaflet plugins, OSRM and most mapping libraries
+decode: each latitude and longitude is rounded to ``precision`` decimal
+places, stored as the difference from the previous point, and written as
+a zigzag varint in printable ASCII. Consecutive GPS readings differ by a
+few units in the last place, so most points cost 2-4 characters per
+coordinate instead of a 10-20 byte JSON number.
+"""
+
+DEFAULT_PRECISION = 5  # ~1 m; 6 for ~10 cm (OSRM's polyline6)
+
+
+def _encode_value(value, chunks):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode(latitudes, longitudes, precision=DEFAULT_PRECISION):
+    """Encode parallel coordinate sequences as a polyline string"""
+    factor = 10 ** precision
+    chunks = []
+    last_lat = last_lon = 0
+    for latitude, longitude in zip(latitudes, longitudes):
+        lat = int(round(float(latitude) * factor))
+        lon = int(round(float(longitude) * factor))
+        _encode_value(lat - last_lat, chunks)
+        _encode_value(lon - last_lon, chunks)
+        last_lat, last_lon = lat, lon
+    return ''.join(chunks)
+
+
+def decode(text, precision=DEFAULT_PRECISION):
+    """Inverse of encode(): list of (latitude, longitude)"""
+    factor = 10 ** precision
+    points = []
+    values = []
+    shift = result = 0
+    for char in text:
+        byte = ord(char) - 63
+        result |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift = result = 0
+    lat = lon = 0
+    for i in range(0, len(values) - 1, 2):
+        lat += values[i]
+        lon += values[i + 1]
+        points.append((lat / factor, lon / factor))
+    return points
@@ -0,0 +1,152 @@
+"""
+Sliding-window rate limiter shared by all gunicorn workers
+
+State lives in a fixed-size table inside a memory-mapped file, so every
+worker forked from the master (or opening the same file) sees the same
+counters and the limit applies per client rather than per worker. Each
+client uses one slot holding the request counts for the current and the
+previous minute; the weighted sum of the two approximates a true sliding
+window with O(1) work per request. When the table is full the least
+recently seen client in the probe range is evicted, and blocks expire.
+"""
+import os
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+import threading
+
+from file_lock import locked
+
+# Header: magic, capacity, rejections, blocks, evictions
+HEADER = struct.Struct('<QQQQQ')
+HEADER_SIZE = 64
+MAGIC = 0x524C494D49543031  # "RLIMIT01"
+
+# Slot: key hash, window start, previous count, current count, blocked until, last seen
+SLOT = struct.Struct('<QdIIdd')
+
+# Slots inspected per lookup before evicting the least recently seen one
+PROBES = 8
+
+
+def default_state_path():
+    """Prefer RAM-backed /dev/shm so the table never touches disk"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'security_dashboard_ratelimit')
+
+
+class SharedRateLimiter:
+    """Per-key sliding-window counter stored in a shared mmap"""
+
+    def __init__(self, path=None, limit=100, window=60, block_seconds=300, capacity=65536):
+        self.path = path or default_state_path()
+        self.limit = limit
+        self.window = window
+        self.block_seconds = block_seconds
+        self.capacity = capacity
+        self._thread_lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        size = HEADER_SIZE + SLOT.size * self.capacity
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._fd_pid = os.getpid()
+        with locked(self._fd):
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size, mmap.MAP_SHARED)
+            magic, capacity = HEADER.unpack_from(self._map, 0)[:2]
+            if magic != MAGIC or capacity != self.capacity:
+                self._map[:size] = bytes(size)
+                HEADER.pack_into(self._map, 0, MAGIC, self.capacity, 0, 0, 0)
+
+    def _lock_fd(self):
+        # A descriptor inherited across fork shares its flock with the parent
+        # (preload_app), so each worker reopens the file before locking
+        if self._fd_pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._fd_pid = os.getpid()
+        return self._fd
+
+    def _key(self, client):
+        digest = hashlib.blake2b(client.encode(), digest_size=8).digest()
+        # 0 marks an empty slot
+        return int.from_bytes(digest, 'little') or 1
+
+    def _bump_header(self, index):
+        fields = list(HEADER.unpack_from(self._map, 0))
+        fields[index] += 1
+        HEADER.pack_into(self._map, 0, *fields)
+
+    def _find_slot(self, key, now):
+        """Return the offset of ``key``'s slot, claiming or evicting one if needed"""
+        start = key % self.capacity
+        victim = None
+        victim_seen = None
+        for probe in range(PROBES):
+            offset = HEADER_SIZE + ((start + probe) % self.capacity) * SLOT.size
+            slot_key, _, _, _, blocked_until, last_seen = SLOT.unpack_from(self._map, offset)
+            if slot_key == key:
+                return offset
+            if slot_key == 0:
+                SLOT.pack_into(self._map, offset, key, 0.0, 0, 0, 0.0, now)
+                return offset
+            # Never evict a client that is still serving a block
+            if blocked_until <= now and (victim_seen is None or last_seen < victim_seen):
+                victim, victim_seen = offset, last_seen
+        if victim is None:
+            victim = HEADER_SIZE + start * SLOT.size
+        SLOT.pack_into(self._map, victim, key, 0.0, 0, 0, 0.0, now)
+        self._bump_header(4)
+        return victim
+
+    def check(self, client, now=None):
+        """Count one request from ``client``
+
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time() if now is None else now
+        key = self._key(client)
+        with self._thread_lock, locked(self._lock_fd()):
+            offset = self._find_slot(key, now)
+            _, window_start, previous, current, blocked_until, _ = SLOT.unpack_from(self._map, offset)
+
+            if blocked_until > now:
+                SLOT.pack_into(self._map, offset, key, window_start, previous, current, blocked_until, now)
+                self._bump_header(2)
+                return False, blocked_until - now
+
+            aligned = now - (now % self.window)
+            if aligned != window_start:
+                # Roll the window; anything older than one window is forgotten
+                previous = current if aligned - window_start == self.window else 0
+                current = 0
+                window_start = aligned
+
+            weight = (self.window - (now - window_start)) / self.window
+            estimate = previous * weight + current
+            if estimate >= self.limit:
+                blocked_until = now + self.block_seconds
+                SLOT.pack_into(self._map, offset, key, window_start, previous, current, blocked_until, now)
+                self._bump_header(2)
+                self._bump_header(3)
+                return False, self.block_seconds
+
+            SLOT.pack_into(self._map, offset, key, window_start, previous, current + 1, 0.0, now)
+            return True, 0
+
+    def stats(self):
+        """Totals shared by all workers"""
+        _, capacity, rejections, blocks, evictions = HEADER.unpack_from(self._map, 0)
+        return {
+            'capacity': capacity,
+            'rejections': rejections,
+            'blocks': blocks,
+            'evictions': evictions,
+            'limit': self.limit,
+            'window_seconds': self.window,
+            'block_seconds': self.block_seconds,
+        }
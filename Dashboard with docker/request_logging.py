@@ -0,0 +1,127 @@
+"""
+Non-blocking, sampled logging for the Security Dashboard
+
+Log records go onto an in-memory queue and a background listener thread
+does the actual file and stderr writes, so a request never waits on disk.
+Request logs are sampled per route: errors are always kept, while noisy
+successful routes such as sensor ingest can be logged at e.g. 1%.
+Everything is written as compact single-line JSON.
+"""
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+
+_queue = None
+_queue_handler = None
+_listener = None
+_handlers = []
+_fork_hook_registered = False
+
+
+class CompactJsonFormatter(logging.Formatter):
+    """One short JSON object per line; extra fields from ``fields=`` are merged in"""
+
+    def format(self, record):
+        entry = {
+            't': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'lvl': record.levelname,
+            'log': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    """Give a freshly forked worker its own queue and listener thread
+
+    Records still queued in the parent at fork time stay with the parent,
+    otherwise both processes would write them.
+    """
+    global _queue
+    _queue = queue.SimpleQueue()
+    _queue_handler.queue = _queue
+    _start_listener()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(log_file='app.log', level=logging.INFO):
+    """Route all logging through a queue drained by a background thread"""
+    global _queue, _queue_handler, _fork_hook_registered
+    formatter = CompactJsonFormatter()
+    _handlers.clear()
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(formatter)
+        _handlers.append(file_handler)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+    _handlers.append(stream_handler)
+
+    _queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _queue_handler = logging.handlers.QueueHandler(_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _start_listener()
+    if not _fork_hook_registered:
+        _fork_hook_registered = True
+        atexit.register(_stop_listener)
+        # Threads don't survive fork, so each gunicorn worker starts its own listener
+        os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def parse_sampling(spec):
+    """Parse "POST /api/alerts=0.01,POST /api/gps=0.01,default=1" into a dict"""
+    rates = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        route, rate = item.rsplit('=', 1)
+        try:
+            rates[route.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class RequestSampler:
+    """Decides which completed requests get a log line"""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.default = rates.get('default', 1.0)
+
+    def rate_for(self, method, rule):
+        return self.rates.get(f'{method} {rule}', self.rates.get(rule, self.default))
+
+    def should_log(self, method, rule, status):
+        # Client and server errors are always kept
+        if status >= 400:
+            return True
+        rate = self.rate_for(method, rule)
+        return rate >= 1.0 or (rate > 0 and random.random() < rate)
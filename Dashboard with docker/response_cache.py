@@ -0,0 +1,250 @@
+"""
+Read-through response cache shared by all gunicorn workers
+
+Rendered responses of the read endpoints are kept as small files in a
+RAM-backed directory, so every worker serves the same copy. Entries live
+for a short TTL and their key includes a per-table generation counter held
+in a shared mmap; a write bumps the counter and every cached response that
+depended on that table stops matching at once. Concurrent misses for the
+same key are collapsed: the first request creates a "filling" marker file
+next to the entry and runs the query, the rest poll for its result. No
+lock is held while the query runs, so a waiting request only sleeps,
+which under gevent lets the worker serve other requests.
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+
+from file_lock import locked
+
+# One 8-byte generation counter per cacheable table
+TABLES = ('alerts', 'gps_data', 'network_attacks')
+COUNTER = struct.Struct('<Q')
+
+# How often a request waiting for another one's render looks for the entry
+FILL_POLL_SECONDS = 0.01
+
+
+def default_cache_dir():
+    """Prefer RAM-backed /dev/shm so cached responses never touch disk"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'security_dashboard_cache')
+
+
+class CachedResponse:
+    """Status, headers and body of one rendered response"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        for key, value in self.headers:
+            if key.lower() == name.lower():
+                return value
+        return default
+
+
+class ResponseCache:
+    """TTL cache with per-table invalidation and single-flight misses"""
+
+    def __init__(self, directory=None, ttl=5.0, max_entry_bytes=4 * 1024 * 1024, fill_timeout=10.0):
+        self.directory = directory or default_cache_dir()
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        # A waiting request renders on its own after this long, and a marker
+        # this old is taken to belong to a request that died mid-render
+        self.fill_timeout = fill_timeout
+        self.enabled = ttl > 0
+        self._lock_fds = {}
+        self._stats = {'hits': 0, 'misses': 0, 'collapsed': 0, 'invalidations': 0, 'uncacheable': 0}
+        self._last_sweep = 0.0
+        if self.enabled:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            self._open_generations()
+
+    def _open_generations(self):
+        size = COUNTER.size * len(TABLES)
+        fd = self._lock_fd('generations')
+        with locked(fd):
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._generations = mmap.mmap(fd, size, mmap.MAP_SHARED)
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def generation(self, table):
+        return COUNTER.unpack_from(self._generations, TABLES.index(table) * COUNTER.size)[0]
+
+    def invalidate(self, *tables):
+        """Drop every cached response that depends on any of ``tables``"""
+        if not self.enabled:
+            return
+        with locked(self._lock_fd('generations')):
+            for table in tables:
+                offset = TABLES.index(table) * COUNTER.size
+                COUNTER.pack_into(self._generations, offset,
+                                  COUNTER.unpack_from(self._generations, offset)[0] + 1)
+        self._stats['invalidations'] += 1
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def make_key(self, parts, tables):
+        """Hash the normalized request parts together with the table generations"""
+        generations = [f"{table}={self.generation(table)}" for table in sorted(tables)]
+        raw = json.dumps([parts, generations], separators=(',', ':'), default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_or_set(self, parts, tables, render):
+        """Return the cached response for ``parts``, rendering it on a miss
+
+        ``render()`` must return a CachedResponse. Only one caller per key
+        renders at a time across all workers; the others wait and reuse it,
+        for up to ``fill_timeout`` seconds before rendering themselves.
+        """
+        if not self.enabled:
+            return render()
+        key = self.make_key(parts, tables)
+        entry = self._read(key)
+        if entry is not None:
+            self._stats['hits'] += 1
+            return entry
+
+        deadline = time.monotonic() + self.fill_timeout
+        claimed = self._claim(key)
+        while not claimed and time.monotonic() < deadline:
+            time.sleep(FILL_POLL_SECONDS)
+            entry = self._read(key)
+            if entry is not None:
+                self._stats['collapsed'] += 1
+                return entry
+            # The filler may have finished with an uncacheable response
+            claimed = self._claim(key)
+        try:
+            # The previous filler may have written the entry just before we claimed
+            entry = self._read(key)
+            if entry is not None:
+                self._stats['collapsed'] += 1
+                return entry
+            self._stats['misses'] += 1
+            entry = render()
+            if entry.status == 200 and len(entry.body) <= self.max_entry_bytes:
+                self._write(key, entry)
+            else:
+                self._stats['uncacheable'] += 1
+        finally:
+            if claimed:
+                self._release(key)
+        self._maybe_sweep()
+        return entry
+
+    def _claim(self, key):
+        """Create the key's filling marker; False if another request holds it"""
+        path = self._marker_path(key)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+                return True
+            except FileExistsError:
+                try:
+                    if os.stat(path).st_mtime + self.fill_timeout > time.time():
+                        return False
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                # The directory is unusable; render without coordinating
+                return True
+        return False
+
+    def _release(self, key):
+        try:
+            os.remove(self._marker_path(key))
+        except OSError:
+            pass
+
+    def _lock_fd(self, name):
+        # A descriptor inherited across fork shares its flock with the parent,
+        # so each process opens its own
+        fd = self._lock_fds.get((os.getpid(), name))
+        if fd is None:
+            fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o600)
+            self._lock_fds[(os.getpid(), name)] = fd
+        return fd
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.entry")
+
+    def _marker_path(self, key):
+        return os.path.join(self.directory, f"{key}.filling")
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                header = json.loads(f.readline())
+                if header['expires'] < time.time():
+                    return None
+                return CachedResponse(header['status'], [tuple(h) for h in header['headers']], f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key, entry):
+        header = json.dumps({
+            'expires': time.time() + self.ttl,
+            'status': entry.status,
+            'headers': entry.headers,
+        }, separators=(',', ':')).encode()
+        # Write to a private temp file and rename, so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header + b'\n' + entry.body)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _maybe_sweep(self):
+        """Remove expired entries, at most once per TTL per worker"""
+        now = time.time()
+        if now - self._last_sweep < max(self.ttl, 1.0):
+            return
+        self._last_sweep = now
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(('.entry', '.tmp')):
+                max_age = self.ttl * 2
+            elif name.endswith('.filling'):
+                max_age = self.fill_timeout * 2
+            else:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime + max_age < now:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def stats(self):
+        """Hit/miss counters for this worker plus shared entry count"""
+        stats = dict(self._stats, enabled=self.enabled, ttl_seconds=self.ttl)
+        if self.enabled:
+            try:
+                stats['entries'] = sum(1 for name in os.listdir(self.directory) if name.endswith('.entry'))
+            except OSError:
+                stats['entries'] = 0
+            stats['generations'] = {table: self.generation(table) for table in TABLES}
+        return stats
+
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Time partitioning and retention for alerts, gps_data and network_attacks
+
+On MySQL the raw tables are RANGE partitioned on UNIX_TIMESTAMP(timestamp),
+one partition per day or week plus a catch-all ``pmax``. A background job
+keeps PARTITIONS_AHEAD empty partitions ready in front of the clock and
+drops partitions that fall entirely outside a table's retention with
+ALTER TABLE ... DROP PARTITION, which removes a day of rows without
+touching them one by one. Time-window queries are pruned to the partitions
+they cover.
+
+Tables that aren't partitioned (an existing install not yet converted, or
+the embedded SQLite backend) get the same retention through small batched
+DELETEs on the timestamp index instead.
+
+    python retention.py run         # one maintenance pass now
+    python retention.py status      # partitions per table
+    python retention.py partition   # convert existing tables (rewrites them)
+"""
+import os
+import sys
+import time
+import fcntl
+import logging
+import datetime
+import tempfile
+import threading
+
+import rollups
+import clusters
+from ingest_hooks import bump_data_version
+from storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('alerts', 'gps_data', 'network_attacks')
+INTERVALS = {'day': 1, 'week': 7}
+
+# Partition names carry the upper bound: p20261018 holds rows before 2026-10-18
+MAX_PARTITION = 'pmax'
+
+# Rows per DELETE when a table has no partitions to drop
+DELETE_BATCH_SIZE = int(os.getenv('RETENTION_DELETE_BATCH', 5000))
+
+# Upper limit on partitions created when converting a table with old data
+MAX_INITIAL_PARTITIONS = 400
+
+
+def default_state_path():
+    """Prefer RAM-backed /dev/shm for the shared last-run marker"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'security_dashboard_retention')
+
+
+def parse_policy(spec):
+    """Parse "alerts=90,gps_data=30" (days to keep) into a dict; 0 keeps forever"""
+    policy = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        table, days = item.split('=', 1)
+        table = table.strip()
+        if table not in TABLES:
+            logger.warning(f"Ignoring retention for unknown table {table!r}")
+            continue
+        try:
+            policy[table] = max(0, int(days.strip().rstrip('d')))
+        except ValueError:
+            logger.warning(f"Ignoring invalid retention {item!r}")
+    return policy
+
+
+# ----------------------------------------------------------------------
+# Boundaries
+# ----------------------------------------------------------------------
+def interval_start(moment, interval):
+    """Start of the day (or Monday of the week) containing ``moment``"""
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= datetime.timedelta(days=start.weekday())
+    return start
+
+
+def step(interval):
+    return datetime.timedelta(days=INTERVALS[interval])
+
+
+def retention_cutoff(now, days, interval):
+    """Rows before this moment are expired; aligned to a partition boundary"""
+    return interval_start(now - datetime.timedelta(days=days), interval)
+
+
+def partition_name(boundary):
+    return f"p{boundary:%Y%m%d}"
+
+
+def partition_boundary(name):
+    """Upper bound encoded in a partition name (None for pmax or foreign names)"""
+    try:
+        return datetime.datetime.strptime(name[1:], '%Y%m%d')
+    except ValueError:
+        return None
+
+
+def partition_clause(boundary):
+    # UNIX_TIMESTAMP is evaluated in the server's time zone, like NOW()
+    return (f"PARTITION {partition_name(boundary)} "
+            f"VALUES LESS THAN (UNIX_TIMESTAMP('{boundary:%Y-%m-%d %H:%M:%S}'))")
+
+
+def database_now(cursor):
+    cursor.execute(f"SELECT {get_backend().now()}")
+    return rollups.parse_timestamp(cursor.fetchone()[0])
+
+
+# ----------------------------------------------------------------------
+# Partitions (MySQL)
+# ----------------------------------------------------------------------
+def list_partitions(cursor, table):
+    """Partition names of ``table`` in order, or [] if it isn't partitioned"""
+    if get_backend().name != 'mysql':
+        return []
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def add_future_partitions(cursor, table, partitions, now, interval, ahead):
+    """Split empty partitions off pmax until ``ahead`` future ones exist"""
+    if MAX_PARTITION not in partitions:
+        return []
+    bounds = [b for b in map(partition_boundary, partitions) if b is not None]
+    wanted = interval_start(now, interval) + step(interval)
+    last = wanted + step(interval) * ahead
+    if bounds:
+        wanted = max(wanted, max(bounds) + step(interval))
+    added = []
+    while wanted <= last:
+        added.append(wanted)
+        wanted += step(interval)
+    if not added:
+        return []
+    clauses = ', '.join(partition_clause(b) for b in added)
+    cursor.execute(
+        f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO "
+        f"({clauses}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"
+    )
+    return [partition_name(b) for b in added]
+
+
+def drop_expired_partitions(cursor, table, partitions, cutoff):
+    """Drop partitions whose every row is older than ``cutoff``"""
+    expired = [name for name in partitions
+               if (partition_boundary(name) or datetime.datetime.max) <= cutoff]
+    if expired:
+        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+    return expired
+
+
+def partition_table(conn, table, interval='day', days=0):
+    """Rebuild an unpartitioned MySQL table as a partitioned one
+
+    The primary key gains the timestamp column (MySQL requires it in every
+    unique key of a partitioned table). This copies the table, so run it
+    in a quiet period.
+    """
+    c = conn.cursor()
+    if list_partitions(c, table):
+        return False
+    now = database_now(c)
+    c.execute(f"SELECT MIN(timestamp) FROM {table}")
+    oldest = c.fetchone()[0]
+    first = interval_start(now, interval) + step(interval)
+    if oldest is not None:
+        start = interval_start(rollups.parse_timestamp(oldest), interval) + step(interval)
+        if days:
+            start = max(start, retention_cutoff(now, days, interval))
+        first = min(first, max(start, first - step(interval) * MAX_INITIAL_PARTITIONS))
+    clauses = []
+    boundary = first
+    while boundary <= interval_start(now, interval) + step(interval):
+        clauses.append(partition_clause(boundary))
+        boundary += step(interval)
+    c.execute(
+        f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp) "
+        f"PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) "
+        f"({', '.join(clauses)}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"
+    )
+    return True
+
+
+# ----------------------------------------------------------------------
+# Retention
+# ----------------------------------------------------------------------
+def delete_expired_rows(conn, table, cutoff, batch_size=DELETE_BATCH_SIZE):
+    """Delete rows before ``cutoff`` in short transactions; returns the row count"""
+    statement = get_backend().delete_before(table, batch_size)
+    deleted = 0
+    while True:
+        c = conn.cursor()
+        c.execute(statement, (cutoff,))
+        count = c.rowcount
+        conn.commit()
+        deleted += max(count, 0)
+        if count < batch_size:
+            return deleted
+
+
+def maintain(conn, policy, interval='day', ahead=7):
+    """One pass over every table: create partitions ahead, expire old data
+
+    Returns {table: {'added': [...], 'dropped': [...], 'deleted': rows}}.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"PARTITION_INTERVAL must be one of {', '.join(INTERVALS)}")
+    c = conn.cursor()
+    now = database_now(c)
+    results = {}
+    for table in TABLES:
+        result = {'added': [], 'dropped': [], 'deleted': 0}
+        partitions = list_partitions(c, table)
+        if partitions:
+            result['added'] = add_future_partitions(c, table, partitions, now, interval, ahead)
+        days = policy.get(table, 0)
+        if days:
+            cutoff = retention_cutoff(now, days, interval)
+            if partitions:
+                result['dropped'] = drop_expired_partitions(c, table, partitions, cutoff)
+            else:
+                result['deleted'] = delete_expired_rows(conn, table, cutoff)
+            if result['dropped'] or result['deleted']:
+                # Keep /api/stats and the cluster grid consistent with the rows that are left
+                c = conn.cursor()
+                rollups.prune_before(c, table, cutoff)
+                clusters.prune_before(c, table, cutoff)
+                bump_data_version(c, table)
+                conn.commit()
+        results[table] = result
+    return results
+
+
+class RetentionJob:
+    """Background maintenance thread, run by one worker at a time
+
+    Every worker starts the thread, but each pass takes an flock on a
+    shared marker file that also records when the last pass ran, so the
+    work happens once per ``run_every`` across all workers.
+    """
+
+    def __init__(self, pool, policy, interval='day', ahead=7, run_every=3600,
+                 state_path=None, on_change=None):
+        if interval not in INTERVALS:
+            raise ValueError(f"PARTITION_INTERVAL must be one of {', '.join(INTERVALS)}")
+        self.pool = pool
+        self.policy = policy
+        self.interval = interval
+        self.ahead = ahead
+        self.run_every = run_every
+        self.state_path = state_path or default_state_path()
+        self.on_change = on_change  # called with each table that lost rows
+        self._pid = None
+        self._lock = threading.Lock()
+        self.last_result = None
+
+    def ensure_running(self):
+        """Start this process's thread (cheap to call on every request)"""
+        if self._pid == os.getpid() or self.run_every <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='retention', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_if_due()
+            except Exception as e:
+                logger.error(f"Retention pass failed: {e}")
+            time.sleep(min(self.run_every, 60))
+
+    def run_if_due(self, force=False):
+        """Run a pass unless another worker is on it or ran one recently"""
+        with open(self.state_path, 'a+') as state:
+            try:
+                fcntl.flock(state, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            state.seek(0)
+            try:
+                last_run = float(state.read() or 0)
+            except ValueError:
+                last_run = 0.0
+            if not force and time.time() - last_run < self.run_every:
+                return None
+            with self.pool.connection() as conn:
+                results = maintain(conn, self.policy, self.interval, self.ahead)
+            state.seek(0)
+            state.truncate()
+            state.write(str(time.time()))
+            state.flush()
+        self.last_result = results
+        for table, result in results.items():
+            if result['added'] or result['dropped'] or result['deleted']:
+                logger.info(f"Retention {table}: added {result['added']}, "
+                            f"dropped {result['dropped']}, deleted {result['deleted']} rows")
+            if (result['dropped'] or result['deleted']) and self.on_change:
+                self.on_change(table)
+        return results
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'dashboard'),
+        'passwd': os.getenv('DB_PASSWORD', 'securepass'),
+        'db': os.getenv('DB_NAME', 'security_dashboard'),
+    }
+    policy = parse_policy(os.getenv('DATA_RETENTION', ''))
+    interval = os.getenv('PARTITION_INTERVAL', 'day')
+    ahead = int(os.getenv('PARTITIONS_AHEAD', 7))
+    command = sys.argv[1] if len(sys.argv) > 1 else 'run'
+    conn = get_backend().connect(**db_config)
+    try:
+        if command == 'run':
+            for table, result in maintain(conn, policy, interval, ahead).items():
+                print(f"{table}: added {len(result['added'])} partitions, dropped "
+                      f"{len(result['dropped'])}, deleted {result['deleted']} rows")
+        elif command == 'status':
+            c = conn.cursor()
+            for table in TABLES:
+                partitions = list_partitions(c, table)
+                keep = policy.get(table, 0)
+                print(f"{table}: retention {f'{keep} days' if keep else 'forever'}, "
+                      f"{len(partitions) or 'no'} partitions"
+                      + (f" ({partitions[0]} .. {partitions[-1]})" if partitions else ''))
+        elif command == 'partition':
+            if get_backend().name != 'mysql':
+                print("Partitioning needs DB_BACKEND=mysql")
+                sys.exit(1)
+            for table in sys.argv[2:] or TABLES:
+                converted = partition_table(conn, table, interval, policy.get(table, 0))
+                print(f"{table}: {'partitioned' if converted else 'already partitioned'}")
+            maintain(conn, policy, interval, ahead)
+        else:
+            print(f"Usage: {sys.argv[0]} [run | status | partition [table ...]]")
+            sys.exit(1)
+    finally:
+        conn.close()
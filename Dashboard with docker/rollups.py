@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated time-bucket rollups for /api/stats
+
+Minute and hour tables hold counts per dimension for alerts (tool_name,
+severity), network_attacks (alert_type) and gps_data (device_id, with a
+jamming count). They are updated in the same transaction as each ingest,
+so /api/stats sums a few hundred bucket rows instead of scanning the raw
+tables. Run ``python rollups.py backfill`` to rebuild them from raw rows.
+"""
+import os
+import sys
+import datetime
+import logging
+
+from storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Minute buckets older than this are pruned; windows reaching further back
+# start on an hour boundary instead.
+MINUTE_RETENTION_HOURS = int(os.getenv('ROLLUP_MINUTE_RETENTION_HOURS', 48))
+
+# Raw table -> rollup definition. Each measure has a per-row Python value and
+# the SQL aggregate used by backfill.
+ROLLUPS = {
+    'alerts': {
+        'prefix': 'alert_rollup',
+        'dimensions': ('tool_name', 'severity'),
+        'measures': {
+            'count': (lambda row: 1, 'COUNT(*)'),
+        },
+    },
+    'network_attacks': {
+        'prefix': 'attack_rollup',
+        'dimensions': ('alert_type',),
+        'measures': {
+            'count': (lambda row: 1, 'COUNT(*)'),
+        },
+    },
+    'gps_data': {
+        'prefix': 'gps_rollup',
+        'dimensions': ('device_id',),
+        'measures': {
+            'readings': (lambda row: 1, 'COUNT(*)'),
+            'jamming': (lambda row: 1 if row.get('jamming_detected') else 0,
+                        'SUM(jamming_detected <> 0)'),
+        },
+    },
+}
+
+GRANULARITIES = ('minute', 'hour')
+
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S.%f',
+                     '%Y-%m-%dT%H:%M:%S.%f')
+
+
+def rollup_table(source, granularity):
+    return f"{ROLLUPS[source]['prefix']}_{granularity}"
+
+
+def create_tables(cursor):
+    """Create the rollup tables if they don't exist"""
+    for source, spec in ROLLUPS.items():
+        dimensions = ',\n'.join(f"    {name} VARCHAR(100) NOT NULL DEFAULT ''" for name in spec['dimensions'])
+        measures = ',\n'.join(f"    {name} BIGINT UNSIGNED NOT NULL DEFAULT 0" for name in spec['measures'])
+        key = ', '.join(('bucket',) + spec['dimensions'])
+        for granularity in GRANULARITIES:
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {rollup_table(source, granularity)} (
+                bucket DATETIME NOT NULL,
+{dimensions},
+{measures},
+                PRIMARY KEY ({key})
+            )
+            ''')
+
+
+def parse_timestamp(value):
+    """Convert a stored timestamp value to a datetime
+
+    Raises ValueError for a missing value or one in none of
+    TIMESTAMP_FORMATS, rather than guessing: counting such a row in the
+    current bucket would put it in the rollups at a time it was never
+    stored with.
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    if value:
+        text = str(value).strip()
+        for fmt in TIMESTAMP_FORMATS:
+            try:
+                return datetime.datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+    raise ValueError(f"Unrecognized timestamp {value!r}")
+
+
+def truncate(moment, granularity):
+    if granularity == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def apply_rollups(cursor, table, columns, rows):
+    """Add freshly inserted rows to the rollups inside the caller's transaction
+
+    Rows are aggregated in Python first so a batch costs one upsert per
+    (bucket, dimensions) combination rather than one per row.
+    """
+    spec = ROLLUPS.get(table)
+    if not spec or not rows:
+        return
+    measure_names = list(spec['measures'])
+    for granularity in GRANULARITIES:
+        totals = {}
+        for values in rows:
+            row = dict(zip(columns, values))
+            bucket = truncate(parse_timestamp(row.get('timestamp')), granularity)
+            key = (bucket,) + tuple(str(row.get(name) or '')[:100] for name in spec['dimensions'])
+            counts = totals.setdefault(key, [0] * len(measure_names))
+            for i, name in enumerate(measure_names):
+                counts[i] += spec['measures'][name][0](row)
+
+        target = rollup_table(table, granularity)
+        all_columns = ('bucket',) + spec['dimensions'] + tuple(measure_names)
+        cursor.executemany(
+            get_backend().upsert_add(target, all_columns, ('bucket',) + spec['dimensions'],
+                                     measure_names),
+            [key + tuple(counts) for key, counts in totals.items()]
+        )
+
+
+def clear_rollups(cursor, table):
+    """Drop all rollup rows for ``table`` (used when the raw table is cleared)"""
+    for granularity in GRANULARITIES:
+        cursor.execute(f"DELETE FROM {rollup_table(table, granularity)}")
+
+
+def prune_before(cursor, table, cutoff):
+    """Drop rollup buckets of ``table`` older than ``cutoff`` (after retention)"""
+    for granularity in GRANULARITIES:
+        cursor.execute(f"DELETE FROM {rollup_table(table, granularity)} WHERE bucket < %s", [cutoff])
+
+
+def backfill(conn, tables=None):
+    """Rebuild rollups from the raw rows, one table per transaction"""
+    backend = get_backend()
+    c = conn.cursor()
+    for table in tables or ROLLUPS:
+        spec = ROLLUPS[table]
+        measure_names = list(spec['measures'])
+        for granularity in GRANULARITIES:
+            target = rollup_table(table, granularity)
+            dims = ', '.join(f"COALESCE({backend.left(name, 100)}, '')" for name in spec['dimensions'])
+            aggregates = ', '.join(spec['measures'][name][1] for name in measure_names)
+            group_by = ', '.join(str(i) for i in range(1, len(spec['dimensions']) + 2))
+            where = ''
+            if granularity == 'minute':
+                where = f"WHERE timestamp >= {backend.hours_ago(MINUTE_RETENTION_HOURS)}"
+            c.execute(f"DELETE FROM {target}")
+            # No parameters are passed, so the date format % signs go through untouched
+            c.execute(
+                f"INSERT INTO {target} (bucket, {', '.join(spec['dimensions'])}, {', '.join(measure_names)}) "
+                f"SELECT {backend.bucket('timestamp', granularity)}, {dims}, {aggregates} "
+                f"FROM {table} {where} GROUP BY {group_by}"
+            )
+        conn.commit()
+        logger.info(f"Rebuilt rollups for {table}")
+
+
+def prune_minutes(conn):
+    """Delete minute buckets past MINUTE_RETENTION_HOURS"""
+    c = conn.cursor()
+    for table in ROLLUPS:
+        c.execute(
+            f"DELETE FROM {rollup_table(table, 'minute')} "
+            f"WHERE bucket < {get_backend().hours_ago()}",
+            [MINUTE_RETENTION_HOURS]
+        )
+    conn.commit()
+
+
+def window_query(table, dimension, measure, now, hours):
+    """(query, params) summing ``measure`` per ``dimension`` over the ``hours`` before ``now``
+
+    Whole hours come from the hour table and the partial hours at both
+    ends from the minute table, so the result matches a raw
+    ``timestamp >= NOW() - INTERVAL hours HOUR`` count to the minute.
+    """
+    start = truncate(now - datetime.timedelta(hours=hours), 'minute')
+    if now - start > datetime.timedelta(hours=MINUTE_RETENTION_HOURS):
+        # Minute buckets that far back are pruned; start on the hour instead
+        start = truncate(start, 'hour')
+    first_full_hour = truncate(start, 'hour')
+    if first_full_hour < start:
+        first_full_hour += datetime.timedelta(hours=1)
+    current_hour = truncate(now, 'hour')
+
+    hour_table = rollup_table(table, 'hour')
+    minute_table = rollup_table(table, 'minute')
+    if first_full_hour < current_hour:
+        query = (
+            f"SELECT {dimension}, SUM({measure}) FROM ("
+            f" SELECT {dimension}, {measure} FROM {hour_table}"
+            f" WHERE bucket >= %s AND bucket < %s"
+            f" UNION ALL"
+            f" SELECT {dimension}, {measure} FROM {minute_table}"
+            f" WHERE (bucket >= %s AND bucket < %s) OR bucket >= %s"
+            f") AS buckets GROUP BY {dimension}"
+        )
+        return query, [first_full_hour, current_hour, start, first_full_hour, current_hour]
+    query = (
+        f"SELECT {dimension}, SUM({measure}) FROM {minute_table}"
+        f" WHERE bucket >= %s GROUP BY {dimension}"
+    )
+    return query, [start]
+
+
+def window_totals(conn, table, dimension, measure, hours):
+    """Sum ``measure`` per ``dimension`` over the last ``hours`` hours (see window_query)"""
+    c = conn.cursor()
+    c.execute(f"SELECT {get_backend().now()}")
+    now = parse_timestamp(c.fetchone()[0])
+    c.execute(*window_query(table, dimension, measure, now, hours))
+    return {row[0]: int(row[1]) for row in c.fetchall() if row[1]}
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'dashboard'),
+        'passwd': os.getenv('DB_PASSWORD', 'securepass'),
+        'db': os.getenv('DB_NAME', 'security_dashboard'),
+    }
+    command = sys.argv[1] if len(sys.argv) > 1 else 'backfill'
+    conn = get_backend().connect(**db_config)
+    try:
+        create_tables(conn.cursor())
+        if command == 'backfill':
+            backfill(conn, sys.argv[2:] or None)
+        elif command == 'prune':
+            prune_minutes(conn)
+        else:
+            print(f"Usage: {sys.argv[0]} [backfill [table ...] | prune]")
+            sys.exit(1)
+    finally:
+        conn.close()
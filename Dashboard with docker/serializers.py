@@ -0,0 +1,125 @@
+"""
+Row encoding for the list endpoints, SSE events and streaming exports
+
+Flask's ``jsonify`` asks a generic ``default()`` hook about every value it
+can't encode natively, which for a page of GPS rows means a type dispatch
+per DECIMAL and TIMESTAMP cell. Here the few columns that need it have a
+converter picked once per column, the values are converted in a tight loop,
+and the result is encoded by orjson when it is installed (the standard
+library's encoder otherwise, with the same output).
+
+DECIMAL columns are sent as JSON numbers and TIMESTAMP columns in the
+same HTTP date form ``jsonify`` used. Rows keep their SELECT column order.
+
+``?format=columnar`` sends one array per column instead of one object per
+row, so each key name appears once per response instead of once per row:
+
+    {"count": 2, "columns": {"id": ["...", "..."], "latitude": [31.5, 31.6], ...}}
+"""
+import json
+import datetime
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_timestamp(value):
+    """datetime -> 'Sat, 17 Oct 2026 07:47:40 GMT', as Flask's JSON provider writes it"""
+    if not isinstance(value, datetime.datetime):
+        return value
+    return (f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def number(value):
+    """DECIMAL -> float (None and values the driver already made numeric pass through)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+# Table -> column -> converter, for the columns whose driver values JSON can't take as-is
+CONVERTERS = {
+    'alerts': {
+        'timestamp': http_timestamp,
+    },
+    'gps_data': {
+        'latitude': number,
+        'longitude': number,
+        'hdop': number,
+        'timestamp': http_timestamp,
+    },
+    'network_attacks': {
+        'timestamp': http_timestamp,
+    },
+}
+
+
+def _fallback(value):
+    # Only reached for types no converter covers (e.g. a new column)
+    if isinstance(value, datetime.datetime):
+        return http_timestamp(value)
+    if isinstance(value, datetime.date):
+        # Flask's provider writes a date as midnight of that day
+        return http_timestamp(datetime.datetime.combine(value, datetime.time()))
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Compact JSON bytes"""
+    if orjson is not None:
+        # orjson would write datetimes as ISO 8601 itself; pass them to
+        # _fallback so both encoders use the HTTP date form
+        return orjson.dumps(value, default=_fallback, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=_fallback).encode()
+
+
+def convert_rows(table, rows):
+    """Convert the typed columns of dict ``rows`` in place and return them"""
+    converters = CONVERTERS.get(table, {})
+    if rows:
+        converters = [(name, convert) for name, convert in converters.items() if name in rows[0]]
+        for row in rows:
+            for name, convert in converters:
+                row[name] = convert(row[name])
+    return rows
+
+
+def encode_rows(table, rows):
+    """JSON array of row objects; converts ``rows`` in place"""
+    return dumps(convert_rows(table, list(rows)))
+
+
+def encode_row(table, row):
+    """One row object, leaving ``row`` itself untouched (it may be shared)"""
+    converters = CONVERTERS.get(table, {})
+    return dumps({name: converters[name](value) if name in converters else value
+                  for name, value in row.items()})
+
+
+def encode_lines(table, rows):
+    """One JSON document per row, for ndjson and chunked arrays; converts in place"""
+    return [dumps(row) for row in convert_rows(table, list(rows))]
+
+
+def encode_columnar(table, rows, columns):
+    """``{"count": n, "columns": {name: [values...]}}`` for ``columns`` of ``rows``"""
+    converters = CONVERTERS.get(table, {})
+    data = {}
+    for name in columns:
+        values = [row[name] for row in rows]
+        convert = converters.get(name)
+        if convert is not None:
+            values = [convert(value) for value in values]
+        data[name] = values
+    return dumps({'count': len(rows), 'columns': data})
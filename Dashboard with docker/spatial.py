@@ -0,0 +1,154 @@
+"""
+Geohash index for viewport (bbox) queries on gps_data
+
+Every reading stores the geohash of its position in ``gps_data.geohash``
+(PRECISION characters, cells of roughly 5 x 5 m), indexed together with
+the timestamp. A geohash is a Z-order curve over (longitude, latitude):
+all points inside a cell share its prefix, so "points in this cell" is a
+plain string range on an ordinary B-tree index. That works on both
+backends and on the time-partitioned MySQL tables, which can't carry a
+SPATIAL index.
+
+A bounding box is covered with at most MAX_CELLS cells of the finest
+precision that fits, adjacent cells are merged into ranges, and the exact
+box test on latitude/longitude drops the few points of the covering cells
+that lie outside it:
+
+    WHERE (geohash >= 'sv8' AND geohash < 'sv9') OR (...)
+      AND latitude BETWEEN ... AND longitude BETWEEN ...
+
+Given a LIMIT and ORDER BY timestamp, both planners would rather walk the
+time index newest first and filter, which reads the whole window when the
+box is small, so viewport queries carry an index hint (see use_index()).
+"""
+import os
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9
+INDEX = 'idx_gps_data_geohash_time'
+
+# More cells hug the box tighter but give the planner more ranges to merge
+MAX_CELLS = int(os.getenv('BBOX_MAX_CELLS', 16))
+# Boxes up to this many degrees across are read through the geohash index.
+# Wider ones hold most of the table, so the time index does better there.
+INDEX_MAX_DEGREES = float(os.getenv('BBOX_INDEX_MAX_DEGREES', 2.0))
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a position, ``precision`` characters long"""
+    latitude, longitude = float(latitude), float(longitude)
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    value = bits = 0
+    even = True  # bits alternate, starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value, lon_lo = value * 2 + 1, mid
+            else:
+                value, lon_hi = value * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = value * 2 + 1, mid
+            else:
+                value, lat_hi = value * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value = bits = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(width in degrees of longitude, height in degrees of latitude) of a cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 360.0 / (1 << lon_bits), 180.0 / (1 << lat_bits)
+
+
+def parse_bbox(value):
+    """'minLon,minLat,maxLon,maxLat' -> tuple of floats; ValueError if malformed"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except (ValueError, AttributeError):
+        raise ValueError('bbox must be minLon,minLat,maxLon,maxLat')
+    if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        raise ValueError('bbox must be minLon,minLat,maxLon,maxLat')
+    # Leaflet reports wrapped longitudes past +-180 when the map is panned around
+    min_lon, max_lon = max(min_lon, -180.0), min(max_lon, 180.0)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError('bbox minimums must not exceed its maximums')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def covering_cells(bbox, max_cells=MAX_CELLS):
+    """Sorted geohash prefixes whose cells together cover ``bbox``"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    for precision in range(PRECISION, 0, -1):
+        width, height = cell_size(precision)
+        columns, rows = int(round(360.0 / width)), int(round(180.0 / height))
+        # An edge on +180 or +90 would land one cell past the last
+        x0 = min(int((min_lon + 180.0) // width), columns - 1)
+        x1 = min(int((max_lon + 180.0) // width), columns - 1)
+        y0 = min(int((min_lat + 90.0) // height), rows - 1)
+        y1 = min(int((max_lat + 90.0) // height), rows - 1)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_cells or precision == 1:
+            # Encode each cell's centre, which can't fall on a boundary
+            return sorted({encode(-90.0 + (y + 0.5) * height, -180.0 + (x + 0.5) * width, precision)
+                           for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)})
+
+
+def next_cell(prefix):
+    """The cell right after ``prefix`` in geohash order (same length), None past the end"""
+    if not prefix:
+        return None
+    position = BASE32.index(prefix[-1])
+    if position + 1 < len(BASE32):
+        return prefix[:-1] + BASE32[position + 1]
+    head = next_cell(prefix[:-1])
+    return head + BASE32[0] if head is not None else None
+
+
+def prefix_ranges(prefixes):
+    """Merge sorted same-length prefixes into [low, high) string ranges (high may be None)"""
+    ranges = []
+    for prefix in prefixes:
+        if ranges and ranges[-1][1] == prefix:
+            ranges[-1][1] = next_cell(prefix)
+        else:
+            ranges.append([prefix, next_cell(prefix)])
+    return [tuple(r) for r in ranges]
+
+
+def use_index(bbox):
+    """Whether a query for ``bbox`` should be forced onto the geohash index"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return max(max_lon - min_lon, max_lat - min_lat) <= INDEX_MAX_DEGREES
+
+
+def bbox_conditions(bbox, column='geohash'):
+    """(conditions, params) restricting a gps_data query to ``bbox``
+
+    A box no cell covers matches nothing rather than producing invalid SQL.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    clauses, params = [], []
+    for low, high in prefix_ranges(covering_cells(bbox)):
+        if high is None:
+            clauses.append(f"{column} >= %s")
+            params.append(low)
+        else:
+            clauses.append(f"({column} >= %s AND {column} < %s)")
+            params.extend([low, high])
+    conditions = [
+        f"({' OR '.join(clauses) or '1 = 0'})",
+        "latitude BETWEEN %s AND %s",
+        "longitude BETWEEN %s AND %s",
+    ]
+    return conditions, params + [min_lat, max_lat, min_lon, max_lon]
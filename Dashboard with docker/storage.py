@@ -0,0 +1,597 @@
+"""
+Storage backends for alerts, gps_data and network_attacks
+
+MySQL is the default. Edge boxes (a Raspberry Pi running detector.py and
+gps_detector.py next to the dashboard) can set DB_BACKEND=sqlite to keep
+the same tables in one embedded SQLite file instead: WAL journal so web
+workers keep reading while a detector writes, cached prepared statements
+and one IMMEDIATE transaction per batch.
+
+Both backends hand out DB-API connections that take the MySQLdb ``%s``
+paramstyle and dictionary cursor classes, and supply the few SQL
+fragments that differ between the dialects (``hours_ago``, ``now``,
+``insert``, ``upsert_add``, ...), so the endpoints run the same queries on
+either one.
+"""
+import os
+import re
+import time
+import fcntl
+import sqlite3
+import datetime
+import threading
+from decimal import Decimal
+from contextlib import contextmanager
+from functools import lru_cache
+
+import ids
+
+# MySQL error codes that mean the connection itself is unusable
+CONNECTION_LOST_ERRORS = {
+    2006,  # MySQL server has gone away
+    2013,  # Lost connection to MySQL server during query
+    2055,  # Lost connection to MySQL server at '...'
+}
+
+BACKENDS = ('mysql', 'sqlite')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class StorageError(Exception):
+    """Raised for an unknown or misconfigured backend, or a lock that wasn't granted"""
+
+
+class MySQLBackend:
+    """MySQL through MySQLdb (mysqlclient, or PyMySQL installed as MySQLdb)"""
+
+    name = 'mysql'
+
+    def __init__(self):
+        import MySQLdb
+        import MySQLdb.cursors
+        self._mysqldb = MySQLdb
+        self.OperationalError = MySQLdb.OperationalError
+        self.dict_cursor = MySQLdb.cursors.DictCursor
+        self.stream_cursor = MySQLdb.cursors.SSDictCursor
+
+    def connect(self, **db_config):
+        return self._mysqldb.connect(**db_config)
+
+    def is_connection_lost(self, error):
+        return (isinstance(error, self._mysqldb.OperationalError)
+                and bool(error.args) and error.args[0] in CONNECTION_LOST_ERRORS)
+
+    # ------------------------------------------------------------------
+    # Dialect
+    # ------------------------------------------------------------------
+    def now(self):
+        return "NOW()"
+
+    def hours_ago(self, hours='%s'):
+        """Expression for the current time minus ``hours`` (a placeholder or literal)"""
+        return f"DATE_SUB(NOW(), INTERVAL {hours} HOUR)"
+
+    def left(self, expression, length):
+        return f"LEFT({expression}, {length})"
+
+    def index_hint(self, index):
+        """Table suffix making the planner use ``index``"""
+        return f" FORCE INDEX ({index})"
+
+    def bucket(self, column, granularity):
+        """``column`` truncated to the minute or hour, as 'YYYY-MM-DD HH:MM:SS'"""
+        fmt = '%Y-%m-%d %H:%i:00' if granularity == 'minute' else '%Y-%m-%d %H:00:00'
+        return f"DATE_FORMAT({column}, '{fmt}')"
+
+    def insert(self, table, columns, ignore=False):
+        """INSERT for ``columns``; bind the rows with ids.bind_rows()"""
+        verb = 'INSERT IGNORE' if ignore else 'INSERT'
+        return (f"{verb} INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+    def upsert_add(self, table, columns, key_columns, add_columns):
+        """INSERT that adds ``add_columns`` onto an existing row with the same key"""
+        updates = ', '.join(f"{name} = {name} + VALUES({name})" for name in add_columns)
+        return f"{self.insert(table, columns)} ON DUPLICATE KEY UPDATE {updates}"
+
+    def delete_before(self, table, limit):
+        """DELETE of at most ``limit`` rows with a timestamp before the parameter"""
+        return f"DELETE FROM {table} WHERE timestamp < %s LIMIT {int(limit)}"
+
+    def truncate(self, table):
+        # DDL: drops the data (and keeps the partitions) without per-row undo
+        # or binlog entries, but commits implicitly
+        return f"TRUNCATE TABLE {table}"
+
+    def create_schema(self, cursor):
+        """Create the raw tables and change counters if they don't exist
+
+        This is migration 1 in migrations.py, which later replaces the
+        single-column indexes with composite ones. The raw tables start with only the catch-all ``pmax`` partition;
+        retention.py splits daily or weekly partitions off it.
+        """
+        # Alerts table with improved schema
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id BINARY(16) NOT NULL,
+            tool_name VARCHAR(100) NOT NULL,
+            alert_type VARCHAR(100) NOT NULL,
+            severity ENUM('low', 'medium', 'high', 'critical') NOT NULL,
+            description TEXT,
+            raw_data TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            source_ip VARCHAR(45),
+            INDEX idx_timestamp (timestamp),
+            INDEX idx_severity (severity),
+            INDEX idx_tool_name (tool_name),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+        ''')
+
+        # GPS data table with enhanced schema
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gps_data (
+            id BINARY(16) NOT NULL,
+            latitude DECIMAL(10,8) NOT NULL,
+            longitude DECIMAL(11,8) NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            device_id VARCHAR(100),
+            satellites INT DEFAULT 0,
+            hdop DECIMAL(4,2) DEFAULT 99.99,
+            jamming_detected BOOLEAN DEFAULT FALSE,
+            INDEX idx_timestamp (timestamp),
+            INDEX idx_device_id (device_id),
+            INDEX idx_jamming (jamming_detected),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+        ''')
+
+        # Network attacks table with proper indexing
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS network_attacks (
+            id BINARY(16) NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            alert_type VARCHAR(100) NOT NULL,
+            attacker_bssid VARCHAR(17),
+            attacker_ssid VARCHAR(255),
+            destination_bssid VARCHAR(17),
+            destination_ssid VARCHAR(255),
+            attack_count INT DEFAULT 1,
+            source_ip VARCHAR(45),
+            INDEX idx_timestamp (timestamp),
+            INDEX idx_alert_type (alert_type),
+            INDEX idx_attacker_bssid (attacker_bssid),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+        ''')
+
+        # Change counters used for ETags on the read endpoints
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name VARCHAR(64) PRIMARY KEY,
+            version BIGINT UNSIGNED NOT NULL DEFAULT 0
+        )
+        ''')
+
+
+    # ------------------------------------------------------------------
+    # Introspection and DDL for migrations.py
+    # ------------------------------------------------------------------
+    def column_names(self, cursor, table):
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def column_type(self, cursor, table, column):
+        """Lower-case data type of ``table.column``, None if there is no such column"""
+        cursor.execute(
+            "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column)
+        )
+        row = cursor.fetchone()
+        return row[0].lower() if row else None
+
+    def index_names(self, cursor, table):
+        cursor.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def base_index_name(self, table, column):
+        """Name create_schema gave the single-column index on ``column``"""
+        return f"idx_{column}"
+
+    def alter_indexes(self, cursor, table, add, drop):
+        """Add ``add`` (name -> columns) and drop ``drop`` in one online ALTER
+
+        Indexes already in the wanted state are skipped, so an interrupted
+        run can simply be repeated.
+        """
+        existing = self.index_names(cursor, table)
+        changes = [f"ADD INDEX {name} ({', '.join(columns)})"
+                   for name, columns in add.items() if name not in existing]
+        changes += [f"DROP INDEX {name}" for name in drop if name in existing]
+        if changes:
+            # InnoDB builds secondary indexes in place; writes keep flowing
+            cursor.execute(f"ALTER TABLE {table} {', '.join(changes)}, ALGORITHM=INPLACE, LOCK=NONE")
+
+    @contextmanager
+    def migration_lock(self, conn, timeout):
+        """Server-wide named lock, so one process per database runs migrations"""
+        c = conn.cursor()
+        c.execute("SELECT GET_LOCK(CONCAT(DATABASE(), '.migrations'), %s)", (timeout,))
+        if c.fetchone()[0] != 1:
+            raise StorageError(f"Timed out after {timeout}s waiting for the migration lock")
+        try:
+            yield
+        finally:
+            c.execute("SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.migrations'))")
+            c.fetchall()
+
+    def plan_problems(self, conn, query, params):
+        """Full table scans and filesorts in the EXPLAIN of ``query``"""
+        c = conn.cursor(self.dict_cursor)
+        c.execute(f"EXPLAIN {query}", params)
+        problems = []
+        for row in c.fetchall():
+            table = row.get('table') or ''
+            # <derivedN>/<unionN> rows are the temporary results of a subquery
+            if row.get('type') == 'ALL' and not table.startswith('<'):
+                problems.append(f"full scan of {table}")
+            if 'Using filesort' in (row.get('Extra') or ''):
+                problems.append(f"filesort on {table}")
+        return problems
+
+    def plan_indexes(self, conn, query, params):
+        """Names of the indexes the EXPLAIN of ``query`` reads (PRIMARY for the primary key)"""
+        c = conn.cursor(self.dict_cursor)
+        c.execute(f"EXPLAIN {query}", params)
+        return {row['key'] for row in c.fetchall() if row.get('key')}
+
+
+# ----------------------------------------------------------------------
+# SQLite
+# ----------------------------------------------------------------------
+class DictCursor:
+    """Cursor class marker: rows come back as dicts (like MySQLdb's DictCursor)"""
+
+
+class SSDictCursor(DictCursor):
+    """Streaming dict cursor; SQLite cursors step lazily anyway"""
+
+
+def _convert_timestamp(value):
+    # Stored as 'YYYY-MM-DD HH:MM:SS' text; hand back datetimes like MySQLdb does
+    text = value.decode()
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _adapt_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+sqlite3.register_adapter(datetime.datetime, _adapt_datetime)
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+sqlite3.register_converter('DATETIME', _convert_timestamp)
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+
+
+@lru_cache(maxsize=512)
+def _placeholders(query):
+    """Translate the MySQLdb ``%s`` paramstyle to SQLite's ``?``
+
+    Cached so a statement always maps to the same text and hits sqlite3's
+    prepared statement cache.
+    """
+    return query.replace('%s', '?')
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        self._cursor.execute(_placeholders(query), tuple(args) if args is not None else ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        self._cursor.executemany(_placeholders(query), [tuple(row) for row in args])
+        return self._cursor.rowcount
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the MySQLdb surface the app relies on"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, cursorclass=None):
+        cursor = self._conn.cursor()
+        if cursorclass is not None and issubclass(cursorclass, DictCursor):
+            cursor.row_factory = _dict_row
+        return SQLiteCursor(cursor)
+
+    def ping(self):
+        self._conn.execute('SELECT 1')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLiteBackend:
+    """Embedded SQLite file in WAL mode, for single-box deployments"""
+
+    name = 'sqlite'
+    OperationalError = sqlite3.OperationalError
+    dict_cursor = DictCursor
+    stream_cursor = SSDictCursor
+
+    def __init__(self, path, busy_timeout=5.0, cached_statements=256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def connect(self, **db_config):
+        # Host and credentials in db_config only mean something to MySQL
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            # Writes take the lock up front, so a busy writer waits on
+            # busy_timeout instead of failing halfway through a batch
+            isolation_level='IMMEDIATE',
+            check_same_thread=False,  # pooled connections move between threads
+            cached_statements=self.cached_statements,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        # MySQL 8 built-ins the queries use for BINARY(16) ids
+        conn.create_function('UUID_TO_BIN', 1, ids.uuid_to_bin, deterministic=True)
+        conn.create_function('BIN_TO_UUID', 1, ids.bin_to_uuid, deterministic=True)
+        return SQLiteConnection(conn)
+
+    def is_connection_lost(self, error):
+        return False
+
+    # ------------------------------------------------------------------
+    # Dialect
+    # ------------------------------------------------------------------
+    def now(self):
+        return "datetime('now', 'localtime')"
+
+    def hours_ago(self, hours='%s'):
+        return f"datetime('now', 'localtime', '-' || {hours} || ' hours')"
+
+    def left(self, expression, length):
+        return f"substr({expression}, 1, {length})"
+
+    def index_hint(self, index):
+        return f" INDEXED BY {index}"
+
+    def bucket(self, column, granularity):
+        fmt = '%Y-%m-%d %H:%M:00' if granularity == 'minute' else '%Y-%m-%d %H:00:00'
+        return f"strftime('{fmt}', {column})"
+
+    def insert(self, table, columns, ignore=False):
+        verb = 'INSERT OR IGNORE' if ignore else 'INSERT'
+        return (f"{verb} INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+    def upsert_add(self, table, columns, key_columns, add_columns):
+        updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in add_columns)
+        return (f"{self.insert(table, columns)} "
+                f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}")
+
+    def delete_before(self, table, limit):
+        # SQLite is usually built without DELETE ... LIMIT
+        return (f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE timestamp < %s LIMIT {int(limit)})")
+
+    def truncate(self, table):
+        return f"DELETE FROM {table}"
+
+    def create_schema(self, cursor):
+        """Migration 1; see MySQLBackend.create_schema"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id BLOB PRIMARY KEY,
+            tool_name VARCHAR(100) NOT NULL,
+            alert_type VARCHAR(100) NOT NULL,
+            severity VARCHAR(8) NOT NULL CHECK (severity IN ('low', 'medium', 'high', 'critical')),
+            description TEXT,
+            raw_data TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            source_ip VARCHAR(45)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gps_data (
+            id BLOB PRIMARY KEY,
+            latitude DECIMAL(10,8) NOT NULL,
+            longitude DECIMAL(11,8) NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            device_id VARCHAR(100),
+            satellites INT DEFAULT 0,
+            hdop DECIMAL(4,2) DEFAULT 99.99,
+            jamming_detected BOOLEAN DEFAULT 0
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS network_attacks (
+            id BLOB PRIMARY KEY,
+            timestamp TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+            alert_type VARCHAR(100) NOT NULL,
+            attacker_bssid VARCHAR(17),
+            attacker_ssid VARCHAR(255),
+            destination_bssid VARCHAR(17),
+            destination_ssid VARCHAR(255),
+            attack_count INT DEFAULT 1,
+            source_ip VARCHAR(45)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name VARCHAR(64) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        ''')
+        indexes = {
+            'alerts': ('timestamp', 'severity', 'tool_name'),
+            'gps_data': ('timestamp', 'device_id', 'jamming_detected'),
+            'network_attacks': ('timestamp', 'alert_type', 'attacker_bssid'),
+        }
+        for table, columns in indexes.items():
+            for column in columns:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+            # MySQL normalizes timestamps on write and compares them as dates;
+            # SQLite compares text, so ISO 'T'/fractional values are rewritten
+            # to the 'YYYY-MM-DD HH:MM:SS' form every query compares against.
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_timestamp AFTER INSERT ON {table}
+            WHEN NEW.timestamp <> datetime(NEW.timestamp)
+            BEGIN
+                UPDATE {table} SET timestamp = datetime(NEW.timestamp) WHERE id = NEW.id;
+            END
+            ''')
+
+
+    # ------------------------------------------------------------------
+    # Introspection and DDL for migrations.py
+    # ------------------------------------------------------------------
+    def column_names(self, cursor, table):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1] for row in cursor.fetchall()}
+
+    def column_type(self, cursor, table, column):
+        cursor.execute(f"PRAGMA table_info({table})")
+        for row in cursor.fetchall():
+            if row[1] == column:
+                return row[2].lower()
+        return None
+
+    def index_names(self, cursor, table):
+        cursor.execute(f"PRAGMA index_list({table})")
+        return {row[1] for row in cursor.fetchall()}
+
+    def base_index_name(self, table, column):
+        return f"idx_{table}_{column}"
+
+    def alter_indexes(self, cursor, table, add, drop):
+        for name, columns in add.items():
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        for name in drop:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    @contextmanager
+    def migration_lock(self, conn, timeout):
+        """flock on a file next to the database, shared by every process using it"""
+        deadline = time.monotonic() + timeout
+        with open(f"{self.path}-migrate.lock", 'a') as lock:
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise StorageError(f"Timed out after {timeout}s waiting for the migration lock")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def plan_problems(self, conn, query, params):
+        """Table scans and ORDER BY sorts in the EXPLAIN QUERY PLAN of ``query``"""
+        c = conn.cursor()
+        c.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        problems = []
+        for row in c.fetchall():
+            detail = row[3]
+            words = detail.split()
+            # 'SCAN t USING [COVERING] INDEX i' walks an index in order; a
+            # bare 'SCAN t' reads the whole table ('SCAN (subquery-1)' and
+            # aliases of derived tables are temporary results, not tables)
+            if words[0] == 'SCAN' and 'USING' not in words and self._is_table(c, words[1]):
+                problems.append(f"full scan of {words[1]}")
+            if 'TEMP B-TREE' in detail and 'ORDER BY' in detail:
+                problems.append(f"sort for ORDER BY ({detail})")
+        return problems
+
+    def plan_indexes(self, conn, query, params):
+        """Names of the indexes the EXPLAIN QUERY PLAN of ``query`` reads (PRIMARY for the primary key)"""
+        c = conn.cursor()
+        c.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        indexes = set()
+        for row in c.fetchall():
+            match = re.search(r'USING (?:COVERING )?INDEX (\S+)', row[3])
+            if match:
+                # The tables here declare no UNIQUE constraints, so an
+                # automatic index is always the one behind PRIMARY KEY
+                name = match.group(1)
+                indexes.add('PRIMARY' if name.startswith('sqlite_autoindex_') else name)
+            elif re.search(r'USING (?:INTEGER )?PRIMARY KEY', row[3]):
+                indexes.add('PRIMARY')
+        return indexes
+
+    def _is_table(self, cursor, name):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", (name,))
+        return cursor.fetchone() is not None
+
+
+def create_backend(name=None):
+    """Build the backend named by ``name`` or DB_BACKEND (mysql|sqlite)"""
+    name = (name or os.getenv('DB_BACKEND', 'mysql')).strip().lower()
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(
+            os.getenv('SQLITE_PATH', 'data/security_dashboard.sqlite3'),
+            busy_timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', 5)),
+            cached_statements=int(os.getenv('SQLITE_STATEMENT_CACHE', 256)),
+        )
+    raise StorageError(f"Unknown DB_BACKEND {name!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def get_backend():
+    """The process-wide backend, created from the environment on first use
+
+    Created lazily so scripts can load their .env before it is read.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
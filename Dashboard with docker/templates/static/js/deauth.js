@@ -12,8 +12,13 @@ document.addEventListener('DOMContentLoaded', function() {
     initDeauthCharts();
     loadDeauthData();
     
-    // Check for new data more frequently (every 2 seconds)
-    setInterval(loadDeauthData, 2000);
+    // Reload when the server pushes a new deauth record; fall back to
+    // polling every 2 seconds if the browser has no EventSource support
+    if (window.EventSource) {
+        subscribeToDeauthStream();
+    } else {
+        setInterval(loadDeauthData, 2000);
+    }
     
     // Add event listener for search input
     document.getElementById('deauth-search').addEventListener('input', function() {
@@ -170,6 +175,31 @@ function initDeauthCharts() {
     console.log("Charts initialized successfully");
 }
 
+function subscribeToDeauthStream() {
+    const source = new EventSource('/api/stream?topics=deauth');
+    let reloadPending = false;
+    
+    source.addEventListener('deauth', () => {
+        // Coalesce bursts of events into a single reload
+        if (reloadPending) return;
+        reloadPending = true;
+        setTimeout(() => {
+            reloadPending = false;
+            loadDeauthData();
+        }, 250);
+    });
+    
+    // The browser reconnects on its own and resumes from the last event id.
+    // A closed stream means the server doesn't offer SSE, so poll instead.
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setInterval(loadDeauthData, 2000);
+        } else {
+            console.warn('Deauth stream interrupted, reconnecting...');
+        }
+    };
+}
+
 function loadDeauthData() {
     // Fetch data from API endpoint
     fetch('/api/deauth_logs')
@@ -5,12 +5,38 @@ let accuracyChart;
 let anomalies = 0;
 let baseLat = 31.833360;
 let baseLng = 35.890387;
+let latestGpsCursor = null; // Newest row the server has sent us (for delta polling)
+let gpsIds = new Set(); // Ids in gpsData; delta responses repeat recent rows
+let clusterLayer; // Server-side clusters for the current view
+let clusterRefreshPending = false;
 
 document.addEventListener('DOMContentLoaded', function() {
     initMap();
     initAccuracyChart();
     loadGpsData();
-    setInterval(fetchNewGpsData, 10000); // Fetch new data every 10s
+    loadClusters();
+    
+    // New readings are pushed over SSE; poll every 10s only as a fallback
+    if (window.EventSource) {
+        const source = new EventSource('/api/stream?topics=gps');
+        let fetchPending = false;
+        source.addEventListener('gps', () => {
+            if (fetchPending) return;
+            fetchPending = true;
+            setTimeout(() => {
+                fetchPending = false;
+                fetchNewGpsData();
+            }, 250);
+        });
+        // A closed (not reconnecting) stream means the server doesn't offer SSE
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                setInterval(fetchNewGpsData, 10000);
+            }
+        };
+    } else {
+        setInterval(fetchNewGpsData, 10000); // Fetch new data every 10s
+    }
     
     // Setup search functionality
     document.getElementById('gps-search').addEventListener('input', function() {
@@ -23,6 +49,61 @@ function initMap() {
     L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
         attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
     }).addTo(map);
+    
+    // The map draws clusters from the server, not one marker per reading
+    clusterLayer = L.layerGroup().addTo(map);
+    map.on('moveend', loadClusters);
+}
+
+function loadClusters() {
+    const bounds = map.getBounds();
+    const bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+        .map(value => value.toFixed(6)).join(',');
+    const zoom = map.getZoom();
+    
+    fetch(`/api/gps/clusters?hours=24&zoom=${zoom}&bbox=${bbox}`)
+        .then(response => response.json())
+        .then(data => {
+            clusterLayer.clearLayers();
+            (data.clusters || []).forEach(cluster => addCluster(cluster, zoom));
+        })
+        .catch(error => {
+            console.error('Error fetching GPS clusters:', error);
+        });
+}
+
+function scheduleClusterRefresh() {
+    // New readings arrive in bursts; redraw the clusters at most once a second
+    if (clusterRefreshPending) return;
+    clusterRefreshPending = true;
+    setTimeout(() => {
+        clusterRefreshPending = false;
+        loadClusters();
+    }, 1000);
+}
+
+function addCluster(cluster, zoom) {
+    const anomaly = cluster.jamming > 0;
+    const marker = L.circleMarker([cluster.latitude, cluster.longitude], {
+        radius: Math.min(6 + 3 * Math.log10(cluster.count), 24) + (anomaly ? 3 : 0),
+        color: anomaly ? '#e74c3c' : '#2ecc71',
+        fillOpacity: anomaly ? 0.4 + 0.5 * cluster.jamming_ratio : 0.6,
+        weight: 1
+    }).addTo(clusterLayer);
+    
+    marker.bindTooltip(cluster.count > 1 ? String(cluster.count) : '', {
+        permanent: cluster.count > 1,
+        direction: 'center',
+        className: 'gps-cluster-label'
+    });
+    marker.bindPopup(`
+        <b>${cluster.count} reading${cluster.count === 1 ? '' : 's'}</b><br>
+        Center: ${cluster.latitude.toFixed(6)}, ${cluster.longitude.toFixed(6)}<br>
+        Jamming: ${cluster.jamming} (${(cluster.jamming_ratio * 100).toFixed(1)}%)
+    `);
+    if (cluster.count > 1) {
+        marker.on('dblclick', () => map.setView([cluster.latitude, cluster.longitude], zoom + 2));
+    }
 }
 
 function initAccuracyChart() {
@@ -62,12 +143,16 @@ function initAccuracyChart() {
 }
 
 function loadGpsData() {
-    // Fetch real GPS data from the API
-    fetch('/api/gps?hours=24')
-        .then(response => response.json())
+    // Fetch real GPS data from the API, thinned server-side to what the map can draw
+    fetch('/api/gps?hours=24&max_points=5000')
+        .then(response => {
+            latestGpsCursor = response.headers.get('X-Latest-Cursor') || latestGpsCursor;
+            return response.json();
+        })
         .then(data => {
             // Clear existing data
             gpsData = [];
+            gpsIds = new Set();
             anomalies = 0;
             
             // Process each GPS reading
@@ -96,16 +181,20 @@ function loadGpsData() {
 }
 
 function fetchNewGpsData() {
-    // Get the timestamp of our most recent data point
-    let lastTimestamp = gpsData.length > 0 ? gpsData[0].timestamp.toISOString() : '';
-    
-    fetch(`/api/gps?hours=1`)
-        .then(response => response.json())
+    // Only ask for rows newer than the last one we received
+    const url = latestGpsCursor
+        ? `/api/gps?hours=1&after=${encodeURIComponent(latestGpsCursor)}`
+        : `/api/gps?hours=1`;
+    
+    fetch(url)
+        .then(response => {
+            latestGpsCursor = response.headers.get('X-Latest-Cursor') || latestGpsCursor;
+            return response.json();
+        })
         .then(data => {
-            // Filter for only new data points
-            const newData = data.filter(reading => {
-                return !gpsData.some(existing => existing.id === reading.id);
-            });
+            // Filter for only new data points (rows committed late are
+            // repeated for a while, so some of these are already shown)
+            const newData = data.filter(reading => !gpsIds.has(reading.id));
             
             // Process and add each new GPS reading
             newData.forEach(reading => {
@@ -125,6 +214,7 @@ function fetchNewGpsData() {
             
             if (newData.length > 0) {
                 updateGpsStats();
+                scheduleClusterRefresh();
             }
         })
         .catch(error => {
@@ -134,24 +224,10 @@ function fetchNewGpsData() {
 
 function addGpsData(reading) {
     gpsData.unshift(reading);
+    gpsIds.add(reading.id);
     if (reading.anomaly) anomalies++;
     
-    // Update map
-    const marker = L.circleMarker([reading.latitude, reading.longitude], {
-        radius: 5 + (reading.anomaly ? 3 : 0),
-        color: reading.anomaly ? '#e74c3c' : '#2ecc71',
-        fillOpacity: 0.8,
-        weight: reading.flagged ? 3 : 1
-    }).addTo(map);
-    
-    marker.bindPopup(`
-        <b>${reading.timestamp.toLocaleTimeString()}</b><br>
-        Coordinates: ${reading.latitude.toFixed(6)}, ${reading.longitude.toFixed(6)}<br>
-        Accuracy: ${reading.accuracy.toFixed(1)}m<br>
-        Status: ${reading.anomaly ? '<span style="color:#e74c3c">Anomaly</span>' : 'Normal'}
-    `);
-    
-    // Update table
+    // The map shows server-side clusters (loadClusters); update table
     updateGpsTable();
     
     // Update chart
@@ -243,14 +319,11 @@ function clearGpsData() {
         if (data.success) {
             // Clear local data
             gpsData = [];
+            gpsIds = new Set();
             anomalies = 0;
             
             // Clear map markers
-            map.eachLayer(layer => {
-                if (layer instanceof L.CircleMarker) {
-                    map.removeLayer(layer);
-                }
-            });
+            clusterLayer.clearLayers();
             
             // Update UI
             document.querySelector('#gps-table tbody').innerHTML = '';
@@ -0,0 +1,77 @@
+"""
+Shared fixtures: each test gets its own migrated SQLite database
+
+flaskkk.py reads its settings from the environment when it is imported,
+so they are set here, before any test module imports it. Run from the
+project directory with ``python -m pytest tests``.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH = tempfile.mkdtemp(prefix='dashboard-tests-')
+os.environ.update({
+    'DB_BACKEND': 'sqlite',
+    'SQLITE_PATH': os.path.join(SCRATCH, 'import.sqlite3'),
+    'LOG_FILE': '',
+    'LOG_LEVEL': 'critical',
+    'RESPONSE_CACHE_TTL': '0',
+    'RESPONSE_CACHE_DIR': os.path.join(SCRATCH, 'cache'),
+    'METRICS_DIR': os.path.join(SCRATCH, 'metrics'),
+    'RATE_LIMIT_STATE_FILE': os.path.join(SCRATCH, 'ratelimit'),
+    'RATE_LIMIT_PER_MINUTE': '1000000',
+    'RETENTION_STATE_FILE': os.path.join(SCRATCH, 'retention'),
+    'WRITE_BEHIND_SPILL_DIR': os.path.join(SCRATCH, 'spill'),
+})
+
+import storage  # noqa: E402
+import migrations  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """A fresh SQLite database with every migration applied"""
+    backend = storage.SQLiteBackend(str(tmp_path / 'dashboard.sqlite3'))
+    monkeypatch.setattr(storage, '_backend', backend)
+    conn = backend.connect()
+    try:
+        migrations.migrate(conn)
+    finally:
+        conn.close()
+    return backend
+
+
+@pytest.fixture
+def pool(backend):
+    pool = ConnectionPool({}, max_size=4, timeout=5, backend=backend)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def conn(backend):
+    conn = backend.connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def app(pool, monkeypatch):
+    """The Flask app module, reading and writing the test database"""
+    import flaskkk
+    monkeypatch.setattr(flaskkk, 'db_pool', pool)
+    monkeypatch.setattr(flaskkk.ingest_buffer, 'pool', pool)
+    monkeypatch.setattr(flaskkk.change_feed, 'pool', pool)
+    monkeypatch.setattr(flaskkk, 'page_cache', {})
+    return flaskkk
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
@@ -0,0 +1,53 @@
+import json
+
+ALERT = {'tool_name': 'suricata', 'alert_type': 'scan', 'severity': 'high'}
+
+
+def stored(conn):
+    c = conn.cursor()
+    c.execute("SELECT BIN_TO_UUID(id), tool_name, severity FROM alerts")
+    return {row[0]: row[1:] for row in c.fetchall()}
+
+
+def test_invalid_items_are_rejected_and_the_rest_stored(client, conn):
+    items = [ALERT, {**ALERT, 'severity': 'bogus'}, {'tool_name': 'x'}, {**ALERT, 'tool_name': 'zeek'}]
+    response = client.post('/api/alerts/batch', json=items)
+    assert response.status_code == 201
+    assert response.json['received'] == 2
+    assert response.json['rejected'] == 2
+    results = response.json['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert results[1]['error'] == 'Invalid severity level'
+    assert 'error' in results[2]
+    assert stored(conn) == {results[0]['id']: ('suricata', 'high'), results[3]['id']: ('zeek', 'high')}
+
+
+def test_ndjson_lines_fail_independently(client, conn):
+    body = '\n'.join([json.dumps(ALERT), '{not json', '', json.dumps({**ALERT, 'severity': 'low'})])
+    response = client.post('/api/alerts/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert [result.get('error') for result in response.json['results']] == [None, 'Invalid JSON', None]
+    assert len(stored(conn)) == 2
+
+
+def test_batch_with_no_valid_items_stores_nothing(client, conn):
+    response = client.post('/api/alerts/batch', json=[{'severity': 'high'}, {**ALERT, 'severity': 'nope'}])
+    assert response.status_code == 400
+    assert response.json['received'] == 0
+    assert stored(conn) == {}
+
+
+def test_batch_size_and_body_are_checked(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_BATCH_SIZE', 2)
+    assert client.post('/api/alerts/batch', json=[ALERT] * 3).status_code == 413
+    assert client.post('/api/alerts/batch', json=[]).status_code == 400
+    assert client.post('/api/alerts/batch', data='{"a": 1}', content_type='application/json').status_code == 400
+
+
+def test_failed_insert_stores_no_part_of_the_batch(app, client, conn, monkeypatch):
+    def failing(c, table, columns, rows):
+        raise RuntimeError('rollup write failed')
+    monkeypatch.setattr(app, 'after_insert', failing)
+    response = client.post('/api/alerts/batch', json=[ALERT, ALERT])
+    assert response.status_code == 500
+    assert stored(conn) == {}
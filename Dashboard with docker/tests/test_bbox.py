@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+import spatial
+from ids import new_id
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+INSIDE = (31.80, 35.90)
+OUTSIDE = (31.95, 35.99)
+
+
+def reading(latitude, longitude, minutes_ago=1):
+    timestamp = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(minutes=minutes_ago)
+    return (new_id(), latitude, longitude, timestamp, 'esp32-1', spatial.encode(latitude, longitude))
+
+
+def test_encode_matches_known_geohash():
+    assert spatial.encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+
+@pytest.mark.parametrize('bbox', [(34.9, 31.0, 35.3, 31.3), (-0.5, -0.5, 0.5, 0.5), (179.0, 89.0, 180.0, 90.0)])
+def test_covering_cells_cover_the_box(bbox):
+    cells = spatial.covering_cells(bbox)
+    assert 0 < len(cells) <= spatial.MAX_CELLS
+    min_lon, min_lat, max_lon, max_lat = bbox
+    for latitude in (min_lat, (min_lat + max_lat) / 2, max_lat):
+        for longitude in (min_lon, (min_lon + max_lon) / 2, max_lon):
+            geohash = spatial.encode(latitude, longitude)
+            assert any(geohash.startswith(cell) for cell in cells)
+
+
+@pytest.mark.parametrize('bbox', [(180.0, 0.0, 180.0, 1.0), (0.0, 90.0, 1.0, 90.0), (180.0, 90.0, 180.0, 90.0)])
+def test_box_on_the_antimeridian_or_pole_is_covered(bbox):
+    assert spatial.covering_cells(bbox)
+    conditions, _ = spatial.bbox_conditions(bbox)
+    assert '()' not in conditions[0]
+
+
+def test_prefix_ranges_merge_neighbours():
+    assert spatial.prefix_ranges(['sv8', 'sv9', 'svb', 'svd']) == [('sv8', 'svc'), ('svd', 'sve')]
+    assert spatial.prefix_ranges(['zz']) == [('zz', None)]
+
+
+@pytest.mark.parametrize('value', ['1,2,3', 'a,b,c,d', '10,0,5,1', 'nan,0,1,1'])
+def test_malformed_bbox_is_rejected(client, value):
+    assert client.get(f'/api/gps?bbox={value}').status_code == 400
+
+
+def test_bbox_returns_only_readings_inside(app, client):
+    inside, outside = reading(*INSIDE), reading(*OUTSIDE)
+    app.insert_rows('gps_data', COLUMNS, [inside, outside])
+    response = client.get('/api/gps?hours=1&bbox=35.85,31.75,35.95,31.85')
+    assert response.status_code == 200
+    assert [row['id'] for row in response.json] == [inside[0]]
+
+
+@pytest.mark.parametrize('bbox', ['180,0,180,1', '0,90,1,90'])
+def test_edge_bboxes_answer_empty(app, client, bbox):
+    app.insert_rows('gps_data', COLUMNS, [reading(*INSIDE)])
+    response = client.get(f'/api/gps?hours=1&bbox={bbox}')
+    assert response.status_code == 200
+    assert response.json == []
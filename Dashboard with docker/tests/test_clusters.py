@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+import clusters
+import spatial
+from ids import new_id
+from ingest_hooks import after_clear
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'jamming_detected', 'geohash')
+POINTS = [(31.80, 35.90), (31.81, 35.91), (31.95, 35.93), (32.40, 34.80), (-33.86, 151.21)]
+
+
+def readings(start, count):
+    rows = []
+    for i in range(count):
+        latitude, longitude = POINTS[i % len(POINTS)]
+        rows.append((new_id(), latitude, longitude, start + datetime.timedelta(minutes=7 * i),
+                     f"esp32-{i % 3}", i % 4 == 0, spatial.encode(latitude, longitude)))
+    return rows
+
+
+def grid(conn):
+    c = conn.cursor()
+    c.execute(f"SELECT level, cell, bucket, readings, jamming FROM {clusters.TABLE}")
+    return {(level, cell, str(bucket)): (readings, jamming) for level, cell, bucket, readings, jamming in c.fetchall()}
+
+
+def grouped(conn):
+    """The grid recomputed with a GROUP BY over gps_data"""
+    c = conn.cursor()
+    expected = {}
+    for level in clusters.LEVELS:
+        c.execute(
+            f"SELECT substr(geohash, 1, {level}), strftime('%Y-%m-%d %H:00:00', timestamp), "
+            f"COUNT(*), SUM(jamming_detected <> 0) FROM gps_data GROUP BY 1, 2"
+        )
+        for cell, bucket, readings, jamming in c.fetchall():
+            expected[(level, cell, bucket)] = (readings, jamming)
+    return expected
+
+
+def test_grid_matches_group_by(app, conn):
+    start = datetime.datetime(2024, 5, 1, 9, 50)
+    app.insert_rows('gps_data', COLUMNS, readings(start, 12))
+    app.insert_rows('gps_data', COLUMNS, readings(start + datetime.timedelta(hours=3), 7))
+    expected = grouped(conn)
+    assert len(expected) > len(clusters.LEVELS)
+    assert grid(conn) == expected
+
+
+def test_rebuild_matches_incremental_grid(app, conn):
+    app.insert_rows('gps_data', COLUMNS, readings(datetime.datetime(2024, 5, 1, 23, 30), 15))
+    incremental = grid(conn)
+    clusters.rebuild(conn.cursor())
+    assert grid(conn) == incremental
+
+
+def test_clear_empties_grid(app, conn):
+    app.insert_rows('gps_data', COLUMNS, readings(datetime.datetime(2024, 5, 1, 8), 5))
+    c = conn.cursor()
+    c.execute("DELETE FROM gps_data")
+    after_clear(c, 'gps_data')
+    conn.commit()
+    assert grid(conn) == {}
+
+
+@pytest.mark.parametrize('bbox', ['180,0,180,1', '0,90,1,90'])
+def test_edge_bbox_has_no_clusters(app, client, bbox):
+    app.insert_rows('gps_data', COLUMNS, readings(datetime.datetime.now() - datetime.timedelta(minutes=30), 1))
+    response = client.get(f'/api/gps/clusters?zoom=3&bbox={bbox}')
+    assert response.status_code == 200
+    assert response.json['clusters'] == []
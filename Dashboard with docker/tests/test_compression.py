@@ -0,0 +1,121 @@
+import gzip
+import datetime
+
+import flask
+from werkzeug.datastructures import Accept
+
+import assets
+import spatial
+import compression
+from ids import new_id
+from compression import ResponseCompressor, choose_encoding
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+
+
+def readings(count):
+    now = datetime.datetime.now().replace(microsecond=0)
+    return [(new_id(), 31.8, 35.9, now - datetime.timedelta(seconds=i), 'esp32-1', spatial.encode(31.8, 35.9))
+            for i in range(count)]
+
+
+def test_choose_encoding_follows_client_and_server_preference():
+    assert choose_encoding(Accept([('gzip', 1), ('br', 1)]), ('br', 'gzip')) == 'br'
+    assert choose_encoding(Accept([('gzip', 1), ('br', 0)]), ('br', 'gzip')) == 'gzip'
+    assert choose_encoding(Accept([('identity', 1)]), ('br', 'gzip')) is None
+    assert choose_encoding(Accept([('*', 1)]), ('gzip',)) == 'gzip'
+
+
+def test_json_list_is_gzipped_when_accepted(app, client):
+    app.insert_rows('gps_data', COLUMNS, readings(50))
+    plain = client.get('/api/gps?hours=1')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    encoded = client.get('/api/gps?hours=1', headers={'Accept-Encoding': 'gzip'})
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(encoded.data) == plain.data
+    assert encoded.headers['ETag'].startswith('W/')
+    # The weak ETag still revalidates
+    assert client.get('/api/gps?hours=1', headers={'Accept-Encoding': 'gzip',
+                                                   'If-None-Match': encoded.headers['ETag']}).status_code == 304
+
+
+def test_small_and_streamed_responses_are_left_alone(app, client):
+    assert 'Content-Encoding' not in client.get('/api/ping', headers={'Accept-Encoding': 'gzip'}).headers
+    app.insert_rows('gps_data', COLUMNS, readings(50))
+    streamed = client.get('/api/gps?hours=1&format=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in streamed.headers
+    streamed.close()
+
+
+def test_repeated_bodies_are_compressed_once(monkeypatch):
+    calls = []
+    original = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda data, encoding: calls.append(1) or original(data, encoding))
+    compressor = ResponseCompressor(min_size=10, cache_entries=1)
+    body = b'{"rows": [' + b'1, ' * 500 + b'1]}'
+    app = flask.Flask(__name__)
+    for other in (body, body, body + b' ', body):
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = compressor.process(flask.request, flask.Response(other, mimetype='application/json'))
+            assert gzip.decompress(response.get_data()) == other
+    # The cache holds one entry, so the last body was evicted by the third
+    assert len(calls) == 3
+
+
+def static_tree(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'styles.css').write_text('body { color: red; }\n' * 100)
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'app.js').write_text('console.log(1);\n')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG')
+    return tmp_path
+
+
+def test_build_writes_hashed_precompressed_copies(tmp_path):
+    static = static_tree(tmp_path)
+    manifest = assets.build(str(static))
+    assert sorted(manifest) == ['css/styles.css', 'js/app.js']
+    hashed = manifest['css/styles.css']
+    assert hashed == f"dist/css/styles.{assets.fingerprint(str(static / 'css' / 'styles.css'))}.css"
+    assert (static / hashed).read_bytes() == (static / 'css' / 'styles.css').read_bytes()
+    assert gzip.decompress((static / (hashed + '.gz')).read_bytes()) == (static / hashed).read_bytes()
+    assert assets.load_manifest(str(static)) == manifest
+
+    # A changed file gets a new name and the old copy is removed
+    (static / 'css' / 'styles.css').write_text('body { color: blue; }\n')
+    rebuilt = assets.build(str(static))
+    assert rebuilt['css/styles.css'] != hashed
+    assert not (static / hashed).exists()
+
+
+def test_missing_manifest_is_empty(tmp_path):
+    assert assets.load_manifest(str(tmp_path)) == {}
+
+
+def test_hashed_asset_is_served_precompressed_and_immutable(app, client, tmp_path, monkeypatch):
+    static = static_tree(tmp_path)
+    manifest = assets.build(str(static))
+    monkeypatch.setattr(app.app, 'static_folder', str(static))
+    monkeypatch.setattr(app, 'asset_manifest', manifest)
+    url = '/static/' + manifest['css/styles.css']
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == (static / 'css' / 'styles.css').read_bytes()
+    response.close()
+
+    identity = client.get(url)
+    assert 'Content-Encoding' not in identity.headers
+    identity.close()
+    assert client.get('/static/dist/css/missing.css').status_code == 404
+    assert client.get('/static/dist/../../flaskkk.py').status_code == 404
+
+    with app.app.test_request_context():
+        assert flask.url_for('static', filename='css/styles.css') == url
+        assert flask.url_for('static', filename='logo.png') == '/static/logo.png'
@@ -0,0 +1,89 @@
+import math
+import random
+import datetime
+
+import pytest
+
+import decimation
+import spatial
+from ids import new_id
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'jamming_detected', 'geohash')
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def implementation(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(decimation, 'np', None)
+    elif decimation.np is None:
+        pytest.skip('numpy is not installed')
+    return request.param
+
+
+def walk(n, seed=3):
+    rng = random.Random(seed)
+    x, y = [35.9], [31.8]
+    for _ in range(n - 1):
+        x.append(x[-1] + rng.uniform(-1e-4, 1e-4))
+        y.append(y[-1] + rng.uniform(-1e-4, 1e-4))
+    return x, y
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 50), (101, 3), (10, 9)])
+def test_lttb_keeps_endpoints_and_budget(implementation, n, threshold):
+    x, y = walk(n)
+    kept = decimation.lttb(x, y, threshold)
+    assert len(kept) == threshold
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert kept == sorted(set(kept))
+
+
+def test_lttb_implementations_agree(monkeypatch):
+    if decimation.np is None:
+        pytest.skip('numpy is not installed')
+    x, y = walk(5000)
+    vectorized = decimation.lttb(x, y, 200)
+    monkeypatch.setattr(decimation, 'np', None)
+    assert decimation.lttb(x, y, 200) == vectorized
+
+
+def test_lttb_keeps_a_spike():
+    x = [i * 1e-4 for i in range(500)]
+    y = [31.8] * 500
+    y[250] += 0.01
+    assert 250 in decimation.lttb(x, y, 20)
+
+
+def test_decimate_track_adds_jamming_readings(implementation):
+    x, y = walk(1000)
+    keep = [i in (17, 512, 998) for i in range(1000)]
+    kept = decimation.decimate_track(x, y, keep, 20)
+    assert {0, 17, 512, 998, 999} <= set(kept)
+
+
+def test_douglas_peucker_keeps_endpoints_and_corner(implementation):
+    longitudes = [35.9 + i * 1e-4 for i in range(100)] + [35.9 + 99e-4] * 100
+    latitudes = [31.8] * 100 + [31.8 + i * 1e-4 for i in range(100)]
+    kept = decimation.simplify_track(longitudes, latitudes, [False] * 200, 1.0)
+    assert kept[0] == 0 and kept[-1] == 199
+    assert 99 in kept or 100 in kept
+    assert len(kept) <= 4
+
+
+def test_max_points_keeps_each_devices_first_and_last_reading(app, client):
+    start = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(minutes=50)
+    rows = []
+    for device in ('esp32-1', 'esp32-2'):
+        for i in range(300):
+            latitude = 31.8 + i * 1e-4
+            longitude = 35.9 + 0.001 * math.sin(i / 10)
+            rows.append((new_id(), latitude, longitude, start + datetime.timedelta(seconds=i * 5), device,
+                         False, spatial.encode(latitude, longitude)))
+    app.insert_rows('gps_data', COLUMNS, rows)
+
+    readings = client.get('/api/gps?hours=1&max_points=40').json
+    assert len(readings) <= 50
+    ids = {reading['id'] for reading in readings}
+    for device in ('esp32-1', 'esp32-2'):
+        track = [row for row in rows if row[4] == device]
+        assert track[0][0] in ids and track[-1][0] in ids
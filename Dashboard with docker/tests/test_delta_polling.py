@@ -0,0 +1,65 @@
+import datetime
+
+import spatial
+from ids import new_id
+from pagination import DELTA_OVERLAP
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+
+
+def reading(seconds_ago, device='esp32-1'):
+    timestamp = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(seconds=seconds_ago)
+    return (new_id(), 31.8, 35.9, timestamp, device, spatial.encode(31.8, 35.9))
+
+
+def poll(client, cursor=None, **args):
+    query = '&'.join(f"{key}={value}" for key, value in args.items())
+    url = f"/api/gps?hours=1&{query}" + (f"&after={cursor}" if cursor else '')
+    response = client.get(url)
+    assert response.status_code == 200
+    return [row['id'] for row in response.json], response.headers
+
+
+def test_row_committed_behind_the_cursor_is_delivered(app, client):
+    first = [reading(20), reading(10), reading(2)]
+    app.insert_rows('gps_data', COLUMNS, first)
+    ids, headers = poll(client)
+    assert ids == [row[0] for row in reversed(first)]
+    cursor = headers['X-Latest-Cursor']
+
+    # A batch that was taken before the newest row the client has seen
+    late, new = reading(5), reading(0)
+    app.insert_rows('gps_data', COLUMNS, [late, new])
+    ids, headers = poll(client, cursor)
+    assert ids[0] == new[0]
+    assert late[0] in ids
+    # Rows the client already has may repeat; it deduplicates them by id
+    assert set(ids) - {late[0], new[0]} <= {row[0] for row in first}
+    assert headers['X-Latest-Cursor'] != cursor
+
+
+def test_overlap_is_bounded(app, client):
+    app.insert_rows('gps_data', COLUMNS, [reading(DELTA_OVERLAP + 60)])
+    newest = reading(0)
+    app.insert_rows('gps_data', COLUMNS, [newest])
+    _, headers = poll(client)
+    ids, _ = poll(client, headers['X-Latest-Cursor'])
+    assert ids == [newest[0]]
+
+
+def test_burst_is_paged_without_gaps(app, client):
+    rows = [reading(100 - i) for i in range(25)]
+    app.insert_rows('gps_data', COLUMNS, rows[:1])
+    _, headers = poll(client)
+    cursor = headers['X-Latest-Cursor']
+    app.insert_rows('gps_data', COLUMNS, rows[1:])
+
+    seen = set()
+    for _ in range(10):
+        ids, headers = poll(client, cursor, limit=10)
+        seen.update(ids)
+        cursor = headers['X-Latest-Cursor']
+        if headers['X-Has-More'] == 'false':
+            break
+    assert seen >= {row[0] for row in rows[1:]}
+    assert headers['X-Has-More'] == 'false'
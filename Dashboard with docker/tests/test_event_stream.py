@@ -0,0 +1,101 @@
+import datetime
+import threading
+
+import spatial
+from ids import new_id, bind_rows
+from ingest_hooks import after_insert
+from pagination import encode_cursor
+from event_stream import ChangeFeed, Position, Subscriber, encode_event_id, decode_event_id
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+
+
+def reading(seconds_ago):
+    timestamp = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(seconds=seconds_ago)
+    return (new_id(), 31.8, 35.9, timestamp, 'esp32-1', spatial.encode(31.8, 35.9))
+
+
+def insert(pool, rows):
+    with pool.connection() as conn:
+        c = conn.cursor()
+        c.executemany(pool.backend.insert('gps_data', COLUMNS), bind_rows(COLUMNS, rows))
+        after_insert(c, 'gps_data', COLUMNS, rows)
+        conn.commit()
+
+
+def drain(subscriber):
+    ids = []
+    while not subscriber.queue.empty():
+        topic, row = subscriber.queue.get_nowait()
+        ids.append(row['id'])
+    return ids
+
+
+def test_position_compares_typed_keys():
+    row = {'timestamp': datetime.datetime(2026, 1, 1, 12, 0, 9), 'id': new_id()}
+    # As text, '2026-01-01T12:00:10' sorts before '2026-01-01 12:00:09'
+    position = Position(encode_cursor({'timestamp': '2026-01-01T12:00:10', 'id': new_id()}))
+    later = {'timestamp': '2026-01-01 12:00:11', 'id': new_id()}
+    assert position.accept(row)
+    assert position.cursor != encode_cursor(row)
+    assert position.accept(later)
+    assert position.cursor == encode_cursor(later)
+    assert not position.accept(later)
+
+
+def test_late_committed_row_is_pushed_once(pool):
+    insert(pool, [reading(20), reading(2)])
+    feed = ChangeFeed(pool)
+    subscriber = Subscriber(['gps'], 100)
+    feed._poll([subscriber])
+    assert drain(subscriber) == []
+
+    late, new = reading(10), reading(0)
+    insert(pool, [late, new])
+    feed._poll([subscriber])
+    assert sorted(drain(subscriber)) == sorted([late[0], new[0]])
+
+    newer = reading(-1)
+    insert(pool, [newer])
+    feed._poll([subscriber])
+    assert drain(subscriber) == [newer[0]]
+
+
+def test_resume_replays_missed_rows(pool):
+    insert(pool, [reading(30)])
+    feed = ChangeFeed(pool)
+    position = feed.start_position('gps')
+    event_id = encode_event_id({'gps': position.cursor})
+
+    missed = [reading(20), reading(5)]
+    insert(pool, missed)
+    resumed = Position(decode_event_id(event_id)['gps'])
+    rows, has_more = feed.read_new('gps', resumed, 100)
+    assert {row['id'] for row in rows} >= {row[0] for row in missed}
+    assert not has_more
+    assert decode_event_id(encode_event_id({'gps': 'garbage'})) == {}
+
+
+def test_stream_needs_a_worker_that_can_hold_it(client):
+    # A single-threaded worker (gunicorn sync) refuses, so pages fall back to polling
+    assert client.get('/api/stream?topics=gps').status_code == 204
+
+    response = client.get('/api/stream?topics=gps', buffered=False,
+                          environ_overrides={'wsgi.multithread': True})
+    assert response.status_code == 200
+    assert next(response.response).startswith(b'retry:')
+    response.close()
+
+
+def test_streams_beyond_the_cap_get_204(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'SSE_ENABLED', 'true')
+    monkeypatch.setattr(app, 'stream_slots', threading.BoundedSemaphore(1))
+    first = client.get('/api/stream?topics=gps')
+    assert first.status_code == 200
+    assert client.get('/api/stream?topics=gps').status_code == 204
+    # Closing a stream, even one never read from, frees its slot and subscription
+    first.close()
+    assert app.change_feed._subscribers == set()
+    second = client.get('/api/stream?topics=gps')
+    assert second.status_code == 200
+    second.close()
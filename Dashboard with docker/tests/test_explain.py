@@ -0,0 +1,19 @@
+import pytest
+
+import migrations
+
+# Only the SQL text is needed to build these; each test explains them on a fresh database
+QUERIES = list(migrations.endpoint_queries())
+
+
+@pytest.mark.parametrize('label, index, query, params', QUERIES, ids=[q[0] for q in QUERIES])
+def test_endpoint_query_uses_expected_index(backend, conn, label, index, query, params):
+    assert index in backend.plan_indexes(conn, query, params)
+    problems = backend.plan_problems(conn, query, params)
+    if any(shape in label for shape in migrations.SORTED_QUERIES):
+        problems = [p for p in problems if 'sort' not in p]
+    assert problems == []
+
+
+def test_explain_reports_nothing(conn):
+    assert migrations.explain(conn) == []
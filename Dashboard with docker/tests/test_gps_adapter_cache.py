@@ -0,0 +1,90 @@
+import os
+import datetime
+import importlib.util
+
+import pytest
+
+import spatial
+from ids import new_id
+
+# The adapter is a standalone MySQL service; its cache logic only needs a dict cursor
+pytest.importorskip('MySQLdb')
+
+ADAPTER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'gps', 'scripts', 'gps_api_adapter.py')
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'jamming_detected', 'geohash')
+NOW = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def adapter():
+    # A fresh module per test, so each starts with an empty cache
+    spec = importlib.util.spec_from_file_location('gps_api_adapter_under_test', ADAPTER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def cursor(backend, conn):
+    return conn.cursor(backend.dict_cursor)
+
+
+def reading(minutes_ago, jamming=False):
+    return (new_id(), 31.8, 35.9, NOW - datetime.timedelta(minutes=minutes_ago), 'esp32-1', jamming,
+            spatial.encode(31.8, 35.9))
+
+
+def cached(adapter):
+    return [row['id'] for row in adapter.gps_cache['data']]
+
+
+def test_reconcile_loads_the_window_and_counts_everything(app, adapter, cursor):
+    old, jammed, recent = reading(90, jamming=True), reading(30, jamming=True), reading(5)
+    app.insert_rows('gps_data', COLUMNS, [old, jammed, recent])
+    adapter.reconcile_gps_cache(cursor, NOW)
+    assert cached(adapter) == [recent[0], jammed[0]]
+    assert adapter.gps_cache['ids'] == {recent[0], jammed[0]}
+    assert adapter.gps_cache['high_water'] == recent[3]
+    assert adapter.gps_cache['stats'] == {'total': 3, 'anomalies': 2, 'recent_count': 2}
+
+
+def test_refresh_adds_new_and_late_rows_once(app, adapter, cursor):
+    first = reading(10)
+    app.insert_rows('gps_data', COLUMNS, [first])
+    adapter.reconcile_gps_cache(cursor, NOW)
+
+    # Committed after the refresh saw ``first``, but taken before it (inside the overlap)
+    late, new = reading(10.25), reading(1, jamming=True)
+    app.insert_rows('gps_data', COLUMNS, [late, new])
+    adapter.refresh_gps_cache(cursor, NOW)
+    adapter.refresh_gps_cache(cursor, NOW)
+    assert cached(adapter) == [new[0], first[0], late[0]]
+    assert adapter.gps_cache['stats'] == {'total': 3, 'anomalies': 1, 'recent_count': 3}
+
+
+def test_refresh_evicts_rows_that_left_the_window(app, adapter, cursor):
+    leaving, staying = reading(50), reading(5)
+    app.insert_rows('gps_data', COLUMNS, [leaving, staying])
+    adapter.reconcile_gps_cache(cursor, NOW)
+    adapter.refresh_gps_cache(cursor, NOW + datetime.timedelta(minutes=20))
+    assert cached(adapter) == [staying[0]]
+    assert leaving[0] not in adapter.gps_cache['ids']
+    # Evicted rows still count towards the total
+    assert adapter.gps_cache['stats']['total'] == 2
+
+
+def test_reconcile_corrects_rows_deleted_behind_the_cache(app, adapter, conn, cursor):
+    rows = [reading(minutes, jamming=minutes == 20) for minutes in (40, 20, 10)]
+    app.insert_rows('gps_data', COLUMNS, rows)
+    adapter.reconcile_gps_cache(cursor, NOW)
+    c = conn.cursor()
+    c.execute("DELETE FROM gps_data WHERE id = UUID_TO_BIN(%s)", (rows[1][0],))
+    conn.commit()
+
+    # Incremental refreshes only look forward, so they keep the deleted row
+    adapter.refresh_gps_cache(cursor, NOW)
+    assert rows[1][0] in cached(adapter)
+    adapter.reconcile_gps_cache(cursor, NOW)
+    assert cached(adapter) == [rows[2][0], rows[0][0]]
+    assert adapter.gps_cache['stats'] == {'total': 2, 'anomalies': 0, 'recent_count': 2}
@@ -0,0 +1,57 @@
+import time
+import random
+import datetime
+import itertools
+
+import pytest
+
+import polyline
+import spatial
+from ids import new_id
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+
+
+@pytest.mark.parametrize('precision', [5, 6])
+def test_polyline_round_trip(precision):
+    rng = random.Random(7)
+    points = [(round(rng.uniform(-90, 90), precision), round(rng.uniform(-180, 180), precision))
+              for _ in range(200)]
+    points += [(0.0, 0.0), (-0.00001, 0.00001), (90.0, -180.0)]
+    encoded = polyline.encode([p[0] for p in points], [p[1] for p in points], precision)
+    decoded = polyline.decode(encoded, precision)
+    assert [(round(lat, precision), round(lon, precision)) for lat, lon in decoded] == points
+
+
+@pytest.fixture
+def local_zone(monkeypatch):
+    """A zone away from UTC, so treating local times as UTC would show"""
+    monkeypatch.setenv('TZ', 'Asia/Jerusalem')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_track_timestamps_decode_to_local_unix_times(app, client, local_zone):
+    start = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(minutes=30)
+    moments = [start + datetime.timedelta(seconds=offset) for offset in (0, 5, 6, 65, 600)]
+    # Far enough apart that tolerance=0 keeps every point
+    rows = [(new_id(), 31.8 + i * 0.01, 35.9 + i * 0.01, moment, 'track-1',
+             spatial.encode(31.8 + i * 0.01, 35.9 + i * 0.01)) for i, moment in enumerate(moments)]
+    app.insert_rows('gps_data', COLUMNS, rows)
+
+    response = client.get('/api/gps/track/track-1?hours=2&tolerance=0')
+    assert response.status_code == 200
+    body = response.json
+    expected = [int(time.mktime(moment.timetuple())) for moment in moments]
+    assert body['start'] == body['timestamps'][0] == expected[0]
+    assert list(itertools.accumulate(body['timestamps'])) == expected
+    decoded = polyline.decode(body['polyline'], body['precision'])
+    assert [(round(lat, 5), round(lon, 5)) for lat, lon in decoded] == [(round(row[1], 5), round(row[2], 5))
+                                                                        for row in rows]
+
+
+def test_empty_track(app, client):
+    body = client.get('/api/gps/track/nobody?hours=1').json
+    assert body['count'] == 0 and body['timestamps'] == [] and body['start'] is None
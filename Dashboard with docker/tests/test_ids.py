@@ -0,0 +1,55 @@
+import uuid
+import datetime
+
+import ids
+import migrate_ids
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id')
+
+
+def test_uuid7_is_time_ordered():
+    values = [ids.uuid7() for _ in range(5000)]
+    assert values == sorted(values, key=lambda value: value.bytes)
+    assert {value.version for value in values} == {7}
+    assert {value.variant for value in values} == {uuid.RFC_4122}
+
+
+def test_string_and_binary_forms_round_trip():
+    text = ids.new_id()
+    assert ids.is_valid(text)
+    binary = ids.to_binary(text)
+    assert len(binary) == 16
+    assert ids.bin_to_uuid(binary) == text
+    assert ids.uuid_to_bin(text) == binary
+    # Already-binary ids and legacy text ids pass through unchanged
+    assert ids.uuid_to_bin(binary) == binary
+    assert ids.bin_to_uuid(text) == text
+    assert not ids.is_valid('not-an-id')
+
+
+def test_bind_rows_converts_only_the_id_column():
+    text = ids.new_id()
+    rows = [(text, 1.0, 2.0, '2024-05-01 10:00:00', 'esp32-1')]
+    assert ids.bind_rows(COLUMNS, rows) == [(ids.to_binary(text),) + rows[0][1:]]
+    assert ids.bind_rows(COLUMNS[1:], [row[1:] for row in rows]) == [row[1:] for row in rows]
+
+
+def test_api_reads_binary_and_legacy_text_ids(app, conn, client):
+    now = datetime.datetime.now().replace(microsecond=0)
+    binary_id, legacy_id = ids.new_id(), str(uuid.uuid4())
+    app.insert_rows('gps_data', COLUMNS, [(binary_id, 31.8, 35.9, now, 'esp32-1')])
+    c = conn.cursor()
+    # A row written before the ids were converted, still in text form
+    c.execute("INSERT INTO gps_data (id, latitude, longitude, timestamp, device_id) VALUES (%s, %s, %s, %s, %s)",
+              (legacy_id, 31.9, 35.8, now - datetime.timedelta(minutes=1), 'esp32-1'))
+    conn.commit()
+    c.execute("SELECT typeof(id) FROM gps_data ORDER BY timestamp")
+    assert [kind for kind, in c.fetchall()] == ['text', 'blob']
+
+    before = client.get('/api/gps?hours=1')
+    assert [row['id'] for row in before.json] == [binary_id, legacy_id]
+
+    assert migrate_ids.convert_sqlite(conn, 'gps_data', chunk_size=1, pause=0) == 1
+    c.execute("SELECT typeof(id) FROM gps_data")
+    assert [kind for kind, in c.fetchall()] == ['blob', 'blob']
+    assert client.get('/api/gps?hours=1').json == before.json
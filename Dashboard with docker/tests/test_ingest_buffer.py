@@ -0,0 +1,114 @@
+import os
+import glob
+import json
+import sqlite3
+import datetime
+
+import rollups
+from ids import new_id
+from db_pool import ConnectionPool
+from ingest_hooks import after_insert
+from ingest_buffer import WriteBehindBuffer
+
+COLUMNS = ('id', 'tool_name', 'alert_type', 'severity', 'description', 'raw_data', 'source_ip',
+           'timestamp')
+
+
+def alert(tool='kismet', severity='high'):
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return (new_id(), tool, 'probe', severity, '', '{}', '10.0.0.1', now)
+
+
+def make_buffer(pool, spill_dir):
+    return WriteBehindBuffer(pool, spill_dir=str(spill_dir), flush_size=50, retry_interval=0,
+                             before_commit=after_insert)
+
+
+def unreachable_pool(backend):
+    def connect(**db_config):
+        raise sqlite3.OperationalError('unable to open database file')
+    return ConnectionPool({}, timeout=1, connect=connect, backend=backend)
+
+
+def stored_ids(conn):
+    c = conn.cursor()
+    c.execute("SELECT BIN_TO_UUID(id) FROM alerts")
+    return {row[0] for row in c.fetchall()}
+
+
+def read_records(spill_dir, pattern):
+    records = []
+    for path in glob.glob(os.path.join(str(spill_dir), pattern)):
+        with open(path, encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def test_bad_row_is_dead_lettered_and_rest_of_batch_written(pool, conn, tmp_path):
+    buffer = make_buffer(pool, tmp_path)
+    good = [alert() for _ in range(6)]
+    bad = alert(severity='urgent')  # fails the severity CHECK constraint
+    buffer._flush('alerts', COLUMNS, good[:3] + [bad] + good[3:])
+
+    assert stored_ids(conn) == {row[0] for row in good}
+    dead = read_records(tmp_path, 'dead-letter-*.ndjson')
+    assert [record['row'][0] for record in dead] == [bad[0]]
+    assert read_records(tmp_path, 'spill-*.ndjson') == []
+    assert buffer.stats()['dead_lettered'] == 1
+
+
+def test_row_with_unparseable_timestamp_is_dead_lettered(pool, conn, tmp_path):
+    buffer = make_buffer(pool, tmp_path)
+    good = alert()
+    bad = alert()[:-1] + ('yesterday',)  # stored as-is by SQLite, rejected by the rollups
+    buffer._flush('alerts', COLUMNS, [good, bad])
+
+    assert stored_ids(conn) == {good[0]}
+    assert [record['row'][0] for record in read_records(tmp_path, 'dead-letter-*.ndjson')] == [bad[0]]
+
+
+def test_unavailable_database_spills_and_replays(backend, pool, conn, tmp_path):
+    buffer = make_buffer(unreachable_pool(backend), tmp_path)
+    rows = [alert() for _ in range(5)]
+    buffer._flush('alerts', COLUMNS, rows)
+    assert len(read_records(tmp_path, 'spill-*.ndjson')) == 5
+    assert stored_ids(conn) == set()
+
+    buffer.pool = pool
+    buffer._maybe_replay()
+    assert stored_ids(conn) == {row[0] for row in rows}
+    assert glob.glob(os.path.join(str(tmp_path), 'spill-*.ndjson')) == []
+    assert buffer.stats()['replayed'] == 5
+
+
+def test_bad_spill_file_does_not_block_later_files(pool, conn, tmp_path):
+    buffer = make_buffer(pool, tmp_path)
+    first = [alert(), alert(severity='urgent'), alert()]
+    second = [alert() for _ in range(3)]
+    for name, rows in (('spill-1.ndjson', first), ('spill-2.ndjson', second)):
+        with open(tmp_path / name, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({'table': 'alerts', 'columns': COLUMNS, 'row': row}) + '\n')
+
+    buffer._maybe_replay()
+    assert stored_ids(conn) == {first[0][0], first[2][0]} | {row[0] for row in second}
+    assert glob.glob(os.path.join(str(tmp_path), 'spill-*.ndjson')) == []
+    assert [record['row'][0] for record in read_records(tmp_path, 'dead-letter-*.ndjson')] == [first[1][0]]
+
+
+def test_replay_of_committed_rows_keeps_rollups_exact(pool, conn, tmp_path):
+    buffer = make_buffer(pool, tmp_path)
+    committed = [alert(tool='kismet') for _ in range(4)]
+    buffer._flush('alerts', COLUMNS, committed)
+    # The same batch spilled again (its commit raced a lost connection), plus new rows
+    fresh = [alert(tool='wids') for _ in range(2)]
+    buffer._spill('alerts', COLUMNS, committed + fresh)
+
+    buffer._maybe_replay()
+    assert buffer.stats()['replayed'] == 2
+    assert rollups.window_totals(conn, 'alerts', 'tool_name', 'count', 1) == {'kismet': 4, 'wids': 2}
+    c = conn.cursor()
+    c.execute("SELECT tool_name, COUNT(*) FROM alerts GROUP BY tool_name")
+    assert dict(c.fetchall()) == {'kismet': 4, 'wids': 2}
+    c.execute("SELECT version FROM data_versions WHERE table_name = 'alerts'")
+    assert c.fetchone()[0] == 2
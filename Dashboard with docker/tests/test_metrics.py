@@ -0,0 +1,82 @@
+import json
+import multiprocessing
+
+import pytest
+
+from metrics import MetricsRegistry, fingerprint
+
+
+def registry(tmp_path):
+    metrics = MetricsRegistry(directory=str(tmp_path), flush_interval=60)
+    requests = metrics.counter('requests_total', 'Requests')
+    latency = metrics.histogram('request_seconds', 'Latency', buckets=(0.1, 1.0))
+    return metrics, requests, latency
+
+
+def samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+
+def worker(tmp_path, count):
+    metrics, requests, latency = registry(tmp_path)
+    metrics.add_collector(lambda: [('pool_size', 'gauge', 'Pool size', {}, 5)])
+    for _ in range(count):
+        requests.inc(route='/api/gps')
+        latency.observe(0.05, route='/api/gps')
+    latency.observe(3.0, route='/api/gps')
+    metrics.write(force=True)
+
+
+def test_counters_survive_exited_workers(tmp_path):
+    context = multiprocessing.get_context('fork')
+    for count in (3, 4):
+        process = context.Process(target=worker, args=(tmp_path, count))
+        process.start()
+        process.join(10)
+        assert process.exitcode == 0
+    metrics, requests, latency = registry(tmp_path)
+    requests.inc(route='/api/gps')
+    values = samples(metrics.render())
+    assert values['requests_total{route="/api/gps"}'] == '8'
+    assert values['request_seconds_bucket{route="/api/gps",le="0.1"}'] == '7'
+    assert values['request_seconds_bucket{route="/api/gps",le="1"}'] == '7'
+    assert values['request_seconds_bucket{route="/api/gps",le="+Inf"}'] == '9'
+    assert values['request_seconds_count{route="/api/gps"}'] == '9'
+    # Gauges only describe live workers
+    assert 'pool_size' not in values
+    assert sorted(path.name for path in tmp_path.glob('*.json')) == ['archive.json', f'worker-{metrics._pid}.json']
+    # Archived counts are not added a second time
+    assert samples(metrics.render())['requests_total{route="/api/gps"}'] == '8'
+
+
+def test_live_workers_are_summed(tmp_path):
+    metrics, requests, _ = registry(tmp_path)
+    requests.inc(2, route='/api/alerts')
+    # Another running worker's file (pid 1 always exists)
+    (tmp_path / 'worker-1.json').write_text(json.dumps({
+        'meta': {'pool_size': ['gauge', 'Pool size']},
+        'counters': [['requests_total', [['route', '/api/alerts']], 5]],
+        'histograms': [],
+        'gauges': [['pool_size', [], 5]],
+    }))
+    values = samples(metrics.render())
+    assert values['requests_total{route="/api/alerts"}'] == '7'
+    assert values['pool_size'] == '5'
+    assert '# TYPE requests_total counter' in metrics.render()
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ("SELECT * FROM alerts WHERE timestamp >= NOW() - INTERVAL 48 HOUR", "SELECT * FROM alerts WHERE timestamp >= NOW() - INTERVAL ? HOUR"),
+    ("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)", "INSERT INTO t (a, b) VALUES (?, ?)"),
+    ("SELECT  name\n FROM t WHERE name = 'esp32-1'", "SELECT name FROM t WHERE name = ?"),
+])
+def test_fingerprint_collapses_literals(statement, expected):
+    assert fingerprint(statement) == expected
+
+
+def test_metrics_endpoint(client):
+    client.get('/api/ping')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE' in response.get_data(as_text=True)
@@ -0,0 +1,81 @@
+import multiprocessing
+
+import pytest
+
+from rate_limiter import SharedRateLimiter
+
+# Aligned to the window so the arithmetic below is exact
+T = 6000.0
+
+
+def limiter(tmp_path, **kwargs):
+    options = {'limit': 10, 'window': 60, 'block_seconds': 300}
+    options.update(kwargs)
+    return SharedRateLimiter(path=str(tmp_path / 'ratelimit'), **options)
+
+
+def test_previous_window_counts_by_its_overlap(tmp_path):
+    rl = limiter(tmp_path)
+    for i in range(8):
+        assert rl.check('10.0.0.1', now=T + i) == (True, 0)
+    # Halfway through the next window 8 * 0.5 = 4 requests still count
+    for i in range(6):
+        assert rl.check('10.0.0.1', now=T + 90)[0]
+    assert rl.check('10.0.0.1', now=T + 90) == (False, 300)
+
+
+def test_a_skipped_window_forgets_the_count(tmp_path):
+    rl = limiter(tmp_path)
+    for _ in range(9):
+        rl.check('10.0.0.1', now=T)
+    for _ in range(10):
+        assert rl.check('10.0.0.1', now=T + 120)[0]
+
+
+def test_block_holds_until_it_expires(tmp_path):
+    rl = limiter(tmp_path, limit=2)
+    assert rl.check('10.0.0.1', now=T)[0]
+    assert rl.check('10.0.0.1', now=T)[0]
+    assert rl.check('10.0.0.1', now=T + 1) == (False, 300)
+    assert rl.check('10.0.0.1', now=T + 100) == (False, pytest.approx(201))
+    # Other clients are unaffected
+    assert rl.check('10.0.0.2', now=T + 100)[0]
+    assert rl.check('10.0.0.1', now=T + 302)[0]
+    assert rl.stats()['blocks'] == 1
+    assert rl.stats()['rejections'] == 2
+
+
+def test_full_table_evicts_the_least_recently_seen(tmp_path):
+    rl = limiter(tmp_path, capacity=4)
+    for i in range(40):
+        assert rl.check(f"10.0.1.{i}", now=T + i)[0]
+    assert rl.stats()['evictions'] > 0
+
+
+def hammer(path, count, results):
+    rl = SharedRateLimiter(path=path, limit=50, window=60, block_seconds=300)
+    results.put(sum(rl.check('10.0.0.1', now=T)[0] for _ in range(count)))
+
+
+def test_limit_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'ratelimit')
+    # Created before the fork, like the table gunicorn's master opens with preload_app
+    parent = SharedRateLimiter(path=path, limit=50, window=60, block_seconds=300)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=hammer, args=(path, 40, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert sum(results.get(timeout=5) for _ in workers) == 50
+    assert parent.check('10.0.0.1', now=T)[0] is False
+
+
+def test_limit_answers_429_with_retry_after(app, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'rate_limiter', limiter(tmp_path, limit=2, block_seconds=30))
+    assert client.get('/api/ping').status_code == 200
+    assert client.get('/api/ping').status_code == 200
+    response = client.get('/api/ping')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 31
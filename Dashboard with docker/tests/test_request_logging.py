@@ -0,0 +1,67 @@
+import json
+import random
+import logging
+
+import pytest
+
+import request_logging
+from request_logging import CompactJsonFormatter, RequestSampler, parse_sampling
+
+
+def test_parse_sampling_clamps_and_skips_bad_entries():
+    rates = parse_sampling("POST /api/gps=0.01, GET /api/stats = 2 ,default=0.5,bogus,/x=abc")
+    assert rates == {'POST /api/gps': 0.01, 'GET /api/stats': 1.0, 'default': 0.5}
+    assert parse_sampling(None) == {}
+
+
+def test_method_specific_rate_wins():
+    sampler = RequestSampler(parse_sampling("POST /api/gps=0.01,/api/gps=0.5,default=0.2"))
+    assert sampler.rate_for('POST', '/api/gps') == 0.01
+    assert sampler.rate_for('GET', '/api/gps') == 0.5
+    assert sampler.rate_for('GET', '/api/stats') == 0.2
+
+
+def test_errors_are_always_logged():
+    sampler = RequestSampler({'default': 0.0})
+    assert not any(sampler.should_log('POST', '/api/gps', 201) for _ in range(100))
+    assert all(sampler.should_log('POST', '/api/gps', status) for status in (400, 429, 500))
+
+
+def test_sampled_share_matches_the_rate(monkeypatch):
+    monkeypatch.setattr(request_logging, 'random', random.Random(7))
+    sampler = RequestSampler({'POST /api/gps': 0.1})
+    logged = sum(sampler.should_log('POST', '/api/gps', 201) for _ in range(20000))
+    assert 1700 < logged < 2300
+    assert sampler.should_log('GET', '/api/ping', 200)
+
+
+def test_formatter_writes_one_compact_line():
+    record = logging.LogRecord('dashboard', logging.INFO, __file__, 1, 'request', None, None)
+    record.fields = {'m': 'GET', 's': 200}
+    line = CompactJsonFormatter().format(record)
+    assert '\n' not in line and ', ' not in line
+    entry = json.loads(line)
+    assert (entry['msg'], entry['lvl'], entry['m'], entry['s']) == ('request', 'INFO', 'GET', 200)
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    request_logging._stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_records_are_written_by_the_listener(tmp_path, restore_root_logger):
+    log_file = tmp_path / 'app.log'
+    request_logging.setup_logging(str(log_file))
+    assert [type(h) for h in logging.getLogger().handlers] == [logging.handlers.QueueHandler]
+    logging.getLogger('dashboard').info('request', extra={'fields': {'p': '/api/gps'}})
+    # Stopping the listener flushes whatever is still queued
+    request_logging._stop_listener()
+    assert json.loads(log_file.read_text())['p'] == '/api/gps'
@@ -0,0 +1,80 @@
+import os
+import time
+import threading
+
+from response_cache import ResponseCache, CachedResponse
+
+
+def rendered(body=b'{}', status=200):
+    return CachedResponse(status, [('Content-Type', 'application/json')], body)
+
+
+def test_concurrent_misses_render_once(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), ttl=5)
+    calls = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.2)
+        return rendered(b'[1]')
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_set(['/api/gps'], ['gps_data'], render)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [entry.body for entry in results] == [b'[1]'] * 8
+    assert cache.stats()['collapsed'] == 7
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.filling')]
+
+
+def test_render_runs_without_holding_a_lock(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), ttl=5)
+    started, finish = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        finish.wait(5)
+        return rendered(b'slow')
+
+    thread = threading.Thread(target=cache.get_or_set, args=(['/api/stats'], ['alerts'], slow))
+    thread.start()
+    started.wait(5)
+    # Other keys and invalidations go ahead while the slow render is running
+    assert cache.get_or_set(['/api/alerts'], ['alerts'], lambda: rendered(b'fast')).body == b'fast'
+    cache.invalidate('alerts')
+    finish.set()
+    thread.join()
+
+
+def test_waiter_renders_when_the_filler_is_gone(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), ttl=5, fill_timeout=0.2)
+    key = cache.make_key(['/api/gps'], ['gps_data'])
+    # Left behind by a request that died mid-render
+    open(os.path.join(tmp_path, f"{key}.filling"), 'w').close()
+    begin = time.monotonic()
+    assert cache.get_or_set(['/api/gps'], ['gps_data'], lambda: rendered(b'mine')).body == b'mine'
+    assert time.monotonic() - begin < 2
+
+
+def test_uncacheable_response_releases_waiters(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), ttl=5)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.1)
+        return rendered(b'{"error": "x"}', status=500)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_set(['/api/gps'], ['gps_data'], failing)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [entry.status for entry in results] == [500] * 3
+    assert len(calls) == 3
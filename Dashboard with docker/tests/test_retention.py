@@ -0,0 +1,117 @@
+import datetime
+
+import pytest
+
+import spatial
+import clusters
+import retention
+from ids import new_id
+from retention import (RetentionJob, add_future_partitions, drop_expired_partitions, maintain,
+                       parse_policy, partition_boundary, partition_name, retention_cutoff)
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+# A Saturday
+NOW = datetime.datetime(2026, 10, 17, 15, 30)
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement)
+
+
+def test_parse_policy():
+    assert parse_policy("alerts=90, gps_data = 30d,network_attacks=-5,users=7,alerts_x,gps_data=abc") == \
+        {'alerts': 90, 'gps_data': 30, 'network_attacks': 0}
+
+
+@pytest.mark.parametrize('days, interval, cutoff', [
+    (30, 'day', datetime.datetime(2026, 9, 17)),
+    (1, 'day', datetime.datetime(2026, 10, 16)),
+    # The week holding 2026-09-17 (a Thursday) started on Monday 2026-09-14
+    (30, 'week', datetime.datetime(2026, 9, 14)),
+])
+def test_cutoff_is_aligned_to_a_partition_boundary(days, interval, cutoff):
+    assert retention_cutoff(NOW, days, interval) == cutoff
+    # Never cuts into the kept window
+    assert cutoff <= NOW - datetime.timedelta(days=days)
+
+
+def test_partition_names_carry_their_upper_bound():
+    boundary = datetime.datetime(2026, 10, 18)
+    assert partition_name(boundary) == 'p20261018'
+    assert partition_boundary('p20261018') == boundary
+    assert partition_boundary(retention.MAX_PARTITION) is None
+
+
+def test_future_partitions_continue_after_the_last_one():
+    cursor = RecordingCursor()
+    added = add_future_partitions(cursor, 'gps_data', ['p20261017', 'p20261018', 'pmax'], NOW, 'day', 2)
+    # Tomorrow's partition (rows before 10-18) exists, so splitting starts after it
+    assert added == ['p20261019', 'p20261020']
+    assert 'REORGANIZE PARTITION pmax' in cursor.statements[0]
+    assert add_future_partitions(cursor, 'gps_data', ['p20261017', 'p20261018', 'p20261019', 'p20261020', 'pmax'],
+                                 NOW, 'day', 2) == []
+    assert len(cursor.statements) == 1
+
+
+def test_week_partitions_start_on_mondays():
+    added = add_future_partitions(RecordingCursor(), 'alerts', ['pmax'], NOW, 'week', 1)
+    assert added == ['p20261019', 'p20261026']
+
+
+def test_unpartitioned_table_gets_no_partitions():
+    cursor = RecordingCursor()
+    assert add_future_partitions(cursor, 'alerts', ['p1', 'p2'], NOW, 'day', 7) == []
+    assert cursor.statements == []
+
+
+def test_only_partitions_entirely_before_the_cutoff_are_dropped():
+    cursor = RecordingCursor()
+    partitions = ['p20260916', 'p20260917', 'p20260918', 'pmax']
+    assert drop_expired_partitions(cursor, 'alerts', partitions, datetime.datetime(2026, 9, 17)) == \
+        ['p20260916', 'p20260917']
+    assert cursor.statements == ['ALTER TABLE alerts DROP PARTITION p20260916, p20260917']
+
+
+def readings(days_ago, count):
+    moment = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=days_ago)
+    return [(new_id(), 31.8, 35.9, moment, 'esp32-1', spatial.encode(31.8, 35.9)) for _ in range(count)]
+
+
+def count(conn, query):
+    c = conn.cursor()
+    c.execute(query)
+    return c.fetchone()[0]
+
+
+def test_unpartitioned_tables_delete_in_batches(app, conn, monkeypatch):
+    monkeypatch.setattr(retention, 'DELETE_BATCH_SIZE', 2)
+    app.insert_rows('gps_data', COLUMNS, readings(40, 5) + readings(1, 3))
+    results = maintain(conn, {'gps_data': 30})
+    assert results['gps_data'] == {'added': [], 'dropped': [], 'deleted': 5}
+    assert results['alerts']['deleted'] == 0
+    assert count(conn, "SELECT COUNT(*) FROM gps_data") == 3
+    cutoff = retention_cutoff(datetime.datetime.now(), 30, 'day')
+    assert count(conn, f"SELECT COUNT(*) FROM {clusters.TABLE} WHERE bucket < '{cutoff}'") == 0
+    assert count(conn, f"SELECT COUNT(*) FROM {clusters.TABLE}") > 0
+
+
+def test_job_runs_once_per_interval(app, pool, tmp_path):
+    app.insert_rows('gps_data', COLUMNS, readings(40, 2))
+    changed = []
+    job = RetentionJob(pool, {'gps_data': 30}, run_every=3600, state_path=str(tmp_path / 'state'),
+                       on_change=changed.append)
+    assert job.run_if_due()['gps_data']['deleted'] == 2
+    assert changed == ['gps_data']
+    # Another worker sharing the marker file finds the pass already done
+    other = RetentionJob(pool, {'gps_data': 30}, run_every=3600, state_path=str(tmp_path / 'state'))
+    assert other.run_if_due() is None
+    assert other.run_if_due(force=True)['gps_data']['deleted'] == 0
+
+
+def test_unknown_interval_is_rejected(pool):
+    with pytest.raises(ValueError):
+        RetentionJob(pool, {}, interval='month')
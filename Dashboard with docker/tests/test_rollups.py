@@ -0,0 +1,26 @@
+import datetime
+
+import pytest
+
+import rollups
+
+
+def test_parse_timestamp_accepts_stored_forms():
+    expected = datetime.datetime(2026, 10, 17, 7, 47, 40)
+    assert rollups.parse_timestamp('2026-10-17 07:47:40') == expected
+    assert rollups.parse_timestamp('2026-10-17T07:47:40.250000') == expected.replace(microsecond=250000)
+    assert rollups.parse_timestamp(expected) is expected
+
+
+@pytest.mark.parametrize('value', [None, '', 'yesterday', '17/10/2026 07:47', 1760687260])
+def test_parse_timestamp_rejects_unparseable_values(value):
+    with pytest.raises(ValueError):
+        rollups.parse_timestamp(value)
+
+
+def test_deauth_log_with_bad_timestamp_is_rejected(client, conn):
+    response = client.post('/api/deauth_logs', json={'timestamp': 'yesterday', 'attacker_bssid': 'aa:bb'})
+    assert response.status_code == 400
+    c = conn.cursor()
+    c.execute(f"SELECT COUNT(*) FROM {rollups.rollup_table('network_attacks', 'minute')}")
+    assert c.fetchone()[0] == 0
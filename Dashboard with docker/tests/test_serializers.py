@@ -0,0 +1,21 @@
+import datetime
+
+import pytest
+
+import serializers
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(serializers, 'orjson', None)
+    elif serializers.orjson is None:
+        pytest.skip('orjson is not installed')
+    return serializers
+
+
+def test_datetimes_outside_converters_use_http_dates(encoder):
+    moment = datetime.datetime(2026, 10, 17, 7, 47, 40)
+    body = encoder.dumps({'generated': moment, 'nested': [{'day': moment.date()}]})
+    assert body == (b'{"generated":"Sat, 17 Oct 2026 07:47:40 GMT",'
+                    b'"nested":[{"day":"Sat, 17 Oct 2026 00:00:00 GMT"}]}')
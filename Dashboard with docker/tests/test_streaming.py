@@ -0,0 +1,56 @@
+import json
+import datetime
+
+import spatial
+from ids import new_id
+
+COLUMNS = ('id', 'latitude', 'longitude', 'timestamp', 'device_id', 'geohash')
+
+
+def readings(count):
+    now = datetime.datetime.now().replace(microsecond=0)
+    return [(new_id(), 31.8, 35.9, now - datetime.timedelta(seconds=i), 'esp32-1', spatial.encode(31.8, 35.9))
+            for i in range(count)]
+
+
+def chunks(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    assert response.status_code == 200
+    body = list(response.response)
+    response.close()
+    return response, body
+
+
+def test_ndjson_is_sent_one_chunk_per_fetch(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'STREAM_CHUNK_ROWS', 2)
+    rows = readings(5)
+    app.insert_rows('gps_data', COLUMNS, rows)
+    response, body = chunks(client, '/api/gps?hours=1&format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(body) == 3
+    lines = b''.join(body).decode().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [row[0] for row in rows]
+
+
+def test_stream_flag_sends_a_json_array(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'STREAM_CHUNK_ROWS', 2)
+    rows = readings(5)
+    app.insert_rows('gps_data', COLUMNS, rows)
+    response, body = chunks(client, '/api/gps?hours=1&stream=1')
+    assert response.mimetype == 'application/json'
+    assert [row['id'] for row in json.loads(b''.join(body))] == [row[0] for row in rows]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_accept_header_limit_and_fields(app, client):
+    rows = readings(4)
+    app.insert_rows('gps_data', COLUMNS, rows)
+    _, body = chunks(client, '/api/gps?hours=1&limit=3&fields=device_id',
+                     headers={'Accept': 'application/x-ndjson'})
+    assert [json.loads(line) for line in b''.join(body).splitlines()] == [{'device_id': 'esp32-1'}] * 3
+
+
+def test_empty_stream_is_a_valid_array(client):
+    _, body = chunks(client, '/api/gps?hours=1&stream=1')
+    assert json.loads(b''.join(body)) == []
+